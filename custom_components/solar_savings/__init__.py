@@ -1,98 +1,192 @@
 """The Solar Savings integration."""
+
 from __future__ import annotations
 
 import logging
-from homeassistant.config_entries import ConfigEntry
+from functools import partial
+from typing import TYPE_CHECKING
+
 from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.event import async_track_time_change
-from homeassistant.util import dt as dt_util
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.storage import Store
 
 from .const import DOMAIN
+from .coordinator import RateCoordinator
+from .data import SolarSavingsData
+from .demand import DemandTracker, demand_storage_key
+from .engine import STORAGE_VERSION, SavingsEngine, storage_key
+from .forecast import ForecastProjector
+from .instrumentation import (
+    DATA_INSTRUMENTATION,
+    OPTION_UPDATE,
+    async_get_instrumentation,
+)
+from .planner import BatteryPlanner
+from .prices import PriceFeed
+from .scheduler import async_get_scheduler
+from .self_consumption import SelfConsumptionTracker, self_consumption_storage_key
+from .services import async_setup_services
+from .tariff import METER_KEYS, SolarSavingsTariff
+
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant
 
 # Add SELECT to the supported platforms
-PLATFORMS: list[Platform] = [Platform.SENSOR, Platform.NUMBER, Platform.DATE, Platform.SELECT]
+PLATFORMS: list[Platform] = [
+    Platform.SENSOR,
+    Platform.NUMBER,
+    Platform.DATE,
+    Platform.SELECT,
+]
 
 _LOGGER = logging.getLogger(__name__)
 
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+
+# Home Assistant passes the YAML config; this integration has none
+async def async_setup(hass: HomeAssistant, config: dict) -> bool:  # noqa: ARG001
+    """Set up the Solar Savings services."""
+    async_setup_services(hass)
+    return True
+
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Solar Savings from a config entry."""
-    
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    # Bring the options up to date first, so the entities are created from
+    # today's tariff. No update listener is registered yet, so this does
+    # not trigger a reload.
+    scheduler = async_get_scheduler(hass)
+    scheduler.async_apply_due(entry)
+
+    # Shared tariff state, read by every platform and updated in place
+    tariff = SolarSavingsTariff(hass, entry)
+    entry.async_on_unload(await tariff.async_start())
+
+    # Hot path timings, when enabled; kept across reloads of the entry
+    instrumentation = async_get_instrumentation(
+        hass, entry.entry_id, enabled=bool(tariff.get("instrumentation"))
+    )
 
-    entry.async_on_unload(entry.add_update_listener(update_listener))
+    # Live prices, when the tariff follows a price sensor
+    prices = None
+    if tariff.is_dynamic:
+        prices = PriceFeed(hass, tariff, instrumentation)
+        entry.async_on_unload(prices.async_start())
+
+    # The current rates, resolved once per transition for every consumer
+    coordinator = RateCoordinator(hass, tariff, prices, instrumentation)
+    entry.async_on_unload(coordinator.async_start())
+    entry.runtime_data = SolarSavingsData(
+        tariff, coordinator, prices=prices, instrumentation=instrumentation
+    )
 
-    async def check_rates_now(_):
-        await apply_scheduled_rates(hass, entry)
+    # Running savings totals, when any energy meter is configured
+    if any(tariff.get(key) for key in METER_KEYS):
+        engine = SavingsEngine(hass, tariff, coordinator)
+        await engine.async_load()
+        entry.runtime_data.engine = engine
+
+    # Rolling and peak demand, when a demand sensor is configured
+    if tariff.get("demand_sensor"):
+        demand = DemandTracker(hass, tariff, coordinator)
+        await demand.async_load()
+        entry.runtime_data.demand = demand
+
+    # Self-consumption by band, when solar and load or grid power are configured
+    if tariff.has_power_sensors:
+        self_consumption = SelfConsumptionTracker(hass, tariff, coordinator)
+        await self_consumption.async_load()
+        entry.runtime_data.self_consumption = self_consumption
+
+    # Projected savings for the rest of the day, from a solar forecast
+    if tariff.get("solar_forecast_sensor") and tariff.get("grid_import_sensor"):
+        entry.runtime_data.projector = ForecastProjector(hass, tariff)
+
+    # Battery schedule over the tariff timeline, when a battery is configured
+    if tariff.get("battery_capacity"):
+        entry.runtime_data.planner = BatteryPlanner(
+            hass, tariff, entry.runtime_data.projector, prices
+        )
 
-    # Schedule the daily check and register CLEANUP
-    entry.async_on_unload(
-        async_track_time_change(hass, check_rates_now, hour=0, minute=0, second=1)
-    )
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
-    # Check immediately on startup/reload
-    await check_rates_now(None)
+    # Start counting once the sensors are listening
+    if entry.runtime_data.engine:
+        entry.async_on_unload(entry.runtime_data.engine.async_start())
+    if entry.runtime_data.demand:
+        entry.async_on_unload(entry.runtime_data.demand.async_start())
+    if entry.runtime_data.self_consumption:
+        entry.async_on_unload(entry.runtime_data.self_consumption.async_start())
+    if entry.runtime_data.projector:
+        entry.async_on_unload(entry.runtime_data.projector.async_start())
+        # Learning the load profile queries weeks of history
+        entry.async_create_background_task(
+            hass,
+            entry.runtime_data.projector.async_load(),
+            f"{DOMAIN} load profile {entry.entry_id}",
+        )
+    if entry.runtime_data.planner:
+        entry.async_on_unload(entry.runtime_data.planner.async_start())
 
-    return True
+    entry.async_on_unload(entry.add_update_listener(update_listener))
+
+    # Later dated tariff changes are applied by the shared scheduler
+    scheduler.async_schedule(entry)
+    entry.async_on_unload(partial(scheduler.async_unschedule, entry.entry_id))
 
-async def apply_scheduled_rates(hass: HomeAssistant, entry: ConfigEntry):
-    """Check if today is the day to apply new rates."""
-    
-    scheduled_date_str = entry.options.get("scheduled_date")
-    
-    if not scheduled_date_str:
-        return 
-
-    # Use HA's timezone aware 'now', then get the date
-    today_str = dt_util.now().date().isoformat()
-
-    if today_str >= scheduled_date_str:
-        _LOGGER.info("Solar Savings: Applying scheduled changes.")
-        
-        # Get future values
-        future_on = entry.options.get("future_on_peak_rate")
-        future_off = entry.options.get("future_off_peak_rate")
-        future_export = entry.options.get("future_export_rate")
-        future_schedule = entry.options.get("future_peak_schedule")
-
-        new_options = entry.options.copy()
-        changes_made = False
-
-        # Apply Rates
-        if future_on is not None and future_on > 0:
-            new_options["on_peak_rate"] = future_on
-            new_options["future_on_peak_rate"] = 0.0
-            changes_made = True
-        
-        if future_off is not None and future_off > 0:
-            new_options["off_peak_rate"] = future_off
-            new_options["future_off_peak_rate"] = 0.0
-            changes_made = True
-
-        if future_export is not None and future_export > 0:
-            new_options["export_rate"] = future_export
-            new_options["future_export_rate"] = 0.0
-            changes_made = True
-
-        # Apply Schedule
-        if future_schedule:
-            new_options["peak_schedule"] = future_schedule
-            new_options["future_peak_schedule"] = None # Reset future
-            changes_made = True
-
-        if changes_made:
-            # Clear the date
-            new_options["scheduled_date"] = None
-            
-            # Save and reload
-            hass.config_entries.async_update_entry(entry, options=new_options)
+    return True
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
-    return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    if not await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
+        return False
+
+    # Keep the latest totals for the next setup
+    if entry.runtime_data.engine:
+        await entry.runtime_data.engine.async_save()
+    if entry.runtime_data.demand:
+        await entry.runtime_data.demand.async_save()
+    if entry.runtime_data.self_consumption:
+        await entry.runtime_data.self_consumption.async_save()
+    return True
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the saved totals with the entry."""
+    await Store(hass, STORAGE_VERSION, storage_key(entry.entry_id)).async_remove()
+    await Store(
+        hass, STORAGE_VERSION, demand_storage_key(entry.entry_id)
+    ).async_remove()
+    await Store(
+        hass, STORAGE_VERSION, self_consumption_storage_key(entry.entry_id)
+    ).async_remove()
+    hass.data.get(DATA_INSTRUMENTATION, {}).pop(entry.entry_id, None)
 
 
 async def update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
-    """Handle options update."""
-    await hass.config_entries.async_reload(entry.entry_id)
\ No newline at end of file
+    """
+    Handle options update.
+
+    Only reload when the set of entities has to change; otherwise push the
+    new values to the existing entities.
+    """
+    if (instrumentation := entry.runtime_data.instrumentation) is None:
+        await _async_apply_options(hass, entry)
+        return
+    with instrumentation.measure(OPTION_UPDATE):
+        await _async_apply_options(hass, entry)
+
+
+async def _async_apply_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the entry or update it in place."""
+    tariff: SolarSavingsTariff = entry.runtime_data.tariff
+
+    if tariff.needs_reload(entry):
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+
+    await tariff.async_update(entry)
+    async_get_scheduler(hass).async_schedule(entry)
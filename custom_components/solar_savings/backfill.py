@@ -0,0 +1,266 @@
+"""Vectorised savings over recorded history for Solar Savings."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, tzinfo
+from typing import TYPE_CHECKING
+
+import numpy as np
+from homeassistant.components.recorder.statistics import statistics_during_period
+from homeassistant.util import dt as dt_util
+
+from .statistics import last_sums
+from .timetable import HOLIDAY, MINUTES_PER_DAY, PROFILES
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping, Sequence
+
+    from homeassistant.core import HomeAssistant
+
+    from .holidays import HolidayCalendar
+    from .tariff import CompiledTariff
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 86400
+MINUTES_PER_HOUR = 60
+
+_EPOCH_DAY = date(1970, 1, 1)
+# 1970-01-01 was a Thursday
+_EPOCH_WEEKDAY = 3
+
+
+@dataclass(frozen=True, slots=True)
+class RateTables:
+    """
+    Import and export rates of every tariff version, ready for indexing.
+
+    minute_sums holds, for each version and day profile, the running sum
+    of the import rate over the day's minutes (extended by an hour, wrapping
+    to the start of the day), so the mean rate over any hour is two lookups.
+    Days in the holiday calendar use the holiday profile.
+    """
+
+    effective_days: np.ndarray
+    minute_sums: np.ndarray
+    export_rates: np.ndarray
+    holidays: HolidayCalendar | None = None
+
+    @classmethod
+    def from_versions(
+        cls,
+        versions: Sequence[tuple[date, CompiledTariff]],
+        holidays: HolidayCalendar | None = None,
+    ) -> RateTables:
+        """Build the tables from the compiled tariff versions."""
+        effective_days = np.array(
+            [(effective - _EPOCH_DAY).days for effective, _ in versions], dtype=np.int64
+        )
+        minute_rates = np.zeros((len(versions), PROFILES, MINUTES_PER_DAY))
+        for index, (_, compiled) in enumerate(versions):
+            rates = np.array([band.rate for band in compiled.bands], dtype=np.float64)
+            if compiled.table is None:
+                minute_rates[index] = rates[0]
+                continue
+            for profile in range(PROFILES):
+                bands = np.frombuffer(compiled.table.day_bands(profile), dtype=np.uint8)
+                minute_rates[index, profile] = rates[bands]
+
+        wrapped = np.concatenate(
+            (minute_rates, minute_rates[:, :, :MINUTES_PER_HOUR]), axis=2
+        )
+        minute_sums = np.zeros((*wrapped.shape[:2], wrapped.shape[2] + 1))
+        np.cumsum(wrapped, axis=2, out=minute_sums[:, :, 1:])
+
+        return cls(
+            effective_days,
+            minute_sums,
+            np.array(
+                [compiled.export_rate for _, compiled in versions], dtype=np.float64
+            ),
+            holidays or None,
+        )
+
+    def hourly_rates(self, local_seconds: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return the mean import rate and export rate for hours starting at local times.
+
+        Hours before the first tariff version get no rate.
+        """
+        local_days = local_seconds // SECONDS_PER_DAY
+        minutes = (local_seconds % SECONDS_PER_DAY) // 60
+        profiles = (local_days + _EPOCH_WEEKDAY) % 7
+        if self.holidays is not None and len(local_days):
+            profiles = np.where(
+                np.isin(local_days, self._holiday_days(local_days)), HOLIDAY, profiles
+            )
+
+        versions = np.searchsorted(self.effective_days, local_days, side="right") - 1
+        known = versions >= 0
+        versions = np.maximum(versions, 0)
+
+        sums = self.minute_sums
+        import_rates = (
+            sums[versions, profiles, minutes + MINUTES_PER_HOUR]
+            - sums[versions, profiles, minutes]
+        ) / MINUTES_PER_HOUR
+        export_rates = self.export_rates[versions]
+        return np.where(known, import_rates, 0.0), np.where(known, export_rates, 0.0)
+
+    def _holiday_days(self, local_days: np.ndarray) -> np.ndarray:
+        """Return the holidays in the years spanned, as days since 1970-01-01."""
+        first = _EPOCH_DAY + timedelta(days=int(local_days.min()))
+        last = _EPOCH_DAY + timedelta(days=int(local_days.max()))
+        return np.array(self.holidays.epoch_days(first.year, last.year), dtype=np.int64)
+
+
+def fetch_hourly_changes(
+    hass: HomeAssistant,
+    start: datetime,
+    end: datetime,
+    meters: Mapping[str, str],
+) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """
+    Return the hour starts and each meter's hourly kWh on a common grid.
+
+    meters maps a series key to the meter's entity id. Hours the recorder
+    has no statistics for count as zero. Runs in the recorder executor.
+    """
+    first = int(start.timestamp()) // SECONDS_PER_HOUR * SECONDS_PER_HOUR
+    starts = np.arange(first, int(end.timestamp()), SECONDS_PER_HOUR, dtype=np.int64)
+
+    rows = statistics_during_period(
+        hass,
+        dt_util.utc_from_timestamp(first),
+        end,
+        set(meters.values()),
+        "hour",
+        {"energy": "kWh"},
+        {"change"},
+    )
+
+    series = {}
+    for key, entity_id in meters.items():
+        values = np.zeros(len(starts))
+        if stats := rows.get(entity_id):
+            stamps = np.array([row["start"] for row in stats], dtype=np.int64)
+            changes = np.array(
+                [row.get("change") or 0.0 for row in stats], dtype=np.float64
+            )
+            slots = (stamps - first) // SECONDS_PER_HOUR
+            inside = (slots >= 0) & (slots < len(starts))
+            np.add.at(values, slots[inside], changes[inside])
+        series[key] = values
+    return starts, series
+
+
+def utc_offsets(starts: np.ndarray, time_zone: tzinfo) -> np.ndarray:
+    """
+    Return the UTC offset in seconds in force at each hour start.
+
+    The offset is only looked up at daily steps, and hourly around the
+    few days where it changes, then spread over the hours with a search.
+    """
+    if not len(starts):
+        return np.zeros(0, dtype=np.int64)
+
+    def offset_at(stamp: int) -> int:
+        moment = datetime.fromtimestamp(stamp, time_zone)
+        return int(moment.utcoffset().total_seconds())
+
+    change_stamps = [int(starts[0])]
+    change_offsets = [offset_at(int(starts[0]))]
+    for day_start in range(int(starts[0]), int(starts[-1]) + 1, SECONDS_PER_DAY):
+        day_end = min(day_start + SECONDS_PER_DAY, int(starts[-1]))
+        if offset_at(day_end) == change_offsets[-1]:
+            continue
+        for hour in range(day_start, day_end + 1, SECONDS_PER_HOUR):
+            if (offset := offset_at(hour)) != change_offsets[-1]:
+                change_stamps.append(hour)
+                change_offsets.append(offset)
+
+    index = np.searchsorted(np.array(change_stamps), starts, side="right") - 1
+    return np.array(change_offsets, dtype=np.int64)[index]
+
+
+def self_consumption(solar: np.ndarray, exported: np.ndarray) -> np.ndarray:
+    """
+    Return the hourly self-consumed energy.
+
+    Follows the live engine: solar minus export, counted against a
+    high-water mark of the running total.
+    """
+    net_solar = np.cumsum(solar - exported)
+    high_water = np.maximum.accumulate(np.maximum(net_solar, 0.0))
+    return np.diff(high_water, prepend=0.0)
+
+
+def compute_savings(
+    starts: np.ndarray,
+    series: Mapping[str, np.ndarray],
+    rates: RateTables,
+    time_zone: tzinfo,
+) -> dict[str, np.ndarray]:
+    """Return the hourly savings series, money in cents."""
+    zeros = np.zeros(len(starts))
+    imported = series.get("import", zeros)
+    exported = series.get("export", zeros)
+    solar = series.get("solar", zeros)
+
+    import_rates, export_rates = rates.hourly_rates(
+        starts + utc_offsets(starts, time_zone)
+    )
+    self_consumed = self_consumption(solar, exported)
+
+    avoided_cost = self_consumed * import_rates
+    export_credit = exported * export_rates
+    if "solar" not in series:
+        # Without a solar meter nothing is known to be self-consumed
+        self_consumed = avoided_cost = zeros
+
+    return {
+        "import_cost": imported * import_rates,
+        "export_credit": export_credit,
+        "avoided_cost": avoided_cost,
+        "net_savings": avoided_cost + export_credit,
+        "self_consumed_energy": self_consumed,
+    }
+
+
+@dataclass(slots=True)
+class BackfillResult:
+    """Hourly savings ready to be published."""
+
+    starts: list[datetime]
+    # series key -> hourly change, money in cents
+    changes: dict[str, list[float]]
+    # series key -> sum of the statistic just before the first hour
+    base_sums: dict[str, float]
+
+
+def run_backfill(  # noqa: PLR0913 - run in the executor
+    hass: HomeAssistant,
+    entry_id: str,
+    start: datetime,
+    end: datetime,
+    meters: Mapping[str, str],
+    versions: Sequence[tuple[date, CompiledTariff]],
+    holidays: HolidayCalendar,
+    time_zone: tzinfo,
+) -> BackfillResult:
+    """
+    Compute the savings for every hour between two times.
+
+    Runs in the recorder executor: one statistics query for all meters,
+    then array operations over the whole period.
+    """
+    starts, series = fetch_hourly_changes(hass, start, end, meters)
+    changes = compute_savings(
+        starts, series, RateTables.from_versions(versions, holidays), time_zone
+    )
+    first = dt_util.utc_from_timestamp(int(starts[0])) if len(starts) else start
+    return BackfillResult(
+        [dt_util.utc_from_timestamp(stamp) for stamp in starts.tolist()],
+        {key: values.tolist() for key, values in changes.items()},
+        last_sums(hass, entry_id, first),
+    )
@@ -0,0 +1,153 @@
+"""Block (tiered) rates for Solar Savings."""
+
+from __future__ import annotations
+
+import math
+from bisect import bisect_right
+from collections.abc import Mapping, Sequence
+from datetime import date, datetime, timedelta, tzinfo
+from typing import Any
+
+from .tariff import billing_period_start, start_of_site_day
+
+# Periods over which block usage is counted
+BLOCK_PERIOD_DAY = "day"
+BLOCK_PERIOD_BILLING = "billing"
+
+MONTHS_PER_YEAR = 12
+
+
+class BlockCounter:
+    """
+    Energy used in the current period and its price by block.
+
+    Each block holds energy up to a cumulative limit at its own rate; the
+    last block has no limit. Every delta advances the counter and is
+    split exactly across the blocks it spans. The counter starts again
+    at zero the first time it is used after its period ends, so no
+    timer or history query is needed for the reset.
+    """
+
+    __slots__ = ("_billing_day", "_limits", "_period", "_rates", "period_end", "used")
+
+    def __init__(
+        self,
+        blocks: Sequence[Mapping[str, Any]],
+        period: str,
+        billing_day: int,
+    ) -> None:
+        """Initialize the counter from validated blocks."""
+        self._limits = [block["up_to"] for block in blocks[:-1]]
+        self._rates = [block["rate"] for block in blocks]
+        self._period = period
+        self._billing_day = billing_day
+        # kWh counted in the period, and when the period ends (timestamp)
+        self.used = 0.0
+        self.period_end = -math.inf
+
+    @property
+    def block(self) -> int:
+        """Return the index of the block the next kWh falls in."""
+        return bisect_right(self._limits, self.used)
+
+    @property
+    def marginal_rate(self) -> float:
+        """Return the rate in cents of the next kWh."""
+        return self._rates[self.block]
+
+    def add(
+        self,
+        kwh: float,
+        when: datetime,
+        time_zone: tzinfo,
+        since: datetime | None = None,
+    ) -> float:
+        """
+        Count energy used at a time; return its price in cents.
+
+        since is when the energy started to build up, e.g. the previous
+        meter reading. Energy spanning the end of the period is split at
+        the reset in proportion to time, so the old period keeps its share.
+        """
+        timestamp = when.timestamp()
+        cost = 0.0
+        if timestamp >= self.period_end:
+            start = since.timestamp() if since else timestamp
+            if start < self.period_end:
+                before = kwh * (self.period_end - start) / (timestamp - start)
+                cost = self._count(before)
+                kwh -= before
+            self.used = 0.0
+            self.period_end = self._next_period(when.astimezone(time_zone)).timestamp()
+        return cost + self._count(kwh)
+
+    def _count(self, kwh: float) -> float:
+        """Advance the counter by energy in this period; return its price."""
+        limits = self._limits
+        rates = self._rates
+        index = bisect_right(limits, self.used)
+        used = self.used
+        remaining = kwh
+        cost = 0.0
+        while remaining > 0:
+            room = limits[index] - used if index < len(limits) else remaining
+            take = min(remaining, room)
+            cost += take * rates[index]
+            used += take
+            remaining -= take
+            index += 1
+
+        self.used = used
+        return cost
+
+    def _next_period(self, local: datetime) -> datetime:
+        """Return when the period containing a local time ends."""
+        if self._period == BLOCK_PERIOD_DAY:
+            return start_of_site_day(local.date() + timedelta(days=1), local.tzinfo)
+
+        start = billing_period_start(local, self._billing_day)
+        month = start.month % MONTHS_PER_YEAR + 1
+        year = start.year + (start.month == MONTHS_PER_YEAR)
+        return start_of_site_day(date(year, month, self._billing_day), local.tzinfo)
+
+    def as_dict(self) -> dict[str, float]:
+        """Return the counter for the engine snapshot."""
+        return {"used": self.used, "period_end": self.period_end}
+
+    def restore(self, data: Mapping[str, float]) -> None:
+        """Resume the counter saved by a previous run."""
+        self.used = data["used"]
+        self.period_end = data["period_end"]
+
+
+def validate_blocks(blocks: Any) -> list[dict[str, Any]]:
+    """
+    Check a list of block definitions and return it normalised.
+
+    Every block but the last needs an up_to limit in kWh, increasing from
+    block to block; the last block covers the rest.
+    """
+    if not isinstance(blocks, list) or not blocks:
+        msg = "Blocks must be a non-empty list"
+        raise ValueError(msg)
+
+    normalised = []
+    previous = 0.0
+    for index, block in enumerate(blocks):
+        if not isinstance(block, Mapping):
+            msg = "Each block must be a mapping"
+            raise TypeError(msg)
+        rate = float(block["rate"])
+        if rate < 0:
+            msg = "Block rates cannot be negative"
+            raise ValueError(msg)
+        if index == len(blocks) - 1:
+            normalised.append({"rate": rate})
+            continue
+        up_to = float(block["up_to"])
+        if up_to <= previous:
+            msg = "Block limits must increase"
+            raise ValueError(msg)
+        normalised.append({"up_to": up_to, "rate": rate})
+        previous = up_to
+    return normalised
@@ -0,0 +1,140 @@
+"""Tariff what-if comparison for Solar Savings."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime, tzinfo
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from .backfill import (
+    RateTables,
+    fetch_hourly_changes,
+    self_consumption,
+    utc_offsets,
+)
+from .tariff import TARIFF_KEYS, CompiledTariff
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping, Sequence
+
+    from homeassistant.core import HomeAssistant
+
+    from .holidays import HolidayCalendar
+
+HOURS_PER_YEAR = 365 * 24
+
+# Candidate fields that set their own on and off peak pricing
+TIME_OF_USE_KEYS = ("on_peak_rate", "off_peak_rate", "peak_schedule", "peak_windows")
+
+
+@dataclass(frozen=True, slots=True)
+class Usage:
+    """A site's hourly energy flows, shared by every plan being compared."""
+
+    # Local time of each hour start, in seconds since the epoch
+    local_seconds: np.ndarray
+    imported: np.ndarray
+    exported: np.ndarray
+    # None without a solar meter
+    self_consumed: np.ndarray | None
+
+    @property
+    def hours(self) -> int:
+        """Return the number of hours covered."""
+        return len(self.local_seconds)
+
+
+@dataclass(frozen=True, slots=True)
+class PlanCost:
+    """What one plan would have cost over the usage, in cents."""
+
+    name: str
+    import_cost: float
+    export_credit: float
+    avoided_cost: float
+
+    @property
+    def net_cost(self) -> float:
+        """Return the bill: imports less export credit."""
+        return self.import_cost - self.export_credit
+
+
+def candidate_values(
+    base: Mapping[str, Any], candidate: Mapping[str, Any]
+) -> dict[str, Any]:
+    """
+    Return a candidate's tariff values, with the gaps filled from a base.
+
+    Bands take precedence over on and off peak rates, and peak windows over
+    a schedule helper, so a candidate setting either of the latter does not
+    inherit the base's bands or windows.
+    """
+    values = dict(base)
+    values.update((key, candidate[key]) for key in TARIFF_KEYS if key in candidate)
+    if "bands" not in candidate and any(key in candidate for key in TIME_OF_USE_KEYS):
+        values["bands"] = None
+    if "peak_schedule" in candidate and "peak_windows" not in candidate:
+        values["peak_windows"] = None
+    return values
+
+
+def load_usage(
+    hass: HomeAssistant,
+    start: datetime,
+    end: datetime,
+    meters: Mapping[str, str],
+    time_zone: tzinfo,
+) -> Usage:
+    """
+    Return the recorded usage between two times.
+
+    Runs in the recorder executor. Everything that does not depend on the
+    rates, the local times and self-consumption, is worked out here once
+    instead of once per plan.
+    """
+    starts, series = fetch_hourly_changes(hass, start, end, meters)
+    zeros = np.zeros(len(starts))
+    exported = series.get("export", zeros)
+    return Usage(
+        starts + utc_offsets(starts, time_zone),
+        series.get("import", zeros),
+        exported,
+        self_consumption(series["solar"], exported) if "solar" in series else None,
+    )
+
+
+def evaluate_plans(
+    usage: Usage,
+    plans: Sequence[tuple[str, CompiledTariff]],
+    holidays: HolidayCalendar | None = None,
+) -> list[PlanCost]:
+    """
+    Return the cost of each plan over the usage.
+
+    Runs in an executor. Each plan is a handful of array lookups and dot
+    products over the whole period. Every plan shares the site's holidays.
+    """
+    costs = []
+    for name, compiled in plans:
+        rates = RateTables.from_versions([(date.min, compiled)], holidays)
+        import_rates, export_rates = rates.hourly_rates(usage.local_seconds)
+        costs.append(
+            PlanCost(
+                name,
+                float(usage.imported @ import_rates),
+                float(usage.exported @ export_rates),
+                0.0
+                if usage.self_consumed is None
+                else float(usage.self_consumed @ import_rates),
+            )
+        )
+    return costs
+
+
+def annual_scale(usage: Usage) -> float:
+    """Return the factor turning costs over the usage into costs per year."""
+    if not usage.hours:
+        return 0.0
+    return HOURS_PER_YEAR / usage.hours
@@ -1,12 +1,76 @@
 """Config flow for Solar Savings integration."""
+
 from __future__ import annotations
 
+import os
+from typing import Any
+
 import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.core import callback
 from homeassistant.helpers import selector
+from homeassistant.util import dt as dt_util
+
+from .blocks import BLOCK_PERIOD_BILLING, BLOCK_PERIOD_DAY, validate_blocks
+from .const import (
+    DEFAULT_BATTERY_EFFICIENCY,
+    DEFAULT_BATTERY_HORIZON,
+    DEFAULT_DEMAND_WINDOW,
+    DEFAULT_LOAD_HISTORY_DAYS,
+    DEFAULT_MIN_CHANGE_THRESHOLD,
+    DEFAULT_MIN_WRITE_INTERVAL,
+    DEFAULT_PRICE_WINDOW,
+    DOMAIN,
+)
+from .holidays import parse_holidays
+from .tariff import (
+    TARIFF_DYNAMIC,
+    TARIFF_KEYS,
+    TARIFF_TIME_OF_USE,
+    TariffTimeline,
+    record_changes,
+    site_today,
+    validate_bands,
+)
+from .timetable import validate_windows
+
+# Options cleared when their field is emptied, falling back to the
+# schedule helper, two bands or no sensor
+CLEARABLE_OPTIONS = (
+    "peak_schedule",
+    "peak_windows",
+    "bands",
+    "grid_import_sensor",
+    "grid_export_sensor",
+    "solar_production_sensor",
+    "meter_rollover",
+    "time_zone",
+    "price_sensor",
+    "price_forecast_attribute",
+    "demand_sensor",
+    "demand_bands",
+    "import_blocks",
+    "export_blocks",
+    "holidays",
+    "holiday_file",
+    "solar_power_sensor",
+    "load_power_sensor",
+    "grid_power_sensor",
+    "solar_forecast_sensor",
+    "solar_forecast_attribute",
+    "battery_capacity",
+    "battery_power",
+    "battery_soc_sensor",
+)
+
+# Options entered as objects -> (validator normalising them, form error)
+STRUCTURED_OPTIONS = (
+    ("peak_windows", validate_windows, "invalid_windows"),
+    ("bands", validate_bands, "invalid_bands"),
+    ("import_blocks", validate_blocks, "invalid_blocks"),
+    ("export_blocks", validate_blocks, "invalid_blocks"),
+)
 
-from .const import DOMAIN
 
 class SolarSavingsConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for Solar Savings."""
@@ -15,19 +79,20 @@ class SolarSavingsConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     @staticmethod
     @callback
-    def async_get_options_flow(config_entry):
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> SolarSavingsOptionsFlowHandler:
         """Get the options flow for this handler."""
         return SolarSavingsOptionsFlowHandler(config_entry)
 
-    async def async_step_user(self, user_input=None):
+    async def async_step_user(
+        self, user_input: dict[str, Any] | None = None
+    ) -> config_entries.ConfigFlowResult:
         """Handle the initial step."""
         errors = {}
 
         if user_input is not None:
-            return self.async_create_entry(
-                title="Solar Savings", 
-                data=user_input
-            )
+            return self.async_create_entry(title="Solar Savings", data=user_input)
 
         # Define the form schema: Rate fields + Schedule Selector
         data_schema = vol.Schema(
@@ -38,6 +103,21 @@ class SolarSavingsConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 vol.Optional("on_peak_rate", default=0.0): vol.Coerce(float),
                 vol.Optional("off_peak_rate", default=0.0): vol.Coerce(float),
                 vol.Optional("export_rate", default=0.0): vol.Coerce(float),
+                vol.Optional("grid_import_sensor"): selector.EntitySelector(
+                    selector.EntitySelectorConfig(
+                        domain="sensor", device_class="energy"
+                    )
+                ),
+                vol.Optional("grid_export_sensor"): selector.EntitySelector(
+                    selector.EntitySelectorConfig(
+                        domain="sensor", device_class="energy"
+                    )
+                ),
+                vol.Optional("solar_production_sensor"): selector.EntitySelector(
+                    selector.EntitySelectorConfig(
+                        domain="sensor", device_class="energy"
+                    )
+                ),
             }
         )
 
@@ -45,41 +125,315 @@ class SolarSavingsConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             step_id="user", data_schema=data_schema, errors=errors
         )
 
+
 class SolarSavingsOptionsFlowHandler(config_entries.OptionsFlow):
     """Handle options flow for Solar Savings."""
 
-    def __init__(self, config_entry):
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
         """Initialize options flow."""
         self.config_entry = config_entry
 
-    async def async_step_init(self, user_input=None):
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> config_entries.ConfigFlowResult:
         """Manage the options."""
+        errors: dict[str, str] = {}
         if user_input is not None:
-            return self.async_create_entry(title="", data=user_input)
+            errors = await self._async_validate(user_input)
 
-        # Get current values
-        current_on_peak = self.config_entry.options.get(
-            "on_peak_rate", self.config_entry.data.get("on_peak_rate", 0.0)
-        )
-        current_off_peak = self.config_entry.options.get(
-            "off_peak_rate", self.config_entry.data.get("off_peak_rate", 0.0)
-        )
-        current_export = self.config_entry.options.get(
-            "export_rate", self.config_entry.data.get("export_rate", 0.0)
-        )
-        current_schedule = self.config_entry.options.get(
-            "peak_schedule", self.config_entry.data.get("peak_schedule")
-        )
+        if user_input is not None and not errors:
+            # Emptied fields are cleared rather than kept from before
+            for key in CLEARABLE_OPTIONS:
+                user_input.setdefault(key, None)
+
+            # Keep the timeline and staged values; edited rates start a new
+            # tariff version today so past days keep their own rates.
+            values = {**self.config_entry.data, **self.config_entry.options}
+            new_values = {**values, **user_input}
+            today = site_today(new_values)
+            in_force = TariffTimeline.from_options(values).at(today)
+            changes = {
+                key: user_input[key]
+                for key in TARIFF_KEYS
+                if key in user_input
+                and (in_force is None or in_force.get(key) != user_input[key])
+            }
+            if changes:
+                new_values = record_changes(new_values, today, changes)
+            return self.async_create_entry(title="", data=new_values)
+
+        # Current values: options override what the entry was created with
+        current = {**self.config_entry.data, **self.config_entry.options}
 
         schema = vol.Schema(
             {
-                vol.Optional("peak_schedule", description={"suggested_value": current_schedule}): selector.EntitySelector(
+                vol.Optional(
+                    "peak_schedule",
+                    description={"suggested_value": current.get("peak_schedule")},
+                ): selector.EntitySelector(
                     selector.EntitySelectorConfig(domain="schedule")
                 ),
-                vol.Optional("on_peak_rate", default=current_on_peak): vol.Coerce(float),
-                vol.Optional("off_peak_rate", default=current_off_peak): vol.Coerce(float),
-                vol.Optional("export_rate", default=current_export): vol.Coerce(float),
+                vol.Optional(
+                    "on_peak_rate", default=current.get("on_peak_rate", 0.0)
+                ): vol.Coerce(float),
+                vol.Optional(
+                    "off_peak_rate", default=current.get("off_peak_rate", 0.0)
+                ): vol.Coerce(float),
+                vol.Optional(
+                    "export_rate", default=current.get("export_rate", 0.0)
+                ): vol.Coerce(float),
+                # Weekly on peak windows, used instead of the schedule helper
+                vol.Optional(
+                    "peak_windows",
+                    description={"suggested_value": current.get("peak_windows")},
+                ): selector.ObjectSelector(),
+                # Named bands, replacing the on/off peak rates and windows
+                vol.Optional(
+                    "bands", description={"suggested_value": current.get("bands")}
+                ): selector.ObjectSelector(),
+                vol.Optional(
+                    "grid_import_sensor",
+                    description={"suggested_value": current.get("grid_import_sensor")},
+                ): selector.EntitySelector(
+                    selector.EntitySelectorConfig(
+                        domain="sensor", device_class="energy"
+                    )
+                ),
+                vol.Optional(
+                    "grid_export_sensor",
+                    description={"suggested_value": current.get("grid_export_sensor")},
+                ): selector.EntitySelector(
+                    selector.EntitySelectorConfig(
+                        domain="sensor", device_class="energy"
+                    )
+                ),
+                vol.Optional(
+                    "solar_production_sensor",
+                    description={
+                        "suggested_value": current.get("solar_production_sensor")
+                    },
+                ): selector.EntitySelector(
+                    selector.EntitySelectorConfig(
+                        domain="sensor", device_class="energy"
+                    )
+                ),
+                # Reading (kWh) at which the meters wrap back to zero
+                vol.Optional(
+                    "meter_rollover",
+                    description={"suggested_value": current.get("meter_rollover")},
+                ): vol.All(vol.Coerce(float), vol.Range(min=0, min_included=False)),
+                # Limit how often the savings totals are written
+                vol.Optional(
+                    "min_write_interval",
+                    default=current.get(
+                        "min_write_interval", DEFAULT_MIN_WRITE_INTERVAL
+                    ),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Optional(
+                    "min_change_threshold",
+                    default=current.get(
+                        "min_change_threshold", DEFAULT_MIN_CHANGE_THRESHOLD
+                    ),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                # Hourly external statistics instead of recorded sensor states
+                vol.Optional(
+                    "publish_statistics",
+                    default=current.get("publish_statistics", False),
+                ): bool,
+                # Extra rate sensors with tax added or removed
+                vol.Optional("tax_rate", default=current.get("tax_rate", 0.0)): vol.All(
+                    vol.Coerce(float), vol.Range(min=0, max=100)
+                ),
+                vol.Optional(
+                    "rates_include_tax", default=current.get("rates_include_tax", True)
+                ): bool,
+                # Site time zone for tariff days, if not Home Assistant's
+                vol.Optional(
+                    "time_zone",
+                    description={"suggested_value": current.get("time_zone")},
+                ): selector.TextSelector(),
+                # Dynamic tariffs price imports from a price sensor
+                vol.Optional(
+                    "tariff_type",
+                    default=current.get("tariff_type", TARIFF_TIME_OF_USE),
+                ): selector.SelectSelector(
+                    selector.SelectSelectorConfig(
+                        options=[TARIFF_TIME_OF_USE, TARIFF_DYNAMIC],
+                        translation_key="tariff_type",
+                    )
+                ),
+                vol.Optional(
+                    "price_sensor",
+                    description={"suggested_value": current.get("price_sensor")},
+                ): selector.EntitySelector(
+                    selector.EntitySelectorConfig(domain="sensor")
+                ),
+                vol.Optional(
+                    "price_forecast_attribute",
+                    description={
+                        "suggested_value": current.get("price_forecast_attribute")
+                    },
+                ): selector.TextSelector(),
+                vol.Optional(
+                    "price_window",
+                    default=current.get("price_window", DEFAULT_PRICE_WINDOW),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=10000)),
+                # Block rates by energy used per day or billing period
+                vol.Optional(
+                    "import_blocks",
+                    description={"suggested_value": current.get("import_blocks")},
+                ): selector.ObjectSelector(),
+                vol.Optional(
+                    "export_blocks",
+                    description={"suggested_value": current.get("export_blocks")},
+                ): selector.ObjectSelector(),
+                vol.Optional(
+                    "block_period",
+                    default=current.get("block_period", BLOCK_PERIOD_DAY),
+                ): selector.SelectSelector(
+                    selector.SelectSelectorConfig(
+                        options=[BLOCK_PERIOD_DAY, BLOCK_PERIOD_BILLING],
+                        translation_key="block_period",
+                    )
+                ),
+                # Peak demand from a power sensor or energy meter
+                vol.Optional(
+                    "demand_sensor",
+                    description={"suggested_value": current.get("demand_sensor")},
+                ): selector.EntitySelector(
+                    selector.EntitySelectorConfig(
+                        domain="sensor", device_class=["power", "energy"]
+                    )
+                ),
+                vol.Optional(
+                    "demand_window",
+                    default=current.get("demand_window", DEFAULT_DEMAND_WINDOW),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=1440)),
+                vol.Optional(
+                    "demand_charge", default=current.get("demand_charge", 0.0)
+                ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Optional(
+                    "demand_bands",
+                    description={"suggested_value": current.get("demand_bands")},
+                ): selector.TextSelector(selector.TextSelectorConfig(multiple=True)),
+                vol.Optional(
+                    "demand_billing_day", default=current.get("demand_billing_day", 1)
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=28)),
+                # Days priced with the holiday profile: dates, or an ICS file
+                vol.Optional(
+                    "holidays", description={"suggested_value": current.get("holidays")}
+                ): selector.TextSelector(selector.TextSelectorConfig(multiple=True)),
+                vol.Optional(
+                    "holiday_file",
+                    description={"suggested_value": current.get("holiday_file")},
+                ): selector.TextSelector(),
+                # Self-consumption by band from solar and load or grid power
+                vol.Optional(
+                    "solar_power_sensor",
+                    description={"suggested_value": current.get("solar_power_sensor")},
+                ): selector.EntitySelector(
+                    selector.EntitySelectorConfig(domain="sensor", device_class="power")
+                ),
+                vol.Optional(
+                    "load_power_sensor",
+                    description={"suggested_value": current.get("load_power_sensor")},
+                ): selector.EntitySelector(
+                    selector.EntitySelectorConfig(domain="sensor", device_class="power")
+                ),
+                vol.Optional(
+                    "grid_power_sensor",
+                    description={"suggested_value": current.get("grid_power_sensor")},
+                ): selector.EntitySelector(
+                    selector.EntitySelectorConfig(domain="sensor", device_class="power")
+                ),
+                # Projected savings from a solar forecast and the learned load
+                vol.Optional(
+                    "solar_forecast_sensor",
+                    description={
+                        "suggested_value": current.get("solar_forecast_sensor")
+                    },
+                ): selector.EntitySelector(
+                    selector.EntitySelectorConfig(domain="sensor")
+                ),
+                vol.Optional(
+                    "solar_forecast_attribute",
+                    description={
+                        "suggested_value": current.get("solar_forecast_attribute")
+                    },
+                ): selector.TextSelector(),
+                vol.Optional(
+                    "load_history_days",
+                    default=current.get("load_history_days", DEFAULT_LOAD_HISTORY_DAYS),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=365)),
+                # Battery charge and discharge planning
+                vol.Optional(
+                    "battery_capacity",
+                    description={"suggested_value": current.get("battery_capacity")},
+                ): vol.All(vol.Coerce(float), vol.Range(min=0, min_included=False)),
+                vol.Optional(
+                    "battery_power",
+                    description={"suggested_value": current.get("battery_power")},
+                ): vol.All(vol.Coerce(float), vol.Range(min=0, min_included=False)),
+                vol.Optional(
+                    "battery_efficiency",
+                    default=current.get(
+                        "battery_efficiency", DEFAULT_BATTERY_EFFICIENCY
+                    ),
+                ): vol.All(vol.Coerce(float), vol.Range(min=1, max=100)),
+                vol.Optional(
+                    "battery_soc_sensor",
+                    description={"suggested_value": current.get("battery_soc_sensor")},
+                ): selector.EntitySelector(
+                    selector.EntitySelectorConfig(
+                        domain="sensor", device_class="battery"
+                    )
+                ),
+                vol.Optional(
+                    "battery_horizon",
+                    default=current.get("battery_horizon", DEFAULT_BATTERY_HORIZON),
+                ): vol.All(vol.Coerce(int), vol.Range(min=24, max=48)),
+                # Latency histograms of the hot paths, with diagnostic sensors
+                vol.Optional(
+                    "instrumentation", default=current.get("instrumentation", False)
+                ): bool,
             }
         )
 
-        return self.async_show_form(step_id="init", data_schema=schema)
\ No newline at end of file
+        return self.async_show_form(step_id="init", data_schema=schema, errors=errors)
+
+    async def _async_validate(self, user_input: dict[str, Any]) -> dict[str, str]:
+        """Check the submitted options, normalising them in place."""
+        errors: dict[str, str] = {}
+
+        for key, validate, error in STRUCTURED_OPTIONS:
+            if user_input.get(key):
+                try:
+                    user_input[key] = validate(user_input[key])
+                except (KeyError, TypeError, ValueError):
+                    errors[key] = error
+
+        if (
+            user_input.get("time_zone")
+            and await dt_util.async_get_time_zone(user_input["time_zone"]) is None
+        ):
+            errors["time_zone"] = "invalid_time_zone"
+
+        if user_input.get("holidays"):
+            try:
+                parse_holidays(user_input["holidays"])
+            except ValueError:
+                errors["holidays"] = "invalid_holidays"
+
+        if path := user_input.get("holiday_file"):
+            allowed = self.hass.config.is_allowed_path(path)
+            if not allowed or not await self.hass.async_add_executor_job(
+                os.path.isfile, path
+            ):
+                errors["holiday_file"] = "invalid_holiday_file"
+
+        if user_input.get("tariff_type") == TARIFF_DYNAMIC and not user_input.get(
+            "price_sensor"
+        ):
+            errors["price_sensor"] = "price_sensor_required"
+
+        return errors
@@ -1,3 +1,64 @@
 """Constants for the Solar Savings integration."""
 
-DOMAIN = "solar_savings"
\ No newline at end of file
+DOMAIN = "solar_savings"
+
+# Dispatcher signal fired when an entry's options are applied in place.
+# Format with the config entry id.
+SIGNAL_TARIFF_UPDATED = f"{DOMAIN}_tariff_updated_{{}}"
+
+# Dispatcher signal fired when a schedule helper is added, removed or
+# renamed. Shared by every entry.
+SIGNAL_SCHEDULES_UPDATED = f"{DOMAIN}_schedules_updated"
+
+# Dispatcher signal fired when the rate coordinator resolves new rates.
+# Format with the config entry id.
+SIGNAL_RATE_UPDATED = f"{DOMAIN}_rate_updated_{{}}"
+
+# Dispatcher signal fired when the savings engine totals change.
+# Format with the config entry id; the band key whose import totals
+# changed, or None, is passed as an argument.
+SIGNAL_SAVINGS_UPDATED = f"{DOMAIN}_savings_updated_{{}}"
+
+# Dispatcher signal fired when throttled totals must be written now, such
+# as at a band transition. Format with the config entry id.
+SIGNAL_SAVINGS_FLUSH = f"{DOMAIN}_savings_flush_{{}}"
+
+# Dispatcher signal fired when a dynamic tariff's price feed changes.
+# Format with the config entry id.
+SIGNAL_PRICE_UPDATED = f"{DOMAIN}_price_updated_{{}}"
+
+# Dispatcher signal fired when the demand tracker closes a minute.
+# Format with the config entry id.
+SIGNAL_DEMAND_UPDATED = f"{DOMAIN}_demand_updated_{{}}"
+
+# Dispatcher signal fired when self-consumption from the power sensors
+# is counted. Format with the config entry id.
+SIGNAL_SELF_CONSUMPTION_UPDATED = f"{DOMAIN}_self_consumption_updated_{{}}"
+
+# Dispatcher signal fired when the projection for the rest of the day
+# changes or moves to the next hour. Format with the config entry id.
+SIGNAL_PROJECTION_UPDATED = f"{DOMAIN}_projection_updated_{{}}"
+
+# Dispatcher signal fired when the battery plan is solved again.
+# Format with the config entry id.
+SIGNAL_PLAN_UPDATED = f"{DOMAIN}_plan_updated_{{}}"
+
+# Defaults for the state write throttle
+DEFAULT_MIN_WRITE_INTERVAL = 30
+DEFAULT_MIN_CHANGE_THRESHOLD = 0.0
+
+# Prices kept for the rolling price sensors: a day of 5 minute prices
+DEFAULT_PRICE_WINDOW = 288
+
+# Minutes averaged for demand, as billed by most demand tariffs
+DEFAULT_DEMAND_WINDOW = 30
+
+# Solar forecast attribute read by default: Solcast's hourly forecast
+DEFAULT_SOLAR_FORECAST_ATTRIBUTE = "detailedHourly"
+
+# Days of recorded history the load profile is learned from
+DEFAULT_LOAD_HISTORY_DAYS = 28
+
+# Battery planning: round trip efficiency in percent, and hours planned
+DEFAULT_BATTERY_EFFICIENCY = 90
+DEFAULT_BATTERY_HORIZON = 24
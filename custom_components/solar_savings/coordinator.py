@@ -0,0 +1,211 @@
+"""Per-entry rate coordinator for Solar Savings."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.dispatcher import (
+    async_dispatcher_connect,
+    async_dispatcher_send,
+)
+from homeassistant.helpers.event import async_track_point_in_time
+from homeassistant.util import dt as dt_util
+
+from .const import SIGNAL_RATE_UPDATED
+from .instrumentation import RATE_RESOLUTION, Instrumentation, instrumented
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from datetime import datetime
+
+    from .prices import PriceFeed
+    from .tariff import RateBand, SolarSavingsTariff
+
+
+@dataclass(frozen=True, slots=True)
+class RateSnapshot:
+    """The rates in force from one transition until the next."""
+
+    band: RateBand
+    # Cents per kWh
+    export_rate: float
+    since: datetime
+    until: datetime | None
+
+    def covers(self, when: datetime) -> bool:
+        """Return True if a time falls inside this snapshot."""
+        return self.since <= when and (self.until is None or when < self.until)
+
+
+@dataclass(frozen=True, slots=True)
+class RatePresentation:
+    """
+    One way of showing a rate: a unit, a scale and a tax treatment.
+
+    Every presentation reads the coordinator's snapshot, so adding one
+    adds a state write per transition but no lookups or timers.
+    """
+
+    key: str
+    name: str
+    # Converts a rate in cents to the presented value
+    convert: Callable[[float], float]
+    unit: str
+    precision: int
+
+
+class RateCoordinator:
+    """
+    Resolve an entry's rates once per transition and fan them out.
+
+    A single timer is armed for the next band or tariff version change.
+    When it fires, or the tariff changes, the rates are looked up once and
+    announced with a dispatcher signal; the current rate sensors and the
+    savings engine read the shared snapshot instead of resolving it
+    themselves. On a dynamic tariff every new price from the feed is a
+    transition.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        tariff: SolarSavingsTariff,
+        feed: PriceFeed | None = None,
+        instrumentation: Instrumentation | None = None,
+    ) -> None:
+        """Initialize the coordinator."""
+        self.hass = hass
+        self.tariff = tariff
+        self.feed = feed
+        self.instrumentation = instrumentation
+        # Timed in place; without instrumentation this is the plain method
+        self._async_resolve = instrumented(
+            self._async_resolve, instrumentation, RATE_RESOLUTION
+        )
+        self.signal = SIGNAL_RATE_UPDATED.format(tariff.entry_id)
+        self.snapshot: RateSnapshot | None = None
+        self._unsub_timer: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        """Resolve the current rates; returns a callback to stop."""
+        unsubs = [
+            async_dispatcher_connect(self.hass, self.tariff.signal, self._async_refresh)
+        ]
+        if self.feed:
+            unsubs.append(
+                async_dispatcher_connect(
+                    self.hass, self.feed.signal, self._async_refresh
+                )
+            )
+        self._async_resolve(dt_util.utcnow())
+
+        @callback
+        def _async_stop() -> None:
+            for unsub in unsubs:
+                unsub()
+            self._async_cancel_timer()
+
+        return _async_stop
+
+    def band_at(self, when: datetime) -> RateBand:
+        """Return the band in force at a time, from the snapshot if it covers it."""
+        if (snapshot := self.snapshot) is not None and snapshot.covers(when):
+            return snapshot.band
+        return self.tariff.resolve(when)
+
+    def export_rate_at(self, when: datetime) -> float:
+        """Return the export rate in force at a time, from the snapshot if valid."""
+        if (snapshot := self.snapshot) is not None and snapshot.covers(when):
+            return snapshot.export_rate
+        return self.tariff.export_rate_at(when)
+
+    @callback
+    def _async_refresh(self) -> None:
+        """Resolve the rates again after the tariff or the price changed."""
+        self._async_resolve(dt_util.utcnow())
+
+    @callback
+    def _async_handle_transition(self, now: datetime) -> None:
+        """Resolve the rates as the band or tariff version changes."""
+        self._unsub_timer = None
+        self._async_resolve(now)
+
+    @callback
+    def _async_resolve(self, now: datetime) -> None:
+        """Look up the rates, announce them and arm the next timer."""
+        until = self.tariff.next_transition(now)
+        band = self.tariff.resolve(now)
+        if self.feed and (spot := self.feed.band) is not None:
+            band = spot
+        self.snapshot = RateSnapshot(band, self.tariff.export_rate_at(now), now, until)
+        async_dispatcher_send(self.hass, self.signal)
+
+        self._async_cancel_timer()
+        if until is not None:
+            self._unsub_timer = async_track_point_in_time(
+                self.hass, self._async_handle_transition, until
+            )
+
+    @callback
+    def _async_cancel_timer(self) -> None:
+        """Cancel the pending transition timer."""
+        if self._unsub_timer:
+            self._unsub_timer()
+            self._unsub_timer = None
+
+
+def rate_presentations(
+    currency: str, tax_rate: float, *, rates_include_tax: bool
+) -> list[RatePresentation]:
+    """
+    Return the presentations for an entry's rate options.
+
+    Rates are always shown in cents and in the currency. With a tax rate,
+    each is also shown with tax removed, or added if the rates exclude it.
+    """
+    presentations = [
+        RatePresentation("cents", "Cents", _identity, "c/kWh", 2),
+        RatePresentation("dollars", "Dollars", _to_dollars, f"{currency}/kWh", 4),
+    ]
+    if not tax_rate:
+        return presentations
+
+    factor = 1 + tax_rate / 100.0
+    if rates_include_tax:
+        key, label, adjust = "excl_tax", "excl. Tax", 1 / factor
+    else:
+        key, label, adjust = "incl_tax", "incl. Tax", factor
+
+    return [
+        *presentations,
+        *(
+            RatePresentation(
+                f"{presentation.key}_{key}",
+                f"{presentation.name}, {label}",
+                _scaled(presentation.convert, adjust),
+                presentation.unit,
+                presentation.precision,
+            )
+            for presentation in presentations
+        ),
+    ]
+
+
+def _identity(cents: float) -> float:
+    """Return a rate in cents unchanged."""
+    return cents
+
+
+def _to_dollars(cents: float) -> float:
+    """Return a rate in cents as dollars."""
+    return cents / 100.0
+
+
+def _scaled(
+    convert: Callable[[float], float], factor: float
+) -> Callable[[float], float]:
+    """Return a conversion followed by a tax adjustment."""
+    return lambda cents: convert(cents) * factor
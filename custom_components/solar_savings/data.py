@@ -0,0 +1,32 @@
+"""Runtime data for Solar Savings config entries."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .coordinator import RateCoordinator
+    from .demand import DemandTracker
+    from .engine import SavingsEngine
+    from .forecast import ForecastProjector
+    from .instrumentation import Instrumentation
+    from .planner import BatteryPlanner
+    from .prices import PriceFeed
+    from .self_consumption import SelfConsumptionTracker
+    from .tariff import SolarSavingsTariff
+
+
+@dataclass
+class SolarSavingsData:
+    """Objects shared by the platforms of one config entry."""
+
+    tariff: SolarSavingsTariff
+    coordinator: RateCoordinator
+    engine: SavingsEngine | None = None
+    prices: PriceFeed | None = None
+    demand: DemandTracker | None = None
+    self_consumption: SelfConsumptionTracker | None = None
+    projector: ForecastProjector | None = None
+    planner: BatteryPlanner | None = None
+    instrumentation: Instrumentation | None = None
@@ -1,15 +1,22 @@
 """Date platform for Solar Savings."""
+
 from __future__ import annotations
 
 from datetime import date
+from typing import TYPE_CHECKING
+
 from homeassistant.components.date import DateEntity
-from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import EntityCategory
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.device_registry import DeviceInfo
-from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN
+from .entity import SolarSavingsEntity
+
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant
+    from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+    from .tariff import SolarSavingsTariff
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -17,22 +24,23 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up the Solar Savings date entity."""
-    
-    async_add_entities([
-        SolarSavingsEffectiveDate(hass, entry)
-    ])
+    async_add_entities(
+        [SolarSavingsEffectiveDate(hass, entry, entry.runtime_data.tariff)]
+    )
 
 
-class SolarSavingsEffectiveDate(DateEntity):
+class SolarSavingsEffectiveDate(SolarSavingsEntity, DateEntity):
     """Representation of the Effective Date for rate changes."""
 
-    _attr_has_entity_name = True
     _attr_name = "Effective Date"
     _attr_icon = "mdi:calendar-clock"
-    _attr_entity_category = EntityCategory.CONFIG # Appears in Configuration section
+    _attr_entity_category = EntityCategory.CONFIG  # Appears in Configuration section
 
-    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
+    def __init__(
+        self, hass: HomeAssistant, entry: ConfigEntry, tariff: SolarSavingsTariff
+    ) -> None:
         """Initialize the date entity."""
+        super().__init__(tariff)
         self.hass = hass
         self._entry = entry
         self._attr_unique_id = f"{entry.entry_id}_scheduled_date"
@@ -40,7 +48,7 @@ class SolarSavingsEffectiveDate(DateEntity):
     @property
     def native_value(self) -> date | None:
         """Return the value of the date."""
-        date_str = self._entry.options.get("scheduled_date")
+        date_str = self.tariff.get("scheduled_date")
         if date_str:
             return date.fromisoformat(date_str)
         return None
@@ -49,18 +57,5 @@ class SolarSavingsEffectiveDate(DateEntity):
         """Update the date."""
         new_options = self._entry.options.copy()
         new_options["scheduled_date"] = value.isoformat()
-        
-        self.hass.config_entries.async_update_entry(
-            self._entry, 
-            options=new_options
-        )
 
-    @property
-    def device_info(self) -> DeviceInfo:
-        """Return device information."""
-        return DeviceInfo(
-            identifiers={(DOMAIN, self._entry.entry_id)},
-            name="Solar Savings",
-            manufacturer="Solar Savings Integration",
-            model="Savings Calculator",
-        )
\ No newline at end of file
+        self.hass.config_entries.async_update_entry(self._entry, options=new_options)
@@ -0,0 +1,304 @@
+"""Peak demand tracking for Solar Savings."""
+
+from __future__ import annotations
+
+import logging
+from array import array
+from collections import deque
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.const import (
+    ATTR_UNIT_OF_MEASUREMENT,
+    STATE_UNAVAILABLE,
+    STATE_UNKNOWN,
+    UnitOfPower,
+)
+from homeassistant.core import (
+    CALLBACK_TYPE,
+    Event,
+    EventStateChangedData,
+    HomeAssistant,
+    callback,
+)
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import (
+    async_track_state_change_event,
+    async_track_utc_time_change,
+)
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import SIGNAL_DEMAND_UPDATED
+from .engine import (
+    ENERGY_FACTORS,
+    SAVE_DELAY,
+    STORAGE_VERSION,
+    MeterTracker,
+    storage_key,
+)
+from .instrumentation import STATE_CHANGE, instrumented
+from .tariff import SolarSavingsTariff, billing_period_start
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from .coordinator import RateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+# Power units accepted from a demand sensor, as a factor to kW. Any other
+# unit is read as a cumulative energy meter.
+POWER_FACTORS = {
+    UnitOfPower.WATT: 0.001,
+    UnitOfPower.KILO_WATT: 1.0,
+    UnitOfPower.MEGA_WATT: 1000.0,
+}
+
+SECONDS_PER_HOUR = 3600
+
+
+class RollingDemand:
+    """
+    Average power over the last whole minutes, from per-minute energy.
+
+    The energy of each closed minute goes into a fixed ring of buckets
+    with a running sum, so the demand after every minute is one
+    subtraction and one addition.
+    """
+
+    __slots__ = ("_buckets", "_hours", "_index", "_sum")
+
+    def __init__(self, minutes: int) -> None:
+        """Initialize an empty window."""
+        self._buckets = array("d", bytes(8 * minutes))
+        self._index = 0
+        self._sum = 0.0
+        self._hours = minutes / 60
+
+    def push(self, kwh: float) -> float:
+        """Close a minute with its energy; return the demand in kW."""
+        buckets = self._buckets
+        self._sum += kwh - buckets[self._index]
+        buckets[self._index] = kwh
+        self._index = (self._index + 1) % len(buckets)
+        if self._index == 0:
+            # Re-add the sum once per lap so rounding errors cannot build up
+            self._sum = sum(buckets)
+        return max(self._sum, 0.0) / self._hours
+
+
+class SlidingWindowMax:
+    """
+    Largest value of timed samples since a moving start time.
+
+    The deque keeps only samples that are larger than every later one, in
+    time order, so its head is the maximum. Each sample is appended and
+    removed at most once: amortised constant time per sample.
+    """
+
+    __slots__ = ("_samples",)
+
+    def __init__(self, samples: Iterable[tuple[float, float]] = ()) -> None:
+        """Initialize the window, e.g. from stored samples."""
+        self._samples: deque[tuple[float, float]] = deque()
+        for when, value in samples:
+            self.push(when, value)
+
+    def push(self, when: float, value: float) -> None:
+        """Add a sample."""
+        samples = self._samples
+        while samples and samples[-1][1] <= value:
+            samples.pop()
+        samples.append((when, value))
+
+    def evict_before(self, start: float) -> None:
+        """Drop the samples taken before a time."""
+        samples = self._samples
+        while samples and samples[0][0] < start:
+            samples.popleft()
+
+    @property
+    def maximum(self) -> float | None:
+        """Return the largest value in the window."""
+        return self._samples[0][1] if self._samples else None
+
+    @property
+    def maximum_time(self) -> float | None:
+        """Return when the largest value was taken, as a timestamp."""
+        return self._samples[0][0] if self._samples else None
+
+    def as_list(self) -> list[tuple[float, float]]:
+        """Return the samples that can still become the maximum."""
+        return list(self._samples)
+
+
+class DemandTracker:
+    """
+    Rolling and billing-period peak demand for an entry.
+
+    The demand sensor may report power, integrated over time, or a
+    cumulative energy meter. Energy is collected per minute; when a minute
+    closes the rolling demand is updated and, if the band in force counts
+    for demand, offered to the billing period's sliding maximum. Nothing
+    is rescanned: every update and every minute is constant work.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        tariff: SolarSavingsTariff,
+        coordinator: RateCoordinator,
+    ) -> None:
+        """Initialize the tracker."""
+        self.hass = hass
+        self.tariff = tariff
+        self.coordinator = coordinator
+        self.signal = SIGNAL_DEMAND_UPDATED.format(tariff.entry_id)
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, demand_storage_key(tariff.entry_id)
+        )
+        self._save_scheduled = False
+
+        self.rolling = RollingDemand(tariff.demand_window)
+        self.peak = SlidingWindowMax()
+        # Latest rolling demand in kW
+        self.demand: float | None = None
+        self.period_start: datetime = billing_period_start(
+            dt_util.now(tariff.time_zone), tariff.demand_billing_day
+        )
+
+        # Energy collected in the open minute
+        self._minute_kwh = 0.0
+        # Power mode: the last power in kW and when it was reported
+        self._power: float | None = None
+        self._power_since: float | None = None
+        # Energy mode. The first reading after a start only sets the
+        # baseline, so energy used while stopped is not one minute's demand.
+        self._meter = MeterTracker(lambda: self.tariff.get("meter_rollover"))
+
+    @property
+    def entity_id(self) -> str:
+        """Return the demand sensor."""
+        return self.tariff.get("demand_sensor")
+
+    @property
+    def peak_demand(self) -> float:
+        """Return the billing period's peak demand in kW."""
+        return self.peak.maximum or 0.0
+
+    @property
+    def projected_charge(self) -> float:
+        """Return the demand charge for the period so far, in the currency."""
+        return self.peak_demand * self.tariff.demand_charge
+
+    async def async_load(self) -> None:
+        """Resume the billing period saved by a previous run."""
+        if (data := await self._store.async_load()) is None:
+            return
+        stored_start = dt_util.parse_datetime(data["period_start"])
+        if stored_start == self.period_start:
+            self.peak = SlidingWindowMax(tuple(sample) for sample in data["peak"])
+
+    async def async_save(self) -> None:
+        """Write the billing period now, e.g. when the entry unloads."""
+        await self._store.async_save(self._data_to_save())
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        """Save within SAVE_DELAY of the first unsaved change."""
+        if not self._save_scheduled:
+            self._save_scheduled = True
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the billing period's peak samples."""
+        self._save_scheduled = False
+        return {
+            "period_start": self.period_start.isoformat(),
+            "peak": self.peak.as_list(),
+        }
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        """Follow the demand sensor; returns a callback to stop."""
+        unsubs = [
+            async_track_state_change_event(
+                self.hass,
+                [self.entity_id],
+                instrumented(
+                    self._handle_reading, self.coordinator.instrumentation, STATE_CHANGE
+                ),
+            ),
+            async_track_utc_time_change(self.hass, self._async_close_minute, second=0),
+        ]
+
+        @callback
+        def _async_stop() -> None:
+            for unsub in unsubs:
+                unsub()
+
+        return _async_stop
+
+    @callback
+    def _handle_reading(self, event: Event[EventStateChangedData]) -> None:
+        """Collect the energy of a new power or meter reading."""
+        new_state = event.data["new_state"]
+        if new_state is None or new_state.state in (STATE_UNKNOWN, STATE_UNAVAILABLE):
+            return
+
+        unit = new_state.attributes.get(ATTR_UNIT_OF_MEASUREMENT)
+        try:
+            value = float(new_state.state)
+        except ValueError:
+            _LOGGER.debug("Ignoring non-numeric reading from %s", new_state.entity_id)
+            return
+
+        if unit in POWER_FACTORS:
+            now = new_state.last_updated.timestamp()
+            self._accrue_power(now)
+            self._power = value * POWER_FACTORS[unit]
+            self._power_since = now
+        else:
+            delta = self._meter.delta(value * ENERGY_FACTORS.get(unit, 1.0))
+            self._minute_kwh += max(delta, 0.0)
+
+    def _accrue_power(self, now: float) -> None:
+        """Add the energy of the last reported power up to a time."""
+        if self._power is not None and self._power_since is not None:
+            self._minute_kwh += (
+                self._power * max(now - self._power_since, 0.0) / SECONDS_PER_HOUR
+            )
+            self._power_since = now
+
+    @callback
+    def _async_close_minute(self, now: datetime) -> None:
+        """Update the rolling demand and the period's peak."""
+        self._accrue_power(now.timestamp())
+        self.demand = self.rolling.push(self._minute_kwh)
+        self._minute_kwh = 0.0
+
+        start = billing_period_start(
+            now.astimezone(self.tariff.time_zone), self.tariff.demand_billing_day
+        )
+        if start != self.period_start:
+            self.period_start = start
+            self.peak.evict_before(start.timestamp())
+            self._async_schedule_save()
+
+        # The minute that just ended decides whether it counts
+        bands = self.tariff.demand_bands
+        if (
+            not bands
+            or self.coordinator.band_at(now - timedelta(seconds=1)).key in bands
+        ):
+            self.peak.push(now.timestamp(), self.demand)
+            self._async_schedule_save()
+
+        async_dispatcher_send(self.hass, self.signal)
+
+
+def demand_storage_key(entry_id: str) -> str:
+    """Return the key of an entry's demand store."""
+    return f"{storage_key(entry_id)}.demand"
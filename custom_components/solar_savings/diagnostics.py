@@ -0,0 +1,58 @@
+"""Diagnostics support for Solar Savings."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant
+
+    from .data import SolarSavingsData
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant,  # noqa: ARG001 - required by the diagnostics platform
+    entry: ConfigEntry,
+) -> dict[str, Any]:
+    """Return the entry's options, the rates in force and the hot path timings."""
+    data: SolarSavingsData = entry.runtime_data
+    tariff = data.tariff
+    snapshot = data.coordinator.snapshot
+
+    return {
+        "data": dict(entry.data),
+        "options": dict(entry.options),
+        "tariff": {
+            "dynamic": tariff.is_dynamic,
+            "bands": [
+                {"key": band.key, "name": band.name, "rate": band.rate}
+                for band in tariff.bands
+            ],
+            "versions": len(tariff.timeline),
+            "holidays": bool(tariff.holidays),
+        },
+        "rates": None
+        if snapshot is None
+        else {
+            "band": snapshot.band.key,
+            "import_rate": snapshot.band.rate,
+            "export_rate": snapshot.export_rate,
+            "since": snapshot.since.isoformat(),
+            "until": None if snapshot.until is None else snapshot.until.isoformat(),
+        },
+        "trackers": {
+            "engine": data.engine is not None,
+            "prices": data.prices is not None,
+            "demand": data.demand is not None,
+            "self_consumption": data.self_consumption is not None,
+            "projector": data.projector is not None,
+            "planner": data.planner is not None,
+        },
+        "late_power_samples": None
+        if data.self_consumption is None
+        else data.self_consumption.late_samples,
+        "instrumentation": None
+        if data.instrumentation is None
+        else data.instrumentation.as_dict(),
+    }
@@ -0,0 +1,415 @@
+"""Incremental savings engine for Solar Savings."""
+
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.const import (
+    ATTR_UNIT_OF_MEASUREMENT,
+    STATE_UNAVAILABLE,
+    STATE_UNKNOWN,
+    UnitOfEnergy,
+)
+from homeassistant.core import (
+    CALLBACK_TYPE,
+    Event,
+    EventStateChangedData,
+    HomeAssistant,
+    callback,
+)
+from homeassistant.helpers.dispatcher import (
+    async_dispatcher_connect,
+    async_dispatcher_send,
+)
+from homeassistant.helpers.event import (
+    async_track_state_change_event,
+    async_track_utc_time_change,
+)
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .blocks import BlockCounter
+from .const import DOMAIN, SIGNAL_SAVINGS_FLUSH, SIGNAL_SAVINGS_UPDATED
+from .instrumentation import STATE_CHANGE, instrumented
+from .statistics import HourlyStatistics
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from datetime import datetime
+
+    from .coordinator import RateCoordinator
+    from .tariff import SolarSavingsTariff
+
+_LOGGER = logging.getLogger(__name__)
+
+# Energy units accepted from the meters, as a factor to kWh
+ENERGY_FACTORS = {
+    UnitOfEnergy.WATT_HOUR: 0.001,
+    UnitOfEnergy.KILO_WATT_HOUR: 1.0,
+    UnitOfEnergy.MEGA_WATT_HOUR: 1000.0,
+}
+
+# A reading below this share of the previous one is a meter reset; a
+# smaller dip is treated as noise and ignored until the meter recovers.
+RESET_RATIO = 0.9
+
+# Within this share of the rollover value a drop is treated as a wrap
+ROLLOVER_MARGIN = 0.1
+
+STORAGE_VERSION = 1
+
+# Seconds to wait for more updates before writing the snapshot
+SAVE_DELAY = 60
+
+# Running totals kept by the engine
+TOTAL_KEYS = (
+    "import_energy",
+    "export_energy",
+    "solar_energy",
+    "self_consumed_energy",
+    "import_cost",
+    "export_credit",
+    "avoided_cost",
+)
+
+
+class MeterTracker:
+    """Turn readings from a cumulative energy meter into deltas."""
+
+    __slots__ = ("_last", "_rollover")
+
+    def __init__(self, rollover: Callable[[], float | None]) -> None:
+        """Initialize the tracker."""
+        self._last: float | None = None
+        self._rollover = rollover
+
+    @property
+    def last(self) -> float | None:
+        """Return the last reading in kWh."""
+        return self._last
+
+    @last.setter
+    def last(self, reading: float | None) -> None:
+        """Set the last reading, e.g. when restoring."""
+        self._last = reading
+
+    def delta(self, reading: float) -> float:
+        """Return the kWh consumed since the previous reading."""
+        last = self._last
+        if last is None:
+            self._last = reading
+            return 0.0
+
+        if reading >= last:
+            self._last = reading
+            return reading - last
+
+        rollover = self._rollover()
+        if rollover and last >= rollover * (1 - ROLLOVER_MARGIN):
+            # Counter wrapped: count up to the rollover value, then from zero
+            self._last = reading
+            return rollover - last + reading
+
+        if reading < last * RESET_RATIO:
+            # Meter reset: everything since zero is new
+            self._last = reading
+            return reading
+
+        # Small dip, e.g. a rounding glitch; wait for the meter to recover
+        return 0.0
+
+
+class SavingsEngine:
+    """
+    Running import cost, export credit and savings for an entry.
+
+    Each meter update is attributed to the rate in force when it arrives,
+    read from the rate coordinator's snapshot, so the work per update is a
+    few additions no matter how long the entry has been running or how
+    many bands the tariff has.
+
+    Self-consumption is taken as solar production minus export. It is
+    counted against a high-water mark so the avoided cost never decreases,
+    even when the export meter reports ahead of the solar meter.
+
+    The totals and last meter readings are kept in a per-entry store, so
+    a restart resumes from one small file instead of recorder history.
+
+    With publish_statistics set, the totals are also published once an
+    hour as external statistics.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        tariff: SolarSavingsTariff,
+        coordinator: RateCoordinator,
+    ) -> None:
+        """Initialize the engine."""
+        self.hass = hass
+        self.tariff = tariff
+        self.coordinator = coordinator
+        self.signal = SIGNAL_SAVINGS_UPDATED.format(tariff.entry_id)
+        self.flush_signal = SIGNAL_SAVINGS_FLUSH.format(tariff.entry_id)
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, storage_key(tariff.entry_id)
+        )
+        self._save_scheduled = False
+
+        self.totals: dict[str, float] = dict.fromkeys(TOTAL_KEYS, 0.0)
+        # band key -> [kWh, cents]
+        self.band_totals: dict[str, list[float]] = {}
+
+        rollover = self._rollover
+        # meter entity id -> (tracker, handler returning the band key touched)
+        self._meters: dict[
+            str,
+            tuple[
+                MeterTracker,
+                Callable[[float, datetime, datetime | None], str | None],
+            ],
+        ] = {}
+        for key, handler in (
+            ("grid_import_sensor", self._add_import),
+            ("grid_export_sensor", self._add_export),
+            ("solar_production_sensor", self._add_solar),
+        ):
+            if entity_id := tariff.get(key):
+                self._meters[entity_id] = (MeterTracker(rollover), handler)
+
+        # Solar minus export; self_consumed_energy is its high-water mark
+        self._net_solar = 0.0
+
+        # Block rates replace the band or export rate while configured
+        self.blocks: dict[str, BlockCounter] = {
+            key: BlockCounter(blocks, tariff.block_period, tariff.demand_billing_day)
+            for key, blocks in (
+                ("import", tariff.import_blocks),
+                ("export", tariff.export_blocks),
+            )
+            if blocks
+        }
+
+        self.statistics: HourlyStatistics | None = None
+        if tariff.get("publish_statistics"):
+            self.statistics = HourlyStatistics(hass, tariff.entry_id)
+
+    @property
+    def entity_ids(self) -> list[str]:
+        """Return the meters followed by the engine."""
+        return list(self._meters)
+
+    @property
+    def net_savings(self) -> float:
+        """Return the avoided import cost plus export credit, in cents."""
+        return self.totals["avoided_cost"] + self.totals["export_credit"]
+
+    def band_energy(self, key: str) -> float:
+        """Return the kWh imported in a band."""
+        return self.band_totals.get(key, (0.0, 0.0))[0]
+
+    def band_cost(self, key: str) -> float:
+        """Return the cost in cents of the energy imported in a band."""
+        return self.band_totals.get(key, (0.0, 0.0))[1]
+
+    async def async_load(self) -> None:
+        """Load the snapshot saved by a previous run."""
+        data = await self._store.async_load()
+        if self.statistics:
+            await self.statistics.async_load(data and data.get("statistics"))
+        if data is None:
+            return
+
+        for key in TOTAL_KEYS:
+            self.totals[key] = data["totals"].get(key, 0.0)
+        self.band_totals = {key: list(totals) for key, totals in data["bands"].items()}
+        self._net_solar = data.get("net_solar", self.totals["self_consumed_energy"])
+        for key, counter in data.get("blocks", {}).items():
+            if key in self.blocks:
+                self.blocks[key].restore(counter)
+
+        # Only resume meters that are still configured; the energy counted
+        # while Home Assistant was down is added on their next update.
+        for entity_id, reading in data["meters"].items():
+            if entity_id in self._meters:
+                self._meters[entity_id][0].last = reading
+
+        if data.get("tariff_version") != self._active_version():
+            _LOGGER.debug(
+                "Tariff version changed from %s to %s while stopped",
+                data.get("tariff_version"),
+                self._active_version(),
+            )
+
+    async def async_save(self) -> None:
+        """Write the snapshot now, e.g. when the entry unloads."""
+        await self._store.async_save(self._data_to_save())
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        """
+        Save within SAVE_DELAY of the first unsaved update.
+
+        The store pushes a pending save back on every call, which would
+        postpone it forever at a meter's update rate, so only the first
+        update after a save schedules one.
+        """
+        if not self._save_scheduled:
+            self._save_scheduled = True
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the snapshot of the totals and meter readings."""
+        self._save_scheduled = False
+        return {
+            "totals": self.totals,
+            "bands": self.band_totals,
+            "net_solar": self._net_solar,
+            "meters": {
+                entity_id: tracker.last
+                for entity_id, (tracker, _handler) in self._meters.items()
+                if tracker.last is not None
+            },
+            "tariff_version": self._active_version(),
+            "blocks": {key: counter.as_dict() for key, counter in self.blocks.items()},
+            "statistics": self.statistics.as_dict() if self.statistics else None,
+        }
+
+    def _active_version(self) -> str | None:
+        """Return the effective date of the tariff version in force."""
+        version = self.tariff.timeline.at(self.tariff.today())
+        return version.effective.isoformat() if version else None
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        """Start following the meters; returns a callback to stop."""
+        unsubs = [
+            async_track_state_change_event(
+                self.hass,
+                self.entity_ids,
+                instrumented(
+                    self._handle_reading, self.coordinator.instrumentation, STATE_CHANGE
+                ),
+            ),
+            async_dispatcher_connect(
+                self.hass, self.coordinator.signal, self._async_handle_transition
+            ),
+        ]
+
+        if self.statistics:
+            # Publish the hour that was open when Home Assistant stopped
+            self._async_roll_hour(dt_util.utcnow())
+            unsubs.append(
+                async_track_utc_time_change(
+                    self.hass, self._async_roll_hour, minute=0, second=0
+                )
+            )
+
+        @callback
+        def _async_stop() -> None:
+            for unsub in unsubs:
+                unsub()
+
+        return _async_stop
+
+    @callback
+    def _async_roll_hour(self, now: datetime) -> None:
+        """Publish the hour that just ended and open the next one."""
+        self.statistics.async_roll(now, self.totals)
+        self._async_schedule_save()
+
+    @callback
+    def _async_handle_transition(self) -> None:
+        """Have throttled sensors write their totals as the rates change."""
+        async_dispatcher_send(self.hass, self.flush_signal)
+
+    def _rollover(self) -> float | None:
+        """Return the value at which the meters wrap to zero, if known."""
+        return self.tariff.get("meter_rollover")
+
+    @callback
+    def _handle_reading(self, event: Event[EventStateChangedData]) -> None:
+        """Attribute a new meter reading to the rate in force."""
+        new_state = event.data["new_state"]
+        if new_state is None or new_state.state in (STATE_UNKNOWN, STATE_UNAVAILABLE):
+            return
+
+        factor = ENERGY_FACTORS.get(
+            new_state.attributes.get(ATTR_UNIT_OF_MEASUREMENT), 1.0
+        )
+        try:
+            reading = float(new_state.state) * factor
+        except ValueError:
+            _LOGGER.debug("Ignoring non-numeric reading from %s", new_state.entity_id)
+            return
+
+        tracker, handler = self._meters[new_state.entity_id]
+        delta = tracker.delta(reading)
+        # Save even without a delta so the latest reading is kept
+        self._async_schedule_save()
+        if delta <= 0:
+            return
+
+        # Block counters split a delta that spans a period reset
+        old_state = event.data["old_state"]
+        since = old_state.last_updated if old_state is not None else None
+        band_key = handler(delta, new_state.last_updated, since)
+        async_dispatcher_send(self.hass, self.signal, band_key)
+
+    def _add_import(
+        self, delta: float, when: datetime, since: datetime | None = None
+    ) -> str:
+        """Add imported energy at the band rate or block in force."""
+        band = self.coordinator.band_at(when)
+        if counter := self.blocks.get("import"):
+            cost = counter.add(delta, when, self.tariff.time_zone, since)
+        else:
+            cost = delta * band.rate
+
+        self.totals["import_energy"] += delta
+        self.totals["import_cost"] += cost
+        totals = self.band_totals.setdefault(band.key, [0.0, 0.0])
+        totals[0] += delta
+        totals[1] += cost
+        return band.key
+
+    def _add_export(
+        self, delta: float, when: datetime, since: datetime | None = None
+    ) -> None:
+        """Add exported energy at the export rate or block in force."""
+        if counter := self.blocks.get("export"):
+            credit = counter.add(delta, when, self.tariff.time_zone, since)
+        else:
+            credit = delta * self.coordinator.export_rate_at(when)
+        self.totals["export_energy"] += delta
+        self.totals["export_credit"] += credit
+        self._net_solar -= delta
+
+    def _add_solar(
+        self, delta: float, when: datetime, _since: datetime | None = None
+    ) -> None:
+        """Add produced energy; what was not exported avoided an import."""
+        self.totals["solar_energy"] += delta
+        self._net_solar += delta
+        self._count_self_consumption(when)
+
+    def _count_self_consumption(self, when: datetime) -> None:
+        """Value new self-consumed energy at the import rate in force."""
+        if (consumed := self._net_solar - self.totals["self_consumed_energy"]) <= 0:
+            return
+
+        self.totals["self_consumed_energy"] += consumed
+        self.totals["avoided_cost"] += consumed * self._import_rate(when)
+
+    def _import_rate(self, when: datetime) -> float:
+        """Return the rate of the next imported kWh, at its block if blocks are set."""
+        if counter := self.blocks.get("import"):
+            return counter.marginal_rate
+        return self.coordinator.band_at(when).rate
+
+
+def storage_key(entry_id: str) -> str:
+    """Return the storage key of an entry's savings snapshot."""
+    return f"{DOMAIN}.{entry_id}"
@@ -0,0 +1,146 @@
+"""Base entity for Solar Savings."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import CALLBACK_TYPE, Event, callback
+from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.event import async_call_later
+
+from .const import DOMAIN
+
+if TYPE_CHECKING:
+    from datetime import datetime
+
+    from .tariff import SolarSavingsTariff
+
+
+class SolarSavingsEntity(Entity):
+    """
+    Common base for every Solar Savings entity.
+
+    Subscribes to the entry's tariff signal so option changes are written
+    straight to the state machine without a reload.
+    """
+
+    _attr_has_entity_name = True
+
+    def __init__(self, tariff: SolarSavingsTariff) -> None:
+        """Initialize the entity."""
+        self.tariff = tariff
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, tariff.entry_id)},
+            name="Solar Savings",
+            manufacturer="Solar Savings Integration",
+            model="Savings Calculator",
+        )
+
+    async def async_added_to_hass(self) -> None:
+        """Register for tariff updates."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass, self.tariff.signal, self._handle_tariff_update
+            )
+        )
+
+    @callback
+    def _handle_tariff_update(self) -> None:
+        """Write the new state after the options changed."""
+        self.async_write_ha_state()
+
+
+class SolarSavingsThrottledEntity(SolarSavingsEntity):
+    """
+    Base for entities that follow a fast-changing input.
+
+    The value behind the entity is always exact; only how often it is
+    written to the state machine is limited. A write happens once the
+    entry's minimum write interval has passed and the value has moved by
+    at least the minimum change threshold. A change held back by the
+    interval is written when the interval ends. A change held back by the
+    threshold is written at the next flush: a band transition, the entity
+    being removed, or Home Assistant stopping.
+
+    Subclasses provide a numeric native_value.
+    """
+
+    _last_write: float = 0.0
+    _written_value: float | None = None
+    _unsub_write: CALLBACK_TYPE | None = None
+
+    async def async_added_to_hass(self) -> None:
+        """Flush pending changes when Home Assistant stops."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.hass.bus.async_listen(
+                EVENT_HOMEASSISTANT_STOP, self._async_handle_stop
+            )
+        )
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Write the final value before the entity goes away."""
+        self.async_flush()
+        self._async_cancel_write()
+        await super().async_will_remove_from_hass()
+
+    @callback
+    def async_write_ha_state(self) -> None:
+        """Write the state and remember what was written."""
+        self._async_cancel_write()
+        # The loop's clock, which the delayed write timer also runs on
+        self._last_write = self.hass.loop.time()
+        self._written_value = self.native_value
+        super().async_write_ha_state()
+
+    @callback
+    def async_write_throttled(self) -> None:
+        """Write the state unless the throttle holds it back."""
+        value = self.native_value
+        if value == self._written_value:
+            return
+
+        threshold = self.tariff.min_change_threshold
+        if (
+            threshold
+            and self._written_value is not None
+            and abs(value - self._written_value) < threshold
+        ):
+            return
+
+        elapsed = self.hass.loop.time() - self._last_write
+        wait = self.tariff.min_write_interval - elapsed
+        if wait <= 0:
+            self.async_write_ha_state()
+        elif self._unsub_write is None:
+            self._unsub_write = async_call_later(
+                self.hass, wait, self._async_handle_write
+            )
+
+    @callback
+    def async_flush(self) -> None:
+        """Write any change the throttle is holding back."""
+        if self.hass is not None and self.native_value != self._written_value:
+            self.async_write_ha_state()
+
+    @callback
+    def _async_cancel_write(self) -> None:
+        """Cancel the pending delayed write."""
+        if self._unsub_write:
+            self._unsub_write()
+            self._unsub_write = None
+
+    @callback
+    def _async_handle_write(self, _now: datetime) -> None:
+        """Write the change held back by the write interval."""
+        self._unsub_write = None
+        self.async_write_ha_state()
+
+    @callback
+    def _async_handle_stop(self, _event: Event) -> None:
+        """Write the final value while Home Assistant stops."""
+        self.async_flush()
@@ -0,0 +1,405 @@
+"""Projected savings for the rest of the day for Solar Savings."""
+
+from __future__ import annotations
+
+import logging
+import math
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, tzinfo
+from typing import Any
+
+import numpy as np
+from homeassistant.components.recorder import get_instance
+from homeassistant.core import (
+    CALLBACK_TYPE,
+    Event,
+    EventStateChangedData,
+    HomeAssistant,
+    callback,
+)
+from homeassistant.helpers.dispatcher import (
+    async_dispatcher_connect,
+    async_dispatcher_send,
+)
+from homeassistant.helpers.event import (
+    async_track_point_in_utc_time,
+    async_track_state_change_event,
+)
+from homeassistant.util import dt as dt_util
+
+from .backfill import (
+    SECONDS_PER_DAY,
+    SECONDS_PER_HOUR,
+    RateTables,
+    fetch_hourly_changes,
+    utc_offsets,
+)
+from .const import (
+    DEFAULT_LOAD_HISTORY_DAYS,
+    DEFAULT_SOLAR_FORECAST_ATTRIBUTE,
+    SIGNAL_PROJECTION_UPDATED,
+)
+from .prices import FORECAST_START_KEYS, forecast_timestamp
+from .tariff import SolarSavingsTariff, start_of_site_day
+
+_LOGGER = logging.getLogger(__name__)
+
+# Keys tried, in order, for the power (kW) of a solar forecast item
+SOLAR_FORECAST_VALUE_KEYS = ("pv_estimate", "power", "value", "energy")
+
+HOURS_PER_DAY = 24
+
+# Meter option -> the key of its hourly series when learning the load
+LOAD_METERS = {
+    "grid_import_sensor": "import",
+    "grid_export_sensor": "export",
+    "solar_production_sensor": "solar",
+}
+
+
+@dataclass(frozen=True, slots=True)
+class Projection:
+    """
+    Projected energy, cost and savings for each hour of a site day.
+
+    Money in cents. The remaining_* arrays hold the sum from each hour to
+    the end of the day, and a final zero for after it, so the rest-of-day
+    figures are a lookup.
+    """
+
+    day: date
+    starts: np.ndarray
+    solar: np.ndarray
+    load: np.ndarray
+    import_cost: np.ndarray
+    savings: np.ndarray
+    remaining_cost: np.ndarray
+    remaining_savings: np.ndarray
+
+    def hour_at(self, when: datetime) -> int:
+        """Return the index of the hour containing a time; past the day, its length."""
+        stamp = when.timestamp()
+        if not len(self.starts) or stamp >= self.starts[-1] + SECONDS_PER_HOUR:
+            return len(self.starts)
+        return max(int(np.searchsorted(self.starts, stamp, side="right")) - 1, 0)
+
+    def next_hour(self, when: datetime) -> datetime | None:
+        """Return the start of the hour after a time, if still in the day."""
+        index = self.hour_at(when) + 1
+        if index >= len(self.starts):
+            return None
+        return dt_util.utc_from_timestamp(int(self.starts[index]))
+
+    def as_hours(self, since: datetime | None = None) -> list[dict[str, Any]]:
+        """Return the hours from a time on, money in the currency."""
+        first = self.hour_at(since) if since else 0
+        return [
+            {
+                "start": dt_util.utc_from_timestamp(start).isoformat(),
+                "solar": round(solar, 3),
+                "load": round(load, 3),
+                "import_cost": round(cost / 100.0, 4),
+                "savings": round(savings / 100.0, 4),
+            }
+            for start, solar, load, cost, savings in zip(
+                self.starts[first:].tolist(),
+                self.solar[first:].tolist(),
+                self.load[first:].tolist(),
+                self.import_cost[first:].tolist(),
+                self.savings[first:].tolist(),
+                strict=True,
+            )
+        ]
+
+
+def day_hours(day: date, time_zone: tzinfo) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return the UTC and local start of each hour of a site day.
+
+    Days on which the clocks change have 23 or 25 hours.
+    """
+    first = int(start_of_site_day(day, time_zone).timestamp())
+    end = int(start_of_site_day(day + timedelta(days=1), time_zone).timestamp())
+    starts = np.arange(first, end, SECONDS_PER_HOUR, dtype=np.int64)
+    return starts, starts + utc_offsets(starts, time_zone)
+
+
+def forecast_points(items: Any) -> Iterable[tuple[float, float]]:
+    """
+    Yield the (time, kW) of each readable solar forecast item.
+
+    Takes a list of mappings, as Solcast's detailed forecasts, or a
+    mapping of start time to power.
+    """
+    if isinstance(items, Mapping):
+        items = [{"start": start, "value": value} for start, value in items.items()]
+    if not isinstance(items, list):
+        return
+    for item in items:
+        if not isinstance(item, Mapping):
+            continue
+        value = next(
+            (item[key] for key in SOLAR_FORECAST_VALUE_KEYS if key in item), None
+        )
+        start = next((item[key] for key in FORECAST_START_KEYS if key in item), None)
+        try:
+            power = float(value)
+        except (TypeError, ValueError):
+            continue
+        if not math.isnan(when := forecast_timestamp(start)):
+            yield when, power
+
+
+def hourly_solar(items: Any, starts: np.ndarray) -> np.ndarray:
+    """Return the forecast kWh of each hour: the mean power of its items."""
+    points = list(forecast_points(items))
+    if not points or not len(starts):
+        return np.zeros(len(starts))
+
+    stamps, powers = np.array(points, dtype=np.float64).T
+    slots = ((stamps - starts[0]) // SECONDS_PER_HOUR).astype(np.int64)
+    inside = (slots >= 0) & (slots < len(starts))
+    sums = np.bincount(slots[inside], powers[inside], minlength=len(starts))
+    counts = np.bincount(slots[inside], minlength=len(starts))
+    return np.divide(sums, counts, out=np.zeros(len(starts)), where=counts > 0)
+
+
+def learn_load_profile(
+    hass: HomeAssistant,
+    start: datetime,
+    end: datetime,
+    meters: Mapping[str, str],
+    time_zone: tzinfo,
+) -> np.ndarray:
+    """
+    Return the mean household load in kWh for each local hour of the day.
+
+    The load is import plus solar production minus export. Runs in the
+    recorder executor.
+    """
+    starts, series = fetch_hourly_changes(hass, start, end, meters)
+    zeros = np.zeros(len(starts))
+    load = np.maximum(
+        series.get("import", zeros)
+        + series.get("solar", zeros)
+        - series.get("export", zeros),
+        0.0,
+    )
+    hours = (
+        (starts + utc_offsets(starts, time_zone)) % SECONDS_PER_DAY // SECONDS_PER_HOUR
+    )
+    sums = np.bincount(hours, load, minlength=HOURS_PER_DAY)
+    counts = np.bincount(hours, minlength=HOURS_PER_DAY)
+    return np.divide(sums, counts, out=np.zeros(HOURS_PER_DAY), where=counts > 0)
+
+
+def project_day(  # noqa: PLR0913 - parallel hourly arrays
+    day: date,
+    starts: np.ndarray,
+    local_seconds: np.ndarray,
+    solar: np.ndarray,
+    profile: np.ndarray,
+    rates: RateTables,
+) -> Projection:
+    """
+    Project the hours of a day in one pass over arrays.
+
+    Solar covers the load first; the rest of the load is imported and
+    the rest of the solar exported.
+    """
+    load = profile[local_seconds % SECONDS_PER_DAY // SECONDS_PER_HOUR]
+    import_rates, export_rates = rates.hourly_rates(local_seconds)
+
+    self_consumed = np.minimum(solar, load)
+    import_cost = (load - self_consumed) * import_rates
+    savings = self_consumed * import_rates + (solar - self_consumed) * export_rates
+
+    return Projection(
+        day,
+        starts,
+        solar,
+        load,
+        import_cost,
+        savings,
+        _remaining(import_cost),
+        _remaining(savings),
+    )
+
+
+def _remaining(values: np.ndarray) -> np.ndarray:
+    """Return the sum from each position to the end, then a zero."""
+    return np.append(np.cumsum(values[::-1])[::-1], 0.0)
+
+
+class ForecastProjector:
+    """
+    Today's projected cost and savings, from solar forecast and load profile.
+
+    The projection is memoised on its inputs: the hourly solar forecast,
+    the learned load profile, the day and the tariff. A forecast update
+    that leaves the hourly figures unchanged, or the hourly tick, only
+    re-reads the memoised projection. The load profile is learned from
+    recorded statistics once a day.
+    """
+
+    def __init__(self, hass: HomeAssistant, tariff: SolarSavingsTariff) -> None:
+        """Initialize the projector."""
+        self.hass = hass
+        self.tariff = tariff
+        self.signal = SIGNAL_PROJECTION_UPDATED.format(tariff.entry_id)
+        self.projection: Projection | None = None
+        # Mean kWh per local hour, and the day it was learned on
+        self.profile = np.zeros(HOURS_PER_DAY)
+        self._profile_day: date | None = None
+        self._tariff_generation = 0
+        self._key: tuple | None = None
+        self._unsub_hour: CALLBACK_TYPE | None = None
+
+    @property
+    def entity_id(self) -> str:
+        """Return the solar forecast sensor."""
+        return self.tariff.get("solar_forecast_sensor")
+
+    @property
+    def remaining_cost(self) -> float | None:
+        """Return the projected import cost for the rest of the day, in cents."""
+        if (projection := self.projection) is None:
+            return None
+        return float(projection.remaining_cost[projection.hour_at(dt_util.utcnow())])
+
+    @property
+    def remaining_savings(self) -> float | None:
+        """Return the projected savings for the rest of the day, in cents."""
+        if (projection := self.projection) is None:
+            return None
+        return float(projection.remaining_savings[projection.hour_at(dt_util.utcnow())])
+
+    async def async_load(self) -> None:
+        """
+        Learn the load profile and make the first projection.
+
+        Runs as a background task once the entry is set up, so the history
+        query does not hold up startup. The projection is unknown until it
+        finishes.
+        """
+        await self._async_learn_profile()
+        self._async_project()
+        self._async_arm_hour_timer()
+
+    def forecast_items(self) -> Any:
+        """Return the solar forecast sensor's forecast attribute."""
+        if (state := self.hass.states.get(self.entity_id)) is None:
+            return None
+        attribute = (
+            self.tariff.get("solar_forecast_attribute")
+            or DEFAULT_SOLAR_FORECAST_ATTRIBUTE
+        )
+        return state.attributes.get(attribute)
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        """Follow the forecast and the tariff; returns a callback to stop."""
+        unsubs = [
+            async_track_state_change_event(
+                self.hass, [self.entity_id], self._handle_forecast
+            ),
+            async_dispatcher_connect(
+                self.hass, self.tariff.signal, self._handle_tariff
+            ),
+        ]
+        self._async_arm_hour_timer()
+
+        @callback
+        def _async_stop() -> None:
+            for unsub in unsubs:
+                unsub()
+            if self._unsub_hour:
+                self._unsub_hour()
+                self._unsub_hour = None
+
+        return _async_stop
+
+    @callback
+    def _handle_forecast(self, _event: Event[EventStateChangedData]) -> None:
+        """Project again if the hourly forecast changed."""
+        self._async_project()
+
+    @callback
+    def _handle_tariff(self) -> None:
+        """Project again with the new tariff."""
+        self._tariff_generation += 1
+        self._async_project()
+
+    @callback
+    def _async_handle_hour(self, _now: datetime) -> None:
+        """Publish the rest of the day from the next hour; relearn on a new day."""
+        self._unsub_hour = None
+        if self.tariff.today() != self._profile_day:
+            self.hass.async_create_task(self._async_new_day())
+            return
+        async_dispatcher_send(self.hass, self.signal)
+        self._async_arm_hour_timer()
+
+    async def _async_new_day(self) -> None:
+        """Learn the load profile again and project the new day."""
+        await self.async_load()
+
+    @callback
+    def _async_arm_hour_timer(self) -> None:
+        """Wake at the next hour of the projection, or at the next day."""
+        if self._unsub_hour:
+            self._unsub_hour()
+        now = dt_util.utcnow()
+        when = self.projection.next_hour(now) if self.projection else None
+        if when is None:
+            when = start_of_site_day(
+                self.tariff.today() + timedelta(days=1), self.tariff.time_zone
+            )
+        self._unsub_hour = async_track_point_in_utc_time(
+            self.hass, self._async_handle_hour, when
+        )
+
+    async def _async_learn_profile(self) -> None:
+        """Average the load of the last days by local hour."""
+        today = self.tariff.today()
+        meters = {
+            series: entity_id
+            for key, series in LOAD_METERS.items()
+            if (entity_id := self.tariff.get(key))
+        }
+        end = start_of_site_day(today, self.tariff.time_zone)
+        days = int(self.tariff.get("load_history_days") or DEFAULT_LOAD_HISTORY_DAYS)
+        self.profile = await get_instance(self.hass).async_add_executor_job(
+            learn_load_profile,
+            self.hass,
+            end - timedelta(days=days),
+            end,
+            meters,
+            self.tariff.time_zone,
+        )
+        self._profile_day = today
+
+    @callback
+    def _async_project(self) -> None:
+        """Project today unless the inputs are unchanged."""
+        # Nothing to project until the load profile is learned
+        if self._profile_day is None:
+            return
+        today = self.tariff.today()
+        starts, local_seconds = day_hours(today, self.tariff.time_zone)
+
+        solar = hourly_solar(self.forecast_items(), starts)
+
+        key = (today, self._profile_day, self._tariff_generation, solar.tobytes())
+        if key == self._key:
+            return
+        self._key = key
+
+        rates = RateTables.from_versions(
+            [(today, self.tariff.compiled_today())], self.tariff.holidays
+        )
+        self.projection = project_day(
+            today, starts, local_seconds, solar, self.profile, rates
+        )
+        async_dispatcher_send(self.hass, self.signal)
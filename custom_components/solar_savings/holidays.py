@@ -0,0 +1,184 @@
+"""Public holiday calendar for Solar Savings."""
+
+from __future__ import annotations
+
+import logging
+from datetime import date, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Mapping
+
+    from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+
+# Multi-day events longer than this are taken to be mistakes
+MAX_EVENT_DAYS = 31
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class HolidayCalendar:
+    """
+    Dates on which the tariff's holiday profile applies.
+
+    Holidays are given as fixed dates or as dates repeating every year.
+    The first lookup in a year compiles both into a set of day ordinals
+    for that year, so each lookup after that is a hash lookup however
+    many events the calendar holds.
+    """
+
+    __slots__ = ("_annual", "_fixed", "_years")
+
+    def __init__(
+        self, fixed: Iterable[date], annual: Iterable[tuple[int, int]]
+    ) -> None:
+        """Initialize the calendar."""
+        self._fixed: dict[int, set[int]] = {}
+        for day in fixed:
+            self._fixed.setdefault(day.year, set()).add(day.toordinal())
+        # (month, day) of holidays on the same date every year
+        self._annual = frozenset(annual)
+        self._years: dict[int, frozenset[int]] = {}
+
+    def __bool__(self) -> bool:
+        """Return True if the calendar has any holidays."""
+        return bool(self._fixed or self._annual)
+
+    def is_holiday(self, day: date) -> bool:
+        """Return True if a date is a holiday."""
+        return day.toordinal() in self._year(day.year)
+
+    def epoch_days(self, first_year: int, last_year: int) -> list[int]:
+        """Return the holidays between two years as days since 1970-01-01."""
+        return sorted(
+            ordinal - _EPOCH_ORDINAL
+            for year in range(first_year, last_year + 1)
+            for ordinal in self._year(year)
+        )
+
+    def _year(self, year: int) -> frozenset[int]:
+        """Return the day ordinals of a year's holidays, compiling them once."""
+        if (days := self._years.get(year)) is None:
+            days = set(self._fixed.get(year, ()))
+            for month, day in self._annual:
+                try:
+                    days.add(date(year, month, day).toordinal())
+                except ValueError:
+                    # 29 February outside leap years
+                    continue
+            days = self._years[year] = frozenset(days)
+        return days
+
+
+async def async_load_holidays(
+    hass: HomeAssistant, values: Mapping[str, Any]
+) -> HolidayCalendar:
+    """Return the calendar of an entry's holiday list and holiday file."""
+    fixed, annual = parse_holidays(values.get("holidays") or ())
+    if path := values.get("holiday_file"):
+        try:
+            file_fixed, file_annual = await hass.async_add_executor_job(read_ics, path)
+        except (OSError, UnicodeDecodeError) as err:
+            _LOGGER.warning("Unable to read holiday file %s: %s", path, err)
+        else:
+            fixed.extend(file_fixed)
+            annual.extend(file_annual)
+    return HolidayCalendar(fixed, annual)
+
+
+def parse_holidays(entries: Iterable[str]) -> tuple[list[date], list[tuple[int, int]]]:
+    """
+    Return the fixed and yearly dates of an options list.
+
+    "2026-12-25" is a single date; "12-25" repeats every year.
+    """
+    fixed: list[date] = []
+    annual: list[tuple[int, int]] = []
+    for raw in entries:
+        entry = raw.strip()
+        if entry.count("-") == 1:
+            month, day = (int(part) for part in entry.split("-"))
+            # Checked against a leap year so 02-29 is accepted
+            date(2000, month, day)
+            annual.append((month, day))
+        else:
+            fixed.append(date.fromisoformat(entry))
+    return fixed, annual
+
+
+def read_ics(path: str) -> tuple[list[date], list[tuple[int, int]]]:
+    """
+    Return the fixed and yearly dates of the events in an ICS file.
+
+    Only the start and end date and a yearly repeat are read from each
+    event. Runs in the executor.
+    """
+    fixed: list[date] = []
+    annual: list[tuple[int, int]] = []
+
+    with Path(path).open(encoding="utf-8") as file:
+        event: dict[str, str] | None = None
+        for line in _unfold(file):
+            name, _, value = line.partition(":")
+            name = name.split(";", 1)[0].upper()
+
+            if name == "BEGIN" and value.upper() == "VEVENT":
+                event = {}
+            elif name == "END" and value.upper() == "VEVENT" and event is not None:
+                _add_event(event, fixed, annual)
+                event = None
+            elif event is not None and name in ("DTSTART", "DTEND", "RRULE"):
+                event[name] = value.strip()
+
+    return fixed, annual
+
+
+def _unfold(lines: Iterable[str]) -> Iterator[str]:
+    """Yield the logical lines of an ICS file, joining folded ones."""
+    current = ""
+    for raw in lines:
+        line = raw.rstrip("\r\n")
+        if line[:1] in (" ", "\t"):
+            current += line[1:]
+            continue
+        if current:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def _add_event(
+    event: dict[str, str],
+    fixed: list[date],
+    annual: list[tuple[int, int]],
+) -> None:
+    """Add the days of an event."""
+    try:
+        start = _ics_date(event["DTSTART"])
+        end = (
+            _ics_date(event["DTEND"]) if "DTEND" in event else start + timedelta(days=1)
+        )
+    except (KeyError, ValueError):
+        _LOGGER.debug("Skipping holiday event without a readable date: %s", event)
+        return
+
+    days = [
+        start + timedelta(days=offset) for offset in range(max((end - start).days, 1))
+    ]
+    if len(days) > MAX_EVENT_DAYS:
+        _LOGGER.debug("Skipping holiday event of %s days from %s", len(days), start)
+        return
+
+    if "FREQ=YEARLY" in event.get("RRULE", "").upper():
+        annual.extend((day.month, day.day) for day in days)
+    else:
+        fixed.extend(days)
+
+
+def _ics_date(value: str) -> date:
+    """Return the date of an ICS date or date-time value."""
+    return date(int(value[0:4]), int(value[4:6]), int(value[6:8]))
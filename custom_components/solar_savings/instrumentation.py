@@ -0,0 +1,175 @@
+"""Hot path counters and latency histograms for Solar Savings."""
+
+from __future__ import annotations
+
+import math
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from itertools import accumulate
+from time import perf_counter
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util.hass_dict import HassKey
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+DATA_INSTRUMENTATION: HassKey[dict[str, Instrumentation]] = HassKey(
+    "solar_savings_instrumentation"
+)
+
+# Operations timed while instrumentation is enabled
+RATE_RESOLUTION = "rate_resolution"
+STATE_CHANGE = "state_change"
+OPTION_UPDATE = "option_update"
+SCHEDULED_ACTIVATION = "scheduled_activation"
+OPERATIONS = (RATE_RESOLUTION, STATE_CHANGE, OPTION_UPDATE, SCHEDULED_ACTIVATION)
+
+# Upper bounds of the latency buckets in milliseconds; one more bucket
+# holds anything slower
+BUCKET_BOUNDS = (
+    0.01,
+    0.02,
+    0.05,
+    0.1,
+    0.2,
+    0.5,
+    1.0,
+    2.0,
+    5.0,
+    10.0,
+    20.0,
+    50.0,
+    100.0,
+    200.0,
+    500.0,
+    1000.0,
+)
+
+
+class LatencyHistogram:
+    """
+    Call count and latency distribution of one operation.
+
+    The bucket array is allocated once. Recording a call is a bisect over
+    the fixed bounds and a few additions, so the memory held never grows
+    however many calls are counted. Percentiles are read as the upper
+    bound of the bucket they fall in.
+    """
+
+    __slots__ = ("buckets", "count", "maximum", "total")
+
+    def __init__(self) -> None:
+        """Initialize an empty histogram."""
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        # Milliseconds
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def record(self, milliseconds: float) -> None:
+        """Count one call."""
+        self.buckets[bisect_left(BUCKET_BOUNDS, milliseconds)] += 1
+        self.count += 1
+        self.total += milliseconds
+        self.maximum = max(self.maximum, milliseconds)
+
+    @property
+    def mean(self) -> float | None:
+        """Return the mean latency in milliseconds."""
+        return self.total / self.count if self.count else None
+
+    def percentile(self, percent: float) -> float | None:
+        """Return a percentile of the latency in milliseconds."""
+        if not self.count:
+            return None
+        rank = max(math.ceil(percent / 100 * self.count), 1)
+        index = bisect_left(list(accumulate(self.buckets)), rank)
+        # The slowest bucket is bounded only by the slowest call
+        if index == len(BUCKET_BOUNDS):
+            return self.maximum
+        return min(BUCKET_BOUNDS[index], self.maximum)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the counts and summary for diagnostics."""
+        labels = [f"<={bound:g}" for bound in BUCKET_BOUNDS]
+        labels.append(f">{BUCKET_BOUNDS[-1]:g}")
+        return {
+            "count": self.count,
+            "mean_ms": self.mean,
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+            "max_ms": self.maximum,
+            "buckets_ms": dict(zip(labels, self.buckets, strict=True)),
+        }
+
+
+class Instrumentation:
+    """
+    Latency histograms of one entry's hot paths.
+
+    Kept across reloads of the entry, so option updates that reload it are
+    counted too. A disabled entry has none, and its callbacks are not
+    wrapped at all.
+    """
+
+    def __init__(self) -> None:
+        """Initialize a histogram per operation."""
+        self.histograms = {operation: LatencyHistogram() for operation in OPERATIONS}
+
+    @contextmanager
+    def measure(self, operation: str) -> Iterator[None]:
+        """Time the body of a with statement."""
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.histograms[operation].record((perf_counter() - started) * 1000)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return every histogram for diagnostics."""
+        return {
+            operation: histogram.as_dict()
+            for operation, histogram in self.histograms.items()
+        }
+
+
+def instrumented(
+    func: Callable[..., Any], instrumentation: Instrumentation | None, operation: str
+) -> Callable[..., Any]:
+    """
+    Return a callback that times itself, or the callback unchanged.
+
+    Without instrumentation nothing is wrapped, so a disabled entry pays
+    nothing on its hot paths.
+    """
+    if instrumentation is None:
+        return func
+    histogram = instrumentation.histograms[operation]
+
+    @callback
+    @wraps(func)
+    def _timed(*args: Any) -> Any:
+        started = perf_counter()
+        try:
+            return func(*args)
+        finally:
+            histogram.record((perf_counter() - started) * 1000)
+
+    return _timed
+
+
+@callback
+def async_get_instrumentation(
+    hass: HomeAssistant, entry_id: str, *, enabled: bool
+) -> Instrumentation | None:
+    """Return an entry's instrumentation while enabled, creating it once."""
+    instrumentations = hass.data.setdefault(DATA_INSTRUMENTATION, {})
+    if not enabled:
+        instrumentations.pop(entry_id, None)
+        return None
+    if (instrumentation := instrumentations.get(entry_id)) is None:
+        instrumentation = instrumentations[entry_id] = Instrumentation()
+    return instrumentation
@@ -0,0 +1,274 @@
+"""Streaming import of utility interval data for Solar Savings."""
+
+from __future__ import annotations
+
+import csv
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from itertools import chain
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+from homeassistant.util import dt as dt_util
+
+from .backfill import SECONDS_PER_HOUR, RateTables, compute_savings
+from .timetable import MINUTES_PER_DAY
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Sequence
+
+    from .holidays import HolidayCalendar
+    from .tariff import CompiledTariff
+
+# NEM12 records read by the importer; the rest are skipped
+NEM12_HEADER = "100"
+NEM12_DATA_DETAILS = "200"
+NEM12_INTERVAL_DATA = "300"
+NEM12_END = "900"
+
+# First letter of a NEM12 NMI suffix -> series key
+NEM12_SUFFIXES = {"E": "import", "B": "export"}
+
+# NEM12 unit of measure -> factor to kWh; other units (kVArh...) are skipped
+NEM12_UNITS = {"WH": 0.001, "KWH": 1.0, "MWH": 1000.0}
+
+# Columns of a plain CSV file
+CSV_START = "start"
+SERIES_KEYS = ("import", "export", "solar")
+
+# (series key, interval start as a UTC timestamp, kWh)
+Interval = tuple[str, int, float]
+
+
+class IntervalDataError(ValueError):
+    """Raised when a row of an interval file cannot be read."""
+
+    def __init__(self, line: int, reason: str) -> None:
+        """Initialize the error."""
+        super().__init__(f"Line {line}: {reason}")
+        self.line = line
+        self.reason = reason
+
+
+def read_rows(path: str) -> Iterator[tuple[int, list[str]]]:
+    """
+    Yield the non-empty rows of a CSV file with their line numbers.
+
+    The file is read as a stream, one row at a time.
+    """
+    with Path(path).open(newline="", encoding="utf-8-sig") as file:
+        for line, row in enumerate(csv.reader(file), start=1):
+            if row and any(row):
+                yield line, row
+
+
+def market_day_start(day: date, time_zone: tzinfo) -> datetime:
+    """Return the start of a day at the zone's standard (non-DST) offset."""
+    local = datetime.combine(day, time.min, tzinfo=time_zone)
+    offset = local.utcoffset() or timedelta(0)
+    standard = offset - (local.dst() or timedelta(0))
+    return datetime.combine(day, time.min, tzinfo=timezone(standard))
+
+
+def parse_nem12(
+    rows: Iterable[tuple[int, list[str]]], time_zone: tzinfo
+) -> Iterator[Interval]:
+    """
+    Yield the intervals of a NEM12 file.
+
+    Each 200 record starts a channel; the 300 records that follow hold a
+    day of readings at its interval length. Consumption (E) channels are
+    imports and generation (B) channels exports; other channels are
+    skipped.
+
+    The readings are in market time, which never observes daylight
+    saving, so every day is anchored on the site zone's standard UTC
+    offset and always has the same number of intervals.
+    """
+    series: str | None = None
+    factor = 1.0
+    length = 30
+
+    for line, row in rows:
+        record = row[0].strip()
+        try:
+            if record == NEM12_DATA_DETAILS:
+                series, factor, length = _nem12_details(row)
+
+            elif record == NEM12_INTERVAL_DATA and series is not None:
+                day, values = _nem12_day(row, length)
+                # Intervals are counted from the start of the market day
+                start = int(market_day_start(day, time_zone).timestamp())
+                step = length * 60
+                for index, value in enumerate(values):
+                    if value := value.strip():
+                        yield series, start + index * step, float(value) * factor
+
+            elif record == NEM12_END:
+                return
+        except (IndexError, ValueError) as err:
+            raise IntervalDataError(line, str(err)) from err
+
+
+def _nem12_details(row: list[str]) -> tuple[str | None, float, int]:
+    """Return the series, factor to kWh and interval length of a 200 record."""
+    suffix = row[4].strip().upper()
+    unit = row[7].strip().upper()
+    length = int(row[8])
+    if length <= 0 or MINUTES_PER_DAY % length:
+        msg = f"unsupported interval length {length}"
+        raise ValueError(msg)
+    series = NEM12_SUFFIXES.get(suffix[:1]) if unit in NEM12_UNITS else None
+    return series, NEM12_UNITS.get(unit, 1.0), length
+
+
+def _nem12_day(row: list[str], length: int) -> tuple[date, list[str]]:
+    """Return the day and interval values of a 300 record."""
+    # YYYYMMDD, the basic ISO 8601 form
+    day = date.fromisoformat(row[1].strip())
+    count = MINUTES_PER_DAY // length
+    values = row[2 : 2 + count]
+    if len(values) < count:
+        msg = f"expected {count} interval values"
+        raise ValueError(msg)
+    return day, values
+
+
+def parse_csv(
+    rows: Iterable[tuple[int, list[str]]], time_zone: tzinfo
+) -> Iterator[Interval]:
+    """
+    Yield the intervals of a plain CSV file.
+
+    The header names a start column and any of the import, export and
+    solar columns, each holding the kWh of the interval. Start times
+    without an offset are taken to be in the site time zone.
+    """
+    rows = iter(rows)
+    if (header := next(rows, None)) is None:
+        return
+
+    line, names = header
+    columns = [name.strip().lower() for name in names]
+    if CSV_START not in columns:
+        raise IntervalDataError(line, f"no {CSV_START} column")
+    start_column = columns.index(CSV_START)
+    series_columns = [
+        (index, name) for index, name in enumerate(columns) if name in SERIES_KEYS
+    ]
+    if not series_columns:
+        raise IntervalDataError(line, f"no {', '.join(SERIES_KEYS)} column")
+
+    for line, row in rows:
+        try:
+            stamp = _csv_start(row[start_column], time_zone)
+            for index, series in series_columns:
+                if index < len(row) and (value := row[index].strip()):
+                    yield series, stamp, float(value)
+        except (IndexError, ValueError) as err:
+            raise IntervalDataError(line, str(err)) from err
+
+
+def _csv_start(text: str, time_zone: tzinfo) -> int:
+    """Return an interval start as a UTC timestamp."""
+    if (start := dt_util.parse_datetime(text.strip())) is None:
+        msg = f"invalid start time {text!r}"
+        raise ValueError(msg)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=time_zone)
+    return int(start.timestamp())
+
+
+def iter_intervals(path: str, time_zone: tzinfo) -> Iterator[Interval]:
+    """Yield the intervals of a NEM12 or plain CSV file."""
+    rows = read_rows(path)
+    if (first := next(rows, None)) is None:
+        return
+
+    rows = chain([first], rows)
+    if first[1][0].strip() in (NEM12_HEADER, NEM12_DATA_DETAILS):
+        yield from parse_nem12(rows, time_zone)
+    else:
+        yield from parse_csv(rows, time_zone)
+
+
+class HourlyBuckets:
+    """
+    Interval energy summed into UTC hours, per series.
+
+    Memory grows with the hours covered, not the rows read: a multi-year,
+    five-minute file ends up as a few tens of thousands of floats per
+    series.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the buckets."""
+        self.intervals = 0
+        self._hours: dict[str, defaultdict[int, float]] = {}
+
+    def add_all(self, intervals: Iterable[Interval]) -> None:
+        """Sum intervals into their hours."""
+        hours = self._hours
+        count = 0
+        for series, stamp, kwh in intervals:
+            if (buckets := hours.get(series)) is None:
+                buckets = hours[series] = defaultdict(float)
+            buckets[stamp - stamp % SECONDS_PER_HOUR] += kwh
+            count += 1
+        self.intervals += count
+
+    def as_arrays(self) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+        """Return the hour starts and each series' hourly kWh on a common grid."""
+        stamps = [stamp for buckets in self._hours.values() for stamp in buckets]
+        if not stamps:
+            return np.zeros(0, dtype=np.int64), {}
+
+        first = min(stamps)
+        starts = np.arange(first, max(stamps) + 1, SECONDS_PER_HOUR, dtype=np.int64)
+        series = {}
+        for key, buckets in self._hours.items():
+            values = np.zeros(len(starts))
+            slots = (
+                np.fromiter(buckets.keys(), dtype=np.int64) - first
+            ) // SECONDS_PER_HOUR
+            values[slots] = np.fromiter(buckets.values(), dtype=np.float64)
+            series[key] = values
+        return starts, series
+
+
+@dataclass(slots=True)
+class IntervalImport:
+    """Hourly savings computed from an interval file."""
+
+    starts: list[datetime]
+    # series key -> hourly change, money in cents
+    changes: dict[str, list[float]]
+    intervals: int
+
+
+def run_import(
+    path: str,
+    versions: Sequence[tuple[date, CompiledTariff]],
+    holidays: HolidayCalendar,
+    time_zone: tzinfo,
+) -> IntervalImport:
+    """
+    Compute the savings for every hour of an interval file.
+
+    Runs in an executor. The file is streamed into hourly buckets, then
+    priced with the tariff version in force at each hour.
+    """
+    buckets = HourlyBuckets()
+    buckets.add_all(iter_intervals(path, time_zone))
+    starts, series = buckets.as_arrays()
+
+    changes = compute_savings(
+        starts, series, RateTables.from_versions(versions, holidays), time_zone
+    )
+    return IntervalImport(
+        [dt_util.utc_from_timestamp(stamp) for stamp in starts.tolist()],
+        {key: values.tolist() for key, values in changes.items()},
+        buckets.intervals,
+    )
@@ -1,18 +1,25 @@
 """Number platform for Solar Savings."""
+
 from __future__ import annotations
 
+from typing import TYPE_CHECKING
+
 from homeassistant.components.number import (
     NumberDeviceClass,
     NumberEntity,
     NumberMode,
 )
-from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import EntityCategory
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.device_registry import DeviceInfo
-from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN
+from .entity import SolarSavingsEntity
+
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant
+    from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+    from .tariff import SolarSavingsTariff
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -20,22 +27,48 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up the Solar Savings number entities."""
-    
+    tariff: SolarSavingsTariff = entry.runtime_data.tariff
     entities = []
 
     # Future Rates (Configuration controls)
-    entities.append(SolarSavingsRateNumber(hass, entry, "Future On Peak", "future_on_peak_rate", EntityCategory.CONFIG))
-    entities.append(SolarSavingsRateNumber(hass, entry, "Future Off Peak", "future_off_peak_rate", EntityCategory.CONFIG))
-    entities.append(SolarSavingsRateNumber(hass, entry, "Future Export Rate", "future_export_rate", EntityCategory.CONFIG))
-    
+    entities.append(
+        SolarSavingsRateNumber(
+            hass,
+            entry,
+            tariff,
+            "Future On Peak",
+            "future_on_peak_rate",
+            EntityCategory.CONFIG,
+        )
+    )
+    entities.append(
+        SolarSavingsRateNumber(
+            hass,
+            entry,
+            tariff,
+            "Future Off Peak",
+            "future_off_peak_rate",
+            EntityCategory.CONFIG,
+        )
+    )
+    entities.append(
+        SolarSavingsRateNumber(
+            hass,
+            entry,
+            tariff,
+            "Future Export Rate",
+            "future_export_rate",
+            EntityCategory.CONFIG,
+        )
+    )
+
     async_add_entities(entities)
 
 
-class SolarSavingsRateNumber(NumberEntity):
+class SolarSavingsRateNumber(SolarSavingsEntity, NumberEntity):
     """Representation of a Solar Savings Number entity."""
 
-    _attr_has_entity_name = True
-    _attr_mode = NumberMode.BOX 
+    _attr_mode = NumberMode.BOX
     _attr_native_min_value = 0.0
     _attr_native_max_value = 1000.0
     _attr_native_step = 0.001
@@ -43,19 +76,21 @@ class SolarSavingsRateNumber(NumberEntity):
     _attr_device_class = NumberDeviceClass.MONETARY
     _attr_icon = "mdi:currency-usd"
 
-    def __init__(
-        self, 
-        hass: HomeAssistant, 
-        entry: ConfigEntry, 
-        name: str, 
+    def __init__(  # noqa: PLR0913 - one number per rate option
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        tariff: SolarSavingsTariff,
+        name: str,
         config_key: str,
-        category: EntityCategory | None
+        category: EntityCategory | None,
     ) -> None:
         """Initialize the number."""
+        super().__init__(tariff)
         self.hass = hass
         self._entry = entry
         self._config_key = config_key
-        
+
         self._attr_name = name
         self._attr_unique_id = f"{entry.entry_id}_{config_key}"
         if category:
@@ -63,28 +98,12 @@ class SolarSavingsRateNumber(NumberEntity):
 
     @property
     def native_value(self) -> float | None:
-        """Return the current value from config options."""
-        return self._entry.options.get(
-            self._config_key, 
-            self._entry.data.get(self._config_key, 0.0)
-        )
+        """Return the current value from the shared tariff state."""
+        return self.tariff.get(self._config_key, 0.0)
 
     async def async_set_native_value(self, value: float) -> None:
         """Update the current value."""
         new_options = self._entry.options.copy()
         new_options[self._config_key] = value
-        
-        self.hass.config_entries.async_update_entry(
-            self._entry, 
-            options=new_options
-        )
 
-    @property
-    def device_info(self) -> DeviceInfo:
-        """Return device information."""
-        return DeviceInfo(
-            identifiers={(DOMAIN, self._entry.entry_id)},
-            name="Solar Savings",
-            manufacturer="Solar Savings Integration",
-            model="Savings Calculator",
-        )
\ No newline at end of file
+        self.hass.config_entries.async_update_entry(self._entry, options=new_options)
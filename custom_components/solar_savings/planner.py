@@ -0,0 +1,493 @@
+"""Battery charge and discharge planning for Solar Savings."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.dispatcher import (
+    async_dispatcher_connect,
+    async_dispatcher_send,
+)
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.util import dt as dt_util
+
+from .backfill import SECONDS_PER_DAY, SECONDS_PER_HOUR, RateTables, utc_offsets
+from .const import (
+    DEFAULT_BATTERY_EFFICIENCY,
+    DEFAULT_BATTERY_HORIZON,
+    SIGNAL_PLAN_UPDATED,
+)
+from .forecast import ForecastProjector, hourly_solar
+
+if TYPE_CHECKING:
+    from datetime import datetime
+
+    from .prices import PriceFeed
+    from .tariff import SolarSavingsTariff
+
+_LOGGER = logging.getLogger(__name__)
+
+# State of charge levels the battery's capacity is divided into
+SOC_LEVELS = 100
+
+# Seconds a plan may take in the executor before the best plan so far
+# is used instead
+PLAN_TIME_BUDGET = 2.0
+
+# Seconds requests are gathered for before they are solved together; a
+# tariff update that also changes the projection asks twice
+PLAN_COOLDOWN = 1.0
+
+# Half width, in levels, of the corridor around the previous plan that a
+# replan searches first
+WARM_START_CORRIDOR = 5
+
+# Battery power below this, in kW, is shown as idle
+IDLE_POWER = 0.01
+
+PLAN_ACTIONS = ("charge", "discharge", "idle")
+
+
+class PlanTimeoutError(Exception):
+    """Raised when a solve runs past its time budget or is stopped."""
+
+
+@dataclass(frozen=True, slots=True)
+class Battery:
+    """What the planner needs to know about a battery."""
+
+    # kWh
+    capacity: float
+    # Largest charge or discharge power, kW
+    power: float
+    # Round trip efficiency, 0 to 1
+    efficiency: float
+    levels: int = SOC_LEVELS
+
+    @property
+    def step(self) -> float:
+        """Return the kWh between two state of charge levels."""
+        return self.capacity / self.levels
+
+    @property
+    def max_move(self) -> int:
+        """Return the most levels the charge can change by in an hour."""
+        return max(1, min(self.levels, math.floor(self.power / self.step + 1e-9)))
+
+
+@dataclass(frozen=True, slots=True)
+class BatteryPlan:
+    """Hourly battery schedule and what it costs. Money in cents."""
+
+    battery: Battery
+    # UTC hour starts
+    starts: np.ndarray
+    # kWh at the start of each hour and at the end of the last
+    soc: np.ndarray
+    # Battery side energy per hour, positive while charging
+    energy: np.ndarray
+    # Grid energy per hour, positive while importing
+    grid: np.ndarray
+    cost: float
+    baseline_cost: float
+    # False if the time budget ran out before the plan was proven optimal
+    complete: bool
+    # Dynamic programming passes it took
+    passes: int
+
+    def hour_at(self, when: datetime) -> int | None:
+        """Return the index of the hour containing a time."""
+        index = int(np.searchsorted(self.starts, when.timestamp(), side="right")) - 1
+        return index if 0 <= index < len(self.starts) else None
+
+    def action(self, index: int) -> str:
+        """Return what the battery does in an hour."""
+        if self.energy[index] > IDLE_POWER:
+            return "charge"
+        if self.energy[index] < -IDLE_POWER:
+            return "discharge"
+        return "idle"
+
+    def as_hours(self) -> list[dict[str, Any]]:
+        """Return the schedule hour by hour."""
+        return [
+            {
+                "start": dt_util.utc_from_timestamp(start).isoformat(),
+                "action": self.action(index),
+                "energy": round(energy, 3),
+                "grid": round(grid, 3),
+                "soc": round(soc, 3),
+            }
+            for index, (start, energy, grid, soc) in enumerate(
+                zip(
+                    self.starts.tolist(),
+                    self.energy.tolist(),
+                    self.grid.tolist(),
+                    self.soc[1:].tolist(),
+                    strict=True,
+                )
+            )
+        ]
+
+
+def stage_costs(
+    battery: Battery,
+    net_load: np.ndarray,
+    import_rates: np.ndarray,
+    export_rates: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return the level moves and the grid cost of each move in each hour.
+
+    The cost of a move only depends on the hour, not on the level it
+    starts from, so one (hours, moves) table serves the whole solve.
+    """
+    leg = math.sqrt(battery.efficiency)
+    moves = np.arange(-battery.max_move, battery.max_move + 1)
+    energy = moves * battery.step
+    flow = np.where(energy > 0, energy / leg, energy * leg)
+    grid = net_load[:, None] + flow[None, :]
+    costs = np.where(
+        grid > 0, grid * import_rates[:, None], grid * export_rates[:, None]
+    )
+    return moves, costs
+
+
+def solve_corridor(  # noqa: PLR0913 - arrays of one solve, run in the executor
+    moves: np.ndarray,
+    costs: np.ndarray,
+    terminal: np.ndarray,
+    start: int,
+    lower: np.ndarray,
+    upper: np.ndarray,
+    deadline: float,
+    stop: threading.Event | None = None,
+) -> tuple[np.ndarray, float]:
+    """
+    Return the cheapest level path from a start level within bounds.
+
+    Backward induction over the levels between lower[t] and upper[t];
+    each hour is one vectorised pass over (levels, moves).
+    """
+    hours = len(costs)
+    levels = len(terminal)
+    value = np.full(levels, np.inf)
+    value[lower[hours] : upper[hours] + 1] = terminal[lower[hours] : upper[hours] + 1]
+    policy = np.zeros((hours, levels), dtype=np.int16)
+
+    for hour in range(hours - 1, -1, -1):
+        if time.monotonic() > deadline or (stop is not None and stop.is_set()):
+            raise PlanTimeoutError
+        states = np.arange(lower[hour], upper[hour] + 1)
+        targets = states[:, None] + moves[None, :]
+        valid = (targets >= lower[hour + 1]) & (targets <= upper[hour + 1])
+        totals = np.where(
+            valid, costs[hour][None, :] + value[np.clip(targets, 0, levels - 1)], np.inf
+        )
+        best = totals.argmin(axis=1)
+        value = np.full(levels, np.inf)
+        value[states] = totals[np.arange(len(states)), best]
+        policy[hour, states] = best
+
+    path = np.empty(hours + 1, dtype=np.int64)
+    path[0] = start
+    for hour in range(hours):
+        path[hour + 1] = path[hour] + moves[policy[hour, path[hour]]]
+    return path, float(value[start])
+
+
+def solve_plan(  # noqa: PLR0913 - inputs of one plan, run in the executor
+    battery: Battery,
+    starts: np.ndarray,
+    net_load: np.ndarray,
+    import_rates: np.ndarray,
+    export_rates: np.ndarray,
+    soc: float,
+    previous: BatteryPlan | None = None,
+    budget: float = PLAN_TIME_BUDGET,
+    stop: threading.Event | None = None,
+) -> BatteryPlan:
+    """
+    Plan the battery over the hours of the arrays.
+
+    Runs in the executor. With a previous plan for the same battery, the
+    search starts in a narrow corridor around its state of charge path
+    and widens only while the best path presses against the corridor's
+    edge, so a small forecast change costs a fraction of a full solve. Energy left
+    in the battery at the end is valued at the cheapest import rate, so
+    the plan does not simply empty it.
+    """
+    deadline = time.monotonic() + budget
+    hours = len(starts)
+    moves, costs = stage_costs(battery, net_load, import_rates, export_rates)
+    levels = np.arange(battery.levels + 1)
+    cheapest = float(import_rates.min()) if hours else 0.0
+    terminal = -levels * battery.step * math.sqrt(battery.efficiency) * cheapest
+    start = min(max(round(soc / battery.step), 0), battery.levels)
+
+    center = _previous_path(previous, battery, starts)
+    width = WARM_START_CORRIDOR if center is not None else battery.levels
+    if center is not None and abs(center[0] - start) > width:
+        # The battery is far from where the last plan left it
+        center, width = None, battery.levels
+
+    best: tuple[np.ndarray, float] | None = None
+    passes = 0
+    complete = False
+    while True:
+        if center is None or width >= battery.levels:
+            lower = np.zeros(hours + 1, dtype=np.int64)
+            upper = np.full(hours + 1, battery.levels, dtype=np.int64)
+        else:
+            lower = np.maximum(center - width, 0)
+            upper = np.minimum(center + width, battery.levels)
+            lower[0] = upper[0] = start
+
+        try:
+            path, value = solve_corridor(
+                moves, costs, terminal, start, lower, upper, deadline, stop
+            )
+        except PlanTimeoutError:
+            break
+        passes += 1
+        if math.isfinite(value):
+            best = (path, value)
+            pressed = ((path[1:] == lower[1:]) & (lower[1:] > 0)) | (
+                (path[1:] == upper[1:]) & (upper[1:] < battery.levels)
+            )
+            if not pressed.any():
+                complete = True
+                break
+        if width >= battery.levels:
+            complete = best is not None
+            break
+        width *= 2
+
+    if best is None:
+        if previous is not None and previous.battery == battery:
+            _LOGGER.debug("No new plan within %s s, keeping the previous one", budget)
+            return previous
+        # Nothing to go on: leave the battery idle
+        path = np.full(hours + 1, start, dtype=np.int64)
+    else:
+        path = best[0]
+
+    energy = np.diff(path) * battery.step
+    index = np.arange(hours)
+    move_costs = (
+        costs[index, path[1:] - path[:-1] + battery.max_move] if hours else np.zeros(0)
+    )
+    leg = math.sqrt(battery.efficiency)
+    grid = net_load + np.where(energy > 0, energy / leg, energy * leg)
+    return BatteryPlan(
+        battery,
+        starts,
+        path * battery.step,
+        energy,
+        grid,
+        float(move_costs.sum()),
+        float(
+            np.where(
+                net_load > 0, net_load * import_rates, net_load * export_rates
+            ).sum()
+        ),
+        complete,
+        passes,
+    )
+
+
+def _previous_path(
+    previous: BatteryPlan | None, battery: Battery, starts: np.ndarray
+) -> np.ndarray | None:
+    """Return the previous plan's levels at the new plan's hours."""
+    if previous is None or previous.battery != battery or not len(starts):
+        return None
+    index = (
+        np.append(starts, starts[-1] + SECONDS_PER_HOUR) - previous.starts[0]
+    ) // SECONDS_PER_HOUR
+    if index[0] < 0 or index[0] >= len(previous.soc):
+        return None
+    levels = np.rint(previous.soc / battery.step).astype(np.int64)
+    return levels[np.clip(index, 0, len(levels) - 1)]
+
+
+class BatteryPlanner:
+    """
+    Keep an entry's battery plan up to date.
+
+    The plan covers the battery horizon from the current hour. It is
+    solved again in the executor every hour, when the tariff changes,
+    when the solar forecast changes the projection and when a dynamic
+    tariff's prices change, each time warm started from the plan before.
+    Requests are gathered for a moment and solved together, and a request
+    made while a solve is running shares its result.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        tariff: SolarSavingsTariff,
+        projector: ForecastProjector | None = None,
+        prices: PriceFeed | None = None,
+    ) -> None:
+        """Initialize the planner."""
+        self.hass = hass
+        self.tariff = tariff
+        self.projector = projector
+        self.prices = prices
+        self.signal = SIGNAL_PLAN_UPDATED.format(tariff.entry_id)
+        self.plan: BatteryPlan | None = None
+        self._solve: asyncio.Task[BatteryPlan] | None = None
+        self._unsub_hour: CALLBACK_TYPE | None = None
+        # Set on stop, so a solve running in the executor gives up
+        self._stop = threading.Event()
+        self._debouncer = Debouncer(
+            hass,
+            _LOGGER,
+            cooldown=PLAN_COOLDOWN,
+            immediate=False,
+            function=self.async_plan,
+        )
+
+    @property
+    def battery(self) -> Battery:
+        """Return the battery from the entry's options."""
+        return Battery(
+            float(self.tariff.get("battery_capacity")),
+            float(
+                self.tariff.get("battery_power") or self.tariff.get("battery_capacity")
+            ),
+            float(self.tariff.get("battery_efficiency") or DEFAULT_BATTERY_EFFICIENCY)
+            / 100.0,
+        )
+
+    @property
+    def ready(self) -> bool:
+        """Return True once there are prices to plan with."""
+        return self.prices is None or self.prices.recent.latest is not None
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        """Plan now and follow the inputs; returns a callback to stop."""
+        unsubs = [
+            async_dispatcher_connect(self.hass, signal, self._async_request)
+            for signal in (
+                self.tariff.signal,
+                self.projector and self.projector.signal,
+                self.prices and self.prices.signal,
+            )
+            if signal
+        ]
+        self._async_request()
+
+        @callback
+        def _async_stop() -> None:
+            for unsub in unsubs:
+                unsub()
+            if self._unsub_hour:
+                self._unsub_hour()
+                self._unsub_hour = None
+            self._debouncer.async_shutdown()
+            self._stop.set()
+            if self._solve:
+                self._solve.cancel()
+
+        return _async_stop
+
+    @callback
+    def _async_request(self) -> None:
+        """Plan again shortly, together with any other request."""
+        if self.ready:
+            self._debouncer.async_schedule_call()
+
+    async def async_plan(self) -> BatteryPlan:
+        """Return a fresh plan, solving once for concurrent requests."""
+        if self._solve is None or self._solve.done():
+            self._solve = self.hass.async_create_task(self._async_solve())
+        return await asyncio.shield(self._solve)
+
+    async def _async_solve(self) -> BatteryPlan:
+        """Gather the inputs and solve in the executor."""
+        now = dt_util.utcnow()
+        hours = int(self.tariff.get("battery_horizon") or DEFAULT_BATTERY_HORIZON)
+        first = int(now.timestamp()) // SECONDS_PER_HOUR * SECONDS_PER_HOUR
+        starts = np.arange(
+            first, first + hours * SECONDS_PER_HOUR, SECONDS_PER_HOUR, dtype=np.int64
+        )
+        local_seconds = starts + utc_offsets(starts, self.tariff.time_zone)
+
+        if self.prices is not None:
+            # Dynamic tariffs: the price feed and its forecast
+            import_rates = self.prices.hourly_prices(starts)
+            export_rates = np.full(hours, self.tariff.compiled_today().export_rate)
+        else:
+            rates = RateTables.from_versions(
+                self.tariff.compiled_versions(), self.tariff.holidays
+            )
+            import_rates, export_rates = rates.hourly_rates(local_seconds)
+        net_load = self._net_load(starts, local_seconds)
+
+        plan = await self.hass.async_add_executor_job(
+            solve_plan,
+            self.battery,
+            starts,
+            net_load,
+            import_rates,
+            export_rates,
+            self._soc(now),
+            self.plan,
+            PLAN_TIME_BUDGET,
+            self._stop,
+        )
+        self.plan = plan
+        async_dispatcher_send(self.hass, self.signal)
+        self._async_arm_hour_timer(first + SECONDS_PER_HOUR)
+        return plan
+
+    def _net_load(self, starts: np.ndarray, local_seconds: np.ndarray) -> np.ndarray:
+        """Return the load not covered by solar in each hour, negative for surplus."""
+        if (projector := self.projector) is None:
+            return np.zeros(len(starts))
+        load = projector.profile[local_seconds % SECONDS_PER_DAY // SECONDS_PER_HOUR]
+        return load - hourly_solar(projector.forecast_items(), starts)
+
+    def _soc(self, now: datetime) -> float:
+        """Return the battery's charge in kWh, measured or as last planned."""
+        entity_id = self.tariff.get("battery_soc_sensor")
+        if (
+            entity_id
+            and (state := self.hass.states.get(entity_id)) is not None
+            and state.state not in (STATE_UNKNOWN, STATE_UNAVAILABLE)
+        ):
+            try:
+                return float(state.state) / 100.0 * self.battery.capacity
+            except ValueError:
+                _LOGGER.debug("Ignoring non-numeric charge from %s", entity_id)
+        if self.plan is not None and (index := self.plan.hour_at(now)) is not None:
+            return float(self.plan.soc[index])
+        return 0.0
+
+    @callback
+    def _async_arm_hour_timer(self, when: int) -> None:
+        """Plan again at the start of the next hour."""
+        if self._unsub_hour:
+            self._unsub_hour()
+        self._unsub_hour = async_track_point_in_utc_time(
+            self.hass, self._async_handle_hour, dt_util.utc_from_timestamp(when)
+        )
+
+    @callback
+    def _async_handle_hour(self, _now: datetime) -> None:
+        """Move the plan on by an hour."""
+        self._unsub_hour = None
+        self._async_request()
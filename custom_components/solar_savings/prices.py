@@ -0,0 +1,291 @@
+"""Dynamic price feed for Solar Savings."""
+
+from __future__ import annotations
+
+import logging
+import math
+from array import array
+from collections import deque
+from collections.abc import Iterable, Iterator, Mapping
+from datetime import datetime
+from typing import Any
+
+import numpy as np
+from homeassistant.const import (
+    ATTR_UNIT_OF_MEASUREMENT,
+    STATE_UNAVAILABLE,
+    STATE_UNKNOWN,
+)
+from homeassistant.core import (
+    CALLBACK_TYPE,
+    Event,
+    EventStateChangedData,
+    HomeAssistant,
+    State,
+    callback,
+)
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.util import dt as dt_util
+
+from .const import SIGNAL_PRICE_UPDATED
+from .instrumentation import STATE_CHANGE, Instrumentation, instrumented
+from .tariff import SPOT_KEY, RateBand, SolarSavingsTariff
+
+_LOGGER = logging.getLogger(__name__)
+
+# Keys tried, in order, for the price and start time of a forecast item
+FORECAST_PRICE_KEYS = ("per_kwh", "price", "value")
+FORECAST_START_KEYS = ("start_time", "start", "period_start", "time")
+
+
+class PriceRingBuffer:
+    """
+    The last prices of a feed, in a fixed amount of memory.
+
+    Prices and their times live in preallocated arrays written round
+    robin. A running sum gives the average, and two monotonic deques of
+    sample numbers give the minimum and maximum, each in constant time;
+    every push is amortised constant time too.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        """Initialize an empty buffer."""
+        self.capacity = capacity
+        self._times = array("d", bytes(8 * capacity))
+        self._prices = array("d", bytes(8 * capacity))
+        # Sample numbers, the oldest one still held, and the next one
+        self._first = 0
+        self._next = 0
+        self._sum = 0.0
+        # Sample numbers with increasing prices (minimum first) and with
+        # decreasing prices (maximum first)
+        self._minima: deque[int] = deque()
+        self._maxima: deque[int] = deque()
+
+    def __len__(self) -> int:
+        """Return the number of prices held."""
+        return self._next - self._first
+
+    def clear(self) -> None:
+        """Drop every price."""
+        self._first = self._next = 0
+        self._sum = 0.0
+        self._minima.clear()
+        self._maxima.clear()
+
+    def push(self, when: float, price: float) -> None:
+        """Add a price, dropping the oldest one if the buffer is full."""
+        if len(self) == self.capacity:
+            self._drop_oldest()
+
+        sample = self._next
+        slot = sample % self.capacity
+        self._times[slot] = when
+        self._prices[slot] = price
+        self._next += 1
+        self._sum += price
+
+        prices = self._prices
+        capacity = self.capacity
+        while self._minima and prices[self._minima[-1] % capacity] >= price:
+            self._minima.pop()
+        self._minima.append(sample)
+        while self._maxima and prices[self._maxima[-1] % capacity] <= price:
+            self._maxima.pop()
+        self._maxima.append(sample)
+
+        # Re-add the sum once per lap so rounding errors cannot build up
+        if sample % capacity == capacity - 1:
+            self._sum = math.fsum(self._prices[: len(self)])
+
+    def _drop_oldest(self) -> None:
+        """Remove the oldest price."""
+        sample = self._first
+        self._sum -= self._prices[sample % self.capacity]
+        self._first += 1
+        if self._minima[0] == sample:
+            self._minima.popleft()
+        if self._maxima[0] == sample:
+            self._maxima.popleft()
+
+    def items(self) -> Iterator[tuple[float, float]]:
+        """Yield the (time, price) pairs held, oldest first."""
+        for sample in range(self._first, self._next):
+            slot = sample % self.capacity
+            yield self._times[slot], self._prices[slot]
+
+    @property
+    def latest(self) -> float | None:
+        """Return the newest price."""
+        if not len(self):
+            return None
+        return self._prices[(self._next - 1) % self.capacity]
+
+    @property
+    def latest_time(self) -> float | None:
+        """Return the time of the newest price, as a timestamp."""
+        if not len(self):
+            return None
+        return self._times[(self._next - 1) % self.capacity]
+
+    @property
+    def average(self) -> float | None:
+        """Return the mean of the prices held."""
+        if not len(self):
+            return None
+        return self._sum / len(self)
+
+    @property
+    def minimum(self) -> float | None:
+        """Return the lowest price held."""
+        if not self._minima:
+            return None
+        return self._prices[self._minima[0] % self.capacity]
+
+    @property
+    def maximum(self) -> float | None:
+        """Return the highest price held."""
+        if not self._maxima:
+            return None
+        return self._prices[self._maxima[0] % self.capacity]
+
+
+class PriceFeed:
+    """
+    Follow a price sensor for an entry on a dynamic tariff.
+
+    Every new price is pushed to a ring buffer of recent prices; the
+    sensor's forecast attribute, if configured, refills a second buffer.
+    The rate coordinator and the price sensors are told with a
+    dispatcher signal.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        tariff: SolarSavingsTariff,
+        instrumentation: Instrumentation | None = None,
+    ) -> None:
+        """Initialize the feed."""
+        self.hass = hass
+        self.tariff = tariff
+        self.instrumentation = instrumentation
+        self.signal = SIGNAL_PRICE_UPDATED.format(tariff.entry_id)
+        self.recent = PriceRingBuffer(tariff.price_window)
+        self.forecast = PriceRingBuffer(tariff.price_window)
+
+    @property
+    def band(self) -> RateBand | None:
+        """Return the spot band at the latest price."""
+        if (price := self.recent.latest) is None:
+            return None
+        return RateBand(SPOT_KEY, "Spot Price", price)
+
+    def hourly_prices(self, starts: np.ndarray) -> np.ndarray | None:
+        """
+        Return the import price at each hour start, in cents.
+
+        Each hour takes the last forecast price starting at or before it;
+        hours the forecast does not cover take the latest price. Returns
+        None until a price has been received.
+        """
+        if (latest := self.recent.latest) is None:
+            return None
+        prices = np.full(len(starts), latest)
+
+        forecast = sorted(
+            (when, price)
+            for when, price in self.forecast.items()
+            if not math.isnan(when)
+        )
+        if forecast:
+            times, values = np.array(forecast).T
+            index = np.searchsorted(times, starts, side="right") - 1
+            covered = index >= 0
+            prices[covered] = values[index[covered]]
+        return prices
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        """Follow the price sensor; returns a callback to stop."""
+        entity_id = self.tariff.price_sensor
+        if (state := self.hass.states.get(entity_id)) is not None:
+            self._async_update(state)
+        return async_track_state_change_event(
+            self.hass,
+            [entity_id],
+            instrumented(self._handle_price_state, self.instrumentation, STATE_CHANGE),
+        )
+
+    @callback
+    def _handle_price_state(self, event: Event[EventStateChangedData]) -> None:
+        """Take in a new price or forecast."""
+        if (new_state := event.data["new_state"]) is not None:
+            self._async_update(new_state)
+
+    @callback
+    def _async_update(self, state: State) -> None:
+        """Push the state's price and reload its forecast."""
+        if state.state in (STATE_UNKNOWN, STATE_UNAVAILABLE):
+            return
+        unit = state.attributes.get(ATTR_UNIT_OF_MEASUREMENT)
+        try:
+            price = price_in_cents(float(state.state), unit)
+        except ValueError:
+            _LOGGER.debug("Ignoring non-numeric price %s", state.state)
+            return
+
+        # Attribute-only updates keep last_changed and the last price
+        if (when := state.last_changed.timestamp()) != self.recent.latest_time:
+            self.recent.push(when, price)
+
+        if attribute := self.tariff.price_forecast_attribute:
+            self.forecast.clear()
+            for when, value in forecast_prices(state.attributes.get(attribute), unit):
+                self.forecast.push(when, value)
+
+        async_dispatcher_send(self.hass, self.signal)
+
+
+def price_in_cents(value: float, unit: str | None) -> float:
+    """
+    Return a price in cents per kWh from its sensor unit.
+
+    Units starting with "c" or "¢" are cents per kWh, units per MWh are
+    scaled down, and anything else is taken to be currency per kWh.
+    """
+    unit = (unit or "").strip()
+    if unit[:1] in ("c", "¢"):
+        return value
+    if unit.upper().endswith("/MWH"):
+        return value / 10.0
+    return value * 100.0
+
+
+def forecast_prices(items: Any, unit: str | None) -> Iterable[tuple[float, float]]:
+    """Yield the (time, price in cents) of each readable forecast item."""
+    if not isinstance(items, list):
+        return
+    for item in items:
+        if isinstance(item, (int, float)):
+            yield math.nan, price_in_cents(float(item), unit)
+            continue
+        if not isinstance(item, Mapping):
+            continue
+        price = next((item[key] for key in FORECAST_PRICE_KEYS if key in item), None)
+        start = next((item[key] for key in FORECAST_START_KEYS if key in item), None)
+        try:
+            value = price_in_cents(float(price), unit)
+        except (TypeError, ValueError):
+            continue
+        yield forecast_timestamp(start), value
+
+
+def forecast_timestamp(value: Any) -> float:
+    """Return a forecast start as a timestamp, or NaN if unreadable."""
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str) and (parsed := dt_util.parse_datetime(value)):
+        return parsed.timestamp()
+    return math.nan
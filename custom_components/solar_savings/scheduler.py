@@ -0,0 +1,196 @@
+"""Tariff activation scheduler shared by all Solar Savings entries."""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+from datetime import date, datetime
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.util import dt as dt_util
+from homeassistant.util.hass_dict import HassKey
+
+from .instrumentation import SCHEDULED_ACTIVATION
+from .tariff import (
+    TariffTimeline,
+    apply_due_changes,
+    site_time_zone,
+    site_today,
+    start_of_site_day,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    from homeassistant.config_entries import ConfigEntry
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_SCHEDULER: HassKey[ActivationScheduler] = HassKey("solar_savings_scheduler")
+
+# Option recording the last day whose activations were applied
+CONF_LAST_ACTIVATION = "last_activation"
+
+
+class ActivationScheduler:
+    """
+    Apply dated tariff changes at the site's midnight, for every entry.
+
+    Upcoming activations of all entries sit in one min-heap ordered by
+    UTC time, and a single timer is armed for the earliest. Rescheduling
+    an entry gives it a new generation; heap items from older generations
+    are skipped when they surface instead of being searched for and
+    removed. Generations come from one counter that never restarts, so
+    items left by an unloaded entry stay stale after it is set up again.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the scheduler."""
+        self.hass = hass
+        # (when, entry id, generation)
+        self._heap: list[tuple[datetime, str, int]] = []
+        self._generations: dict[str, int] = {}
+        self._next_generation = itertools.count(1)
+        self._unsub_timer: CALLBACK_TYPE | None = None
+        self._armed_for: datetime | None = None
+
+    @callback
+    def async_schedule(self, entry: ConfigEntry) -> None:
+        """Queue an entry's next activation, replaying any that were missed."""
+        generation = self._generations[entry.entry_id] = next(self._next_generation)
+
+        values = {**entry.data, **entry.options}
+        if _missed_days(values):
+            # Due now: handled on the next turn of the event loop
+            heapq.heappush(self._heap, (dt_util.utcnow(), entry.entry_id, generation))
+        elif (when := _next_activation(values)) is not None:
+            heapq.heappush(self._heap, (when, entry.entry_id, generation))
+        self._async_arm()
+
+    @callback
+    def async_unschedule(self, entry_id: str) -> None:
+        """Forget an entry's activations."""
+        self._generations.pop(entry_id, None)
+
+    @callback
+    def _async_arm(self) -> None:
+        """Arm the timer for the earliest live activation."""
+        heap = self._heap
+        while heap and self._generations.get(heap[0][1]) != heap[0][2]:
+            heapq.heappop(heap)
+
+        when = heap[0][0] if heap else None
+        if when == self._armed_for:
+            return
+
+        if self._unsub_timer:
+            self._unsub_timer()
+            self._unsub_timer = None
+        self._armed_for = when
+        if when is not None:
+            self._unsub_timer = async_track_point_in_utc_time(
+                self.hass, self._async_handle_timer, when
+            )
+
+    @callback
+    def _async_handle_timer(self, now: datetime) -> None:
+        """Activate every entry that is due."""
+        self._unsub_timer = None
+        self._armed_for = None
+
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _when, entry_id, generation = heapq.heappop(self._heap)
+            if self._generations.get(entry_id) == generation:
+                due.append(entry_id)
+
+        for entry_id in due:
+            if (entry := self.hass.config_entries.async_get_entry(entry_id)) is None:
+                self.async_unschedule(entry_id)
+                continue
+            if (instrumentation := entry.runtime_data.instrumentation) is None:
+                self._async_activate(entry)
+                continue
+            with instrumentation.measure(SCHEDULED_ACTIVATION):
+                self._async_activate(entry)
+
+        self._async_arm()
+
+    @callback
+    def async_apply_due(self, entry: ConfigEntry) -> bool:
+        """
+        Apply the entry's due activations in date order.
+
+        Returns True if the options changed. Setup calls this before the
+        platforms are forwarded, so the entities are created from the
+        resolved tariff instead of being reloaded for it.
+        """
+        values: dict[str, Any] = {**entry.data, **entry.options}
+        if not (missed := _missed_days(values)):
+            return False
+
+        new_options = dict(entry.options)
+        for day in missed:
+            _LOGGER.info(
+                "Solar Savings: Applying tariff changes for %s to %s", day, entry.title
+            )
+            if (
+                applied := apply_due_changes({**values, **new_options}, day)
+            ) is not None:
+                new_options = applied
+        new_options[CONF_LAST_ACTIVATION] = site_today(values).isoformat()
+
+        return self.hass.config_entries.async_update_entry(entry, options=new_options)
+
+    @callback
+    def _async_activate(self, entry: ConfigEntry) -> None:
+        """Apply a running entry's due activations."""
+        # The update listener applies the options and reschedules the entry
+        if not self.async_apply_due(entry):
+            self.async_schedule(entry)
+
+
+def _activation_days(values: Mapping[str, Any]) -> list[date]:
+    """Return every day on which the entry's tariff changes, in order."""
+    days = {version.effective for version in TariffTimeline.from_options(values)}
+    if scheduled := values.get("scheduled_date"):
+        days.add(date.fromisoformat(scheduled))
+    days.discard(date.min)
+    return sorted(days)
+
+
+def _missed_days(values: Mapping[str, Any]) -> list[date]:
+    """Return the activation days up to today that have not been applied."""
+    today = site_today(values)
+    last = values.get(CONF_LAST_ACTIVATION)
+    since = date.fromisoformat(last) if last else None
+
+    missed = [
+        day
+        for day in _activation_days(values)
+        if day <= today and (since is None or day > since)
+    ]
+    # Entries from before the scheduler: bring today in line once
+    if not missed and since is None and apply_due_changes(values, today) is not None:
+        missed.append(today)
+    return missed
+
+
+def _next_activation(values: Mapping[str, Any]) -> datetime | None:
+    """Return when, in UTC, the entry's next tariff change takes effect."""
+    today = site_today(values)
+    for day in _activation_days(values):
+        if day > today:
+            return dt_util.as_utc(start_of_site_day(day, site_time_zone(values)))
+    return None
+
+
+@callback
+def async_get_scheduler(hass: HomeAssistant) -> ActivationScheduler:
+    """Return the shared scheduler, creating it on first use."""
+    if (scheduler := hass.data.get(DATA_SCHEDULER)) is None:
+        scheduler = hass.data[DATA_SCHEDULER] = ActivationScheduler(hass)
+    return scheduler
@@ -0,0 +1,168 @@
+"""Shared index of schedule helpers for Solar Savings."""
+
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from functools import partial
+from typing import TYPE_CHECKING
+
+from homeassistant.core import (
+    CALLBACK_TYPE,
+    Event,
+    EventStateChangedData,
+    HomeAssistant,
+    callback,
+)
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import (
+    async_track_state_added_domain,
+    async_track_state_removed_domain,
+)
+from homeassistant.util.hass_dict import HassKey
+
+from .const import SIGNAL_SCHEDULES_UPDATED
+
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+
+SCHEDULE_DOMAIN = "schedule"
+
+DATA_SCHEDULE_INDEX: HassKey[ScheduleIndex] = HassKey("solar_savings_schedule_index")
+
+
+class ScheduleIndex:
+    """
+    Sorted schedule entity ids, kept up to date from events.
+
+    The list is sorted once. Helpers being created, removed or renamed
+    insert or remove a single id in place, so readers never sort. States
+    keep a reference to the options they were written with, so readers
+    get a copy, taken on the first read after a change rather than on
+    every event.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the index from the current states."""
+        self.hass = hass
+        # Entries using the index; it stops when the last one unloads
+        self.entry_ids: set[str] = set()
+        self._sorted: list[str] = sorted(hass.states.async_entity_ids(SCHEDULE_DOMAIN))
+        self._published: list[str] | None = None
+        self._unsubs: list[CALLBACK_TYPE] = []
+
+    @property
+    def entity_ids(self) -> list[str]:
+        """Return the sorted ids, as a list that is never mutated."""
+        if self._published is None:
+            self._published = self._sorted.copy()
+        return self._published
+
+    @callback
+    def async_start(self) -> None:
+        """Follow schedule helpers until stopped."""
+        self._unsubs = [
+            async_track_state_added_domain(
+                self.hass, SCHEDULE_DOMAIN, self._handle_added
+            ),
+            async_track_state_removed_domain(
+                self.hass, SCHEDULE_DOMAIN, self._handle_removed
+            ),
+            self.hass.bus.async_listen(
+                er.EVENT_ENTITY_REGISTRY_UPDATED,
+                self._handle_registry_update,
+                event_filter=_is_schedule_rename,
+            ),
+        ]
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop following schedule helpers."""
+        for unsub in self._unsubs:
+            unsub()
+        self._unsubs = []
+
+    def options_with(self, entity_id: str | None) -> list[str]:
+        """Return the ids, including one that may no longer exist."""
+        if not entity_id or self._contains(entity_id):
+            return self.entity_ids
+        options = self.entity_ids.copy()
+        insort(options, entity_id)
+        return options
+
+    @callback
+    def _handle_added(self, event: Event[EventStateChangedData]) -> None:
+        """Insert a new schedule helper."""
+        self._async_add(event.data["entity_id"])
+
+    @callback
+    def _handle_removed(self, event: Event[EventStateChangedData]) -> None:
+        """Drop a removed schedule helper."""
+        self._async_remove(event.data["entity_id"])
+
+    @callback
+    def _handle_registry_update(
+        self, event: Event[er.EventEntityRegistryUpdatedData]
+    ) -> None:
+        """Move a renamed schedule helper to its new place."""
+        self._async_remove(event.data["old_entity_id"])
+        if self.hass.states.get(event.data["entity_id"]) is not None:
+            self._async_add(event.data["entity_id"])
+
+    @callback
+    def _async_add(self, entity_id: str) -> None:
+        """Insert an id in sorted position and announce the change."""
+        if self._contains(entity_id):
+            return
+        insort(self._sorted, entity_id)
+        self._async_publish()
+
+    @callback
+    def _async_remove(self, entity_id: str) -> None:
+        """Remove an id and announce the change."""
+        if not self._contains(entity_id):
+            return
+        self._sorted.remove(entity_id)
+        self._async_publish()
+
+    @callback
+    def _async_publish(self) -> None:
+        """Drop the published copy and announce the change."""
+        self._published = None
+        async_dispatcher_send(self.hass, SIGNAL_SCHEDULES_UPDATED)
+
+    def _contains(self, entity_id: str) -> bool:
+        """Return True if an id is in the index."""
+        index = bisect_left(self._sorted, entity_id)
+        return index < len(self._sorted) and self._sorted[index] == entity_id
+
+
+@callback
+def _is_schedule_rename(event_data: er.EventEntityRegistryUpdatedData) -> bool:
+    """Return True for a schedule helper whose entity id changed."""
+    return (
+        event_data["action"] == "update"
+        and "old_entity_id" in event_data
+        and event_data["entity_id"].startswith(f"{SCHEDULE_DOMAIN}.")
+    )
+
+
+@callback
+def async_get_schedule_index(hass: HomeAssistant, entry: ConfigEntry) -> ScheduleIndex:
+    """Return the shared index for an entry, creating it on first use."""
+    if (index := hass.data.get(DATA_SCHEDULE_INDEX)) is None:
+        index = hass.data[DATA_SCHEDULE_INDEX] = ScheduleIndex(hass)
+        index.async_start()
+    index.entry_ids.add(entry.entry_id)
+    entry.async_on_unload(partial(_async_release, hass, index, entry.entry_id))
+    return index
+
+
+@callback
+def _async_release(hass: HomeAssistant, index: ScheduleIndex, entry_id: str) -> None:
+    """Stop the index once no loaded entry uses it."""
+    index.entry_ids.discard(entry_id)
+    if not index.entry_ids:
+        index.async_stop()
+        if hass.data.get(DATA_SCHEDULE_INDEX) is index:
+            del hass.data[DATA_SCHEDULE_INDEX]
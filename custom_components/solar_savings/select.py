@@ -1,14 +1,24 @@
 """Select platform for Solar Savings."""
+
 from __future__ import annotations
 
+from typing import TYPE_CHECKING
+
 from homeassistant.components.select import SelectEntity
-from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import EntityCategory
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.device_registry import DeviceInfo
-from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+
+from .const import SIGNAL_SCHEDULES_UPDATED
+from .entity import SolarSavingsEntity
+from .schedules import ScheduleIndex, async_get_schedule_index
+
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+    from .tariff import SolarSavingsTariff
 
-from .const import DOMAIN
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -16,60 +26,68 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up the Solar Savings select entities."""
-    
-    async_add_entities([
-        SolarSavingsFutureSchedule(hass, entry)
-    ])
+    async_add_entities(
+        [
+            SolarSavingsFutureSchedule(
+                hass,
+                entry,
+                entry.runtime_data.tariff,
+                async_get_schedule_index(hass, entry),
+            )
+        ]
+    )
 
 
-class SolarSavingsFutureSchedule(SelectEntity):
+class SolarSavingsFutureSchedule(SolarSavingsEntity, SelectEntity):
     """Representation of the Future Schedule selector."""
 
-    _attr_has_entity_name = True
     _attr_name = "Future Peak Schedule"
     _attr_icon = "mdi:calendar-refresh"
     _attr_entity_category = EntityCategory.CONFIG
 
-    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        tariff: SolarSavingsTariff,
+        schedules: ScheduleIndex,
+    ) -> None:
         """Initialize the select entity."""
+        super().__init__(tariff)
         self.hass = hass
         self._entry = entry
+        self._schedules = schedules
         self._attr_unique_id = f"{entry.entry_id}_future_peak_schedule"
 
+    async def async_added_to_hass(self) -> None:
+        """Write the new options when schedule helpers change."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass, SIGNAL_SCHEDULES_UPDATED, self._handle_schedules_update
+            )
+        )
+
+    @callback
+    def _handle_schedules_update(self) -> None:
+        """Publish the changed list of schedule helpers."""
+        self.async_write_ha_state()
+
     @property
     def options(self) -> list[str]:
         """Return a list of available schedule entities."""
-        # Find all entities in the 'schedule' domain
-        schedules = self.hass.states.async_entity_ids("schedule")
-        
-        # If the currently selected option is not in the list (e.g. deleted), add it temporarily
-        current = self.current_option
-        if current and current not in schedules:
-            schedules.append(current)
-            
-        return sorted(schedules)
+        # Sorted once and kept current by the shared index; the selected
+        # option is added back if it was deleted.
+        return self._schedules.options_with(self.current_option)
 
     @property
     def current_option(self) -> str | None:
         """Return the currently selected option."""
-        return self._entry.options.get("future_peak_schedule")
+        return self.tariff.get("future_peak_schedule")
 
     async def async_select_option(self, option: str) -> None:
         """Change the selected option."""
         new_options = self._entry.options.copy()
         new_options["future_peak_schedule"] = option
-        
-        self.hass.config_entries.async_update_entry(
-            self._entry, 
-            options=new_options
-        )
 
-    @property
-    def device_info(self) -> DeviceInfo:
-        """Return device information."""
-        return DeviceInfo(
-            identifiers={(DOMAIN, self._entry.entry_id)},
-            name="Solar Savings",
-            manufacturer="Solar Savings Integration",
-            model="Savings Calculator",
-        )
\ No newline at end of file
+        self.hass.config_entries.async_update_entry(self._entry, options=new_options)
@@ -0,0 +1,318 @@
+"""Self-consumption attribution from power sensors for Solar Savings."""
+
+from __future__ import annotations
+
+import heapq
+import logging
+from itertools import count
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.const import (
+    ATTR_UNIT_OF_MEASUREMENT,
+    STATE_UNAVAILABLE,
+    STATE_UNKNOWN,
+)
+from homeassistant.core import (
+    CALLBACK_TYPE,
+    Event,
+    EventStateChangedData,
+    HomeAssistant,
+    callback,
+)
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import (
+    async_track_state_change_event,
+    async_track_utc_time_change,
+)
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import SIGNAL_SELF_CONSUMPTION_UPDATED
+from .demand import POWER_FACTORS, SECONDS_PER_HOUR
+from .engine import SAVE_DELAY, STORAGE_VERSION, storage_key
+from .instrumentation import STATE_CHANGE, instrumented
+from .tariff import POWER_KEYS, SolarSavingsTariff
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from datetime import datetime
+
+    from .coordinator import RateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+# Seconds a sample may arrive after a newer one and still be integrated
+# in time order
+REORDER_DELAY = 10
+
+# Samples held for reordering; beyond this the oldest is released early
+REORDER_CAPACITY = 64
+
+# Running totals kept by the tracker
+TOTAL_KEYS = ("solar_energy", "self_consumed_energy", "avoided_cost")
+
+# (timestamp, arrival number, channel, kW or None while unavailable)
+Sample = tuple[float, int, int, float | None]
+
+
+class ReorderBuffer:
+    """
+    Power samples held back briefly so late ones are used in time order.
+
+    A sample is released once it is REORDER_DELAY seconds older than the
+    newest sample seen, or at a flush, or early if the buffer is full. A
+    sample older than the last release is too late and is dropped. The
+    heap never holds more than REORDER_CAPACITY samples, so each push and
+    release is constant work.
+    """
+
+    __slots__ = ("_arrivals", "_heap", "late", "newest", "released")
+
+    def __init__(self) -> None:
+        """Initialize an empty buffer."""
+        self._heap: list[Sample] = []
+        self._arrivals = count()
+        self.newest = float("-inf")
+        # Everything up to this timestamp has been released
+        self.released = float("-inf")
+        self.late = 0
+
+    def __len__(self) -> int:
+        """Return the number of samples held."""
+        return len(self._heap)
+
+    def push(self, when: float, channel: int, value: float | None) -> bool:
+        """Hold a sample; return False if it came too late to be used."""
+        if when < self.released:
+            self.late += 1
+            return False
+        heapq.heappush(self._heap, (when, next(self._arrivals), channel, value))
+        self.newest = max(self.newest, when)
+        return True
+
+    def release(self, until: float) -> Iterator[Sample]:
+        """Yield, in time order, the samples up to a time and any overflow."""
+        heap = self._heap
+        while heap and (heap[0][0] <= until or len(heap) > REORDER_CAPACITY):
+            sample = heapq.heappop(heap)
+            self.released = max(self.released, sample[0])
+            yield sample
+        self.released = max(self.released, until)
+
+
+class PowerIntegrator:
+    """
+    Time-weighted split of solar power into self-consumed and exported.
+
+    Each channel's latest power holds until its next sample. Over every
+    stretch between samples the self-consumed power is the smaller of
+    solar production and household load, where the load is measured or
+    taken as solar plus grid import (negative while exporting).
+    """
+
+    __slots__ = ("power", "time")
+
+    def __init__(self) -> None:
+        """Initialize with every channel unknown."""
+        self.power: list[float | None] = [None, None, None]
+        self.time: float | None = None
+
+    def advance(self, until: float) -> tuple[float, float]:
+        """Return the solar and self-consumed kWh up to a time."""
+        since = self.time
+        if since is not None and until <= since:
+            return 0.0, 0.0
+        self.time = until
+        if since is None:
+            return 0.0, 0.0
+
+        solar, load, grid = self.power
+        if load is None and solar is not None and grid is not None:
+            load = solar + grid
+        if solar is None or load is None:
+            return 0.0, 0.0
+
+        hours = (until - since) / SECONDS_PER_HOUR
+        solar = max(solar, 0.0)
+        return solar * hours, max(min(solar, load), 0.0) * hours
+
+
+class SelfConsumptionTracker:
+    """
+    Self-consumed solar energy and its value by band, from power sensors.
+
+    Samples from the solar, load and grid power sensors pass through a
+    small reorder buffer and are integrated in time order. The energy of
+    each stretch is valued at the import rate of its band, read from the
+    rate coordinator's snapshot; a stretch spanning the last transition
+    is split there. Every update is constant work and the memory held is
+    fixed by the buffer size and the number of bands.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        tariff: SolarSavingsTariff,
+        coordinator: RateCoordinator,
+    ) -> None:
+        """Initialize the tracker."""
+        self.hass = hass
+        self.tariff = tariff
+        self.coordinator = coordinator
+        self.signal = SIGNAL_SELF_CONSUMPTION_UPDATED.format(tariff.entry_id)
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, self_consumption_storage_key(tariff.entry_id)
+        )
+        self._save_scheduled = False
+
+        # power sensor entity id -> channel
+        self._channels = {
+            entity_id: channel
+            for channel, key in enumerate(POWER_KEYS)
+            if (entity_id := tariff.get(key))
+        }
+        self.buffer = ReorderBuffer()
+        self.integrator = PowerIntegrator()
+
+        self.totals: dict[str, float] = dict.fromkeys(TOTAL_KEYS, 0.0)
+        # band key -> [kWh, cents]
+        self.band_totals: dict[str, list[float]] = {}
+
+    @property
+    def late_samples(self) -> int:
+        """Return how many samples arrived too late to be integrated."""
+        return self.buffer.late
+
+    def band_energy(self, key: str) -> float:
+        """Return the self-consumed kWh in a band."""
+        return self.band_totals.get(key, (0.0, 0.0))[0]
+
+    def band_value(self, key: str) -> float:
+        """Return the import cost in cents avoided in a band."""
+        return self.band_totals.get(key, (0.0, 0.0))[1]
+
+    async def async_load(self) -> None:
+        """
+        Resume the totals saved by a previous run.
+
+        The power readings are not resumed; integration starts again at
+        the first sample, so the time Home Assistant was down counts as
+        nothing rather than as the last power held for hours.
+        """
+        if (data := await self._store.async_load()) is None:
+            return
+        for key in TOTAL_KEYS:
+            self.totals[key] = data["totals"].get(key, 0.0)
+        self.band_totals = {key: list(totals) for key, totals in data["bands"].items()}
+
+    async def async_save(self) -> None:
+        """Write the totals now, e.g. when the entry unloads."""
+        await self._store.async_save(self._data_to_save())
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        """Save within SAVE_DELAY of the first unsaved change."""
+        if not self._save_scheduled:
+            self._save_scheduled = True
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the totals."""
+        self._save_scheduled = False
+        return {"totals": self.totals, "bands": self.band_totals}
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        """Follow the power sensors; returns a callback to stop."""
+        unsubs = [
+            async_track_state_change_event(
+                self.hass,
+                list(self._channels),
+                instrumented(
+                    self._handle_reading, self.coordinator.instrumentation, STATE_CHANGE
+                ),
+            ),
+            # Quiet sensors hold their power; count it at least once a minute
+            async_track_utc_time_change(self.hass, self._async_flush, second=0),
+        ]
+
+        @callback
+        def _async_stop() -> None:
+            for unsub in unsubs:
+                unsub()
+
+        return _async_stop
+
+    @callback
+    def _handle_reading(self, event: Event[EventStateChangedData]) -> None:
+        """Buffer a new power reading and integrate what is ready."""
+        if (new_state := event.data["new_state"]) is None:
+            return
+
+        value: float | None = None
+        if new_state.state not in (STATE_UNKNOWN, STATE_UNAVAILABLE):
+            factor = POWER_FACTORS.get(
+                new_state.attributes.get(ATTR_UNIT_OF_MEASUREMENT), 1.0
+            )
+            try:
+                value = float(new_state.state) * factor
+            except ValueError:
+                _LOGGER.debug("Ignoring non-numeric power from %s", new_state.entity_id)
+                return
+
+        when = new_state.last_updated.timestamp()
+        if not self.buffer.push(when, self._channels[new_state.entity_id], value):
+            _LOGGER.debug("Dropping late power sample from %s", new_state.entity_id)
+            return
+        self._async_release(self.buffer.newest - REORDER_DELAY)
+
+    @callback
+    def _async_flush(self, now: datetime) -> None:
+        """Integrate up to shortly before now."""
+        self._async_release(now.timestamp() - REORDER_DELAY)
+
+    @callback
+    def _async_release(self, until: float) -> None:
+        """Integrate the released samples in order, then up to a time."""
+        self_consumed = self.totals["self_consumed_energy"]
+        for when, _arrival, channel, value in self.buffer.release(until):
+            self._integrate(when)
+            self.integrator.power[channel] = value
+        self._integrate(self.buffer.released)
+
+        if self.totals["self_consumed_energy"] != self_consumed:
+            self._async_schedule_save()
+            async_dispatcher_send(self.hass, self.signal)
+
+    def _integrate(self, until: float) -> None:
+        """Count the energy up to a time, split at the last rate transition."""
+        since = self.integrator.time
+        if since is not None and (snapshot := self.coordinator.snapshot) is not None:
+            transition = snapshot.since.timestamp()
+            if since < transition < until:
+                self._add_stretch(since, transition)
+                since = transition
+        self._add_stretch(since, until)
+
+    def _add_stretch(self, since: float | None, until: float) -> None:
+        """Add the energy of a stretch within one band."""
+        solar, self_consumed = self.integrator.advance(until)
+        if not solar:
+            return
+        self.totals["solar_energy"] += solar
+        if not self_consumed:
+            return
+
+        band = self.coordinator.band_at(dt_util.utc_from_timestamp(since))
+        value = self_consumed * band.rate
+        self.totals["self_consumed_energy"] += self_consumed
+        self.totals["avoided_cost"] += value
+        totals = self.band_totals.setdefault(band.key, [0.0, 0.0])
+        totals[0] += self_consumed
+        totals[1] += value
+
+
+def self_consumption_storage_key(entry_id: str) -> str:
+    """Return the key of an entry's self-consumption store."""
+    return f"{storage_key(entry_id)}.self_consumption"
@@ -1,18 +1,53 @@
 """Sensor platform for Solar Savings."""
+
 from __future__ import annotations
 
+from typing import TYPE_CHECKING, Any
+
 from homeassistant.components.sensor import (
+    SensorDeviceClass,
     SensorEntity,
     SensorStateClass,
 )
-from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, UnitOfEnergy, UnitOfPower, UnitOfTime
 from homeassistant.core import HomeAssistant, callback
-from homeassistant.helpers.device_registry import DeviceInfo
-from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.event import async_track_state_change_event
-from homeassistant.const import STATE_ON
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.util import dt as dt_util
+
+from .coordinator import RateCoordinator, RatePresentation, rate_presentations
+from .entity import SolarSavingsEntity, SolarSavingsThrottledEntity
+from .instrumentation import OPERATIONS, Instrumentation
+from .planner import PLAN_ACTIONS, BatteryPlanner
+
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+    from .data import SolarSavingsData
+    from .demand import DemandTracker
+    from .engine import SavingsEngine
+    from .forecast import ForecastProjector
+    from .prices import PriceFeed
+    from .self_consumption import SelfConsumptionTracker
+    from .tariff import RateBand, SolarSavingsTariff
+
+# Total -> the block counter that prices it
+BLOCK_TOTALS = {"import_cost": "import", "export_credit": "export"}
+
+# Rolling statistics of the price buffers, each read in constant time
+PRICE_STATISTICS = ("average", "minimum", "maximum")
+
+# Savings total -> (name, icon) of its sensor
+TOTAL_SENSORS = {
+    "import_cost": ("Import Cost", "mdi:cash-minus"),
+    "export_credit": ("Export Credit", "mdi:cash-plus"),
+    "avoided_cost": ("Avoided Import Cost", "mdi:solar-power-variant"),
+    "self_consumed_energy": (
+        "Self Consumed Energy",
+        "mdi:home-lightning-bolt-outline",
+    ),
+}
 
-from .const import DOMAIN
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -20,262 +55,889 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up the Solar Savings sensors."""
-    
-    # Get current values
-    on_peak = entry.options.get("on_peak_rate", entry.data.get("on_peak_rate", 0.0))
-    off_peak = entry.options.get("off_peak_rate", entry.data.get("off_peak_rate", 0.0))
-    export_rate = entry.options.get("export_rate", entry.data.get("export_rate", 0.0))
-    active_schedule = entry.options.get("peak_schedule", entry.data.get("peak_schedule", "None"))
+    # Values are read live from the shared tariff state
+    data: SolarSavingsData = entry.runtime_data
+    async_add_entities(
+        [
+            *_rate_sensors(hass, data),
+            *_feature_sensors(hass, data),
+            *_total_sensors(hass, data),
+        ]
+    )
 
-    entities = []
+
+def _rate_sensors(hass: HomeAssistant, data: SolarSavingsData) -> list[SensorEntity]:
+    """Return the schedule, rate and price sensors."""
+    tariff = data.tariff
 
     # 1. Active Schedule Name (Text Sensor)
-    entities.append(
+    entities: list[SensorEntity] = [
         SolarSavingsTextSensor(
-            name="Active Schedule",
-            value=active_schedule,
-            entry_id=entry.entry_id,
-            icon="mdi:calendar-check"
+            tariff=tariff, name="Active Schedule", icon="mdi:calendar-check"
         )
-    )
+    ]
 
-    # 2. On Peak Rate Sensor (Static)
-    entities.append(
-        SolarSavingsRateSensor(
-            name="On Peak Rate",
-            value=on_peak,
-            entry_id=entry.entry_id,
-            unique_suffix="on_peak_rate"
+    # 2. and 3. On and Off Peak Rate Sensors (Static, not on dynamic tariffs)
+    if not tariff.is_dynamic:
+        entities.append(
+            SolarSavingsRateSensor(
+                tariff=tariff, name="On Peak Rate", unique_suffix="on_peak_rate"
+            )
         )
-    )
-
-    # 3. Off Peak Rate Sensor (Static)
-    entities.append(
-        SolarSavingsRateSensor(
-            name="Off Peak Rate",
-            value=off_peak,
-            entry_id=entry.entry_id,
-            unique_suffix="off_peak_rate"
+        entities.append(
+            SolarSavingsRateSensor(
+                tariff=tariff, name="Off Peak Rate", unique_suffix="off_peak_rate"
+            )
         )
-    )
 
-    # 4. Export Rate Sensors (Static)
-    entities.append(
-        SolarSavingsExportSensor(
-            hass=hass,
-            name="Export Rate (Cents)",
-            value=export_rate,
-            entry_id=entry.entry_id,
-            unique_suffix="export_rate_cents",
-            mode="cents"
-        )
+    # 4. Export Rate Sensors, one per presentation
+    presentations = rate_presentations(
+        hass.config.currency,
+        tariff.tax_rate,
+        rates_include_tax=tariff.rates_include_tax,
     )
-
-    entities.append(
-        SolarSavingsExportSensor(
-            hass=hass,
-            name="Export Rate (Dollars)",
-            value=export_rate,
-            entry_id=entry.entry_id,
-            unique_suffix="export_rate_dollars",
-            mode="dollars"
-        )
+    entities.extend(
+        SolarSavingsCurrentRateSensor(data.coordinator, tariff, presentation, "export")
+        for presentation in presentations
     )
 
-    # Dynamic Sensors (Only if a schedule is configured)
-    if active_schedule and active_schedule != "None":
-        
-        # 5. Current Import Rate (Cents)
-        entities.append(
+    # 5. Current Import Rate Sensors (Only if peak times or a price feed are configured)
+    if tariff.has_time_of_use or tariff.is_dynamic:
+        entities.extend(
             SolarSavingsCurrentRateSensor(
-                hass=hass,
-                entry_id=entry.entry_id,
-                schedule_entity_id=active_schedule,
-                on_peak=on_peak,
-                off_peak=off_peak,
-                name="Current Import Rate (Cents)",
-                unique_suffix="current_import_rate_cents",
-                mode="cents"
+                data.coordinator, tariff, presentation, "import"
             )
+            for presentation in presentations
+        )
+
+    # 6. Rolling Price Sensors (Only for dynamic tariffs)
+    if prices := data.prices:
+        windows = ["recent"]
+        if tariff.price_forecast_attribute:
+            windows.append("forecast")
+        entities.extend(
+            SolarSavingsPriceSensor(prices, tariff, window, statistic)
+            for window in windows
+            for statistic in PRICE_STATISTICS
         )
 
-        # 6. Current Import Rate (Dollars)
+    return entities
+
+
+def _feature_sensors(hass: HomeAssistant, data: SolarSavingsData) -> list[SensorEntity]:
+    """Return the sensors of the optional features that are configured."""
+    tariff = data.tariff
+    entities: list[SensorEntity] = []
+
+    # 7. Demand Sensors (Only if a demand sensor is configured)
+    if demand := data.demand:
+        entities.append(SolarSavingsDemandSensor(demand, tariff))
+        entities.append(SolarSavingsPeakDemandSensor(demand, tariff))
+        entities.append(SolarSavingsDemandChargeSensor(hass, demand, tariff))
+
+    # 8. Self Consumption Sensors (Only if solar and load or grid power are configured)
+    if self_consumption := data.self_consumption:
+        for band in (None, *tariff.bands):
+            entities.append(
+                SolarSavingsSelfConsumptionEnergySensor(self_consumption, tariff, band)
+            )
+            entities.append(
+                SolarSavingsSelfConsumptionValueSensor(
+                    hass, self_consumption, tariff, band
+                )
+            )
+
+    # 9. Projection Sensors (Only if a solar forecast is configured)
+    if projector := data.projector:
         entities.append(
-            SolarSavingsCurrentRateSensor(
-                hass=hass,
-                entry_id=entry.entry_id,
-                schedule_entity_id=active_schedule,
-                on_peak=on_peak,
-                off_peak=off_peak,
-                name="Current Import Rate (Dollars)",
-                unique_suffix="current_import_rate_dollars",
-                mode="dollars"
+            SolarSavingsProjectionSensor(hass, projector, tariff, "import_cost")
+        )
+        entities.append(
+            SolarSavingsProjectionSensor(hass, projector, tariff, "savings")
+        )
+
+    # 10. Battery Plan Sensor (Only if a battery is configured)
+    if planner := data.planner:
+        entities.append(SolarSavingsBatteryPlanSensor(hass, planner, tariff))
+
+    # 11. Latency Sensors (Only if instrumentation is enabled)
+    if instrumentation := data.instrumentation:
+        entities.extend(
+            SolarSavingsLatencySensor(instrumentation, tariff, operation)
+            for operation in OPERATIONS
+        )
+
+    # Named bands (only when the tariff defines its own bands)
+    if tariff.get("bands"):
+        entities.extend(
+            SolarSavingsBandRateSensor(tariff=tariff, band=band)
+            for band in tariff.bands
+        )
+
+    return entities
+
+
+def _total_sensors(hass: HomeAssistant, data: SolarSavingsData) -> list[SensorEntity]:
+    """Return the savings totals of the energy meters that are configured."""
+    tariff = data.tariff
+    entities: list[SensorEntity] = []
+    if (engine := data.engine) is None:
+        return entities
+
+    if tariff.get("grid_import_sensor"):
+        entities.append(SolarSavingsTotalSensor(hass, engine, tariff, "import_cost"))
+        for band in tariff.bands:
+            entities.append(
+                SolarSavingsBandEnergySensor(engine, tariff=tariff, band=band)
+            )
+            entities.append(
+                SolarSavingsBandCostSensor(hass, engine, tariff=tariff, band=band)
             )
+
+    if tariff.get("grid_export_sensor"):
+        entities.append(SolarSavingsTotalSensor(hass, engine, tariff, "export_credit"))
+
+    if tariff.get("solar_production_sensor"):
+        entities.append(SolarSavingsTotalSensor(hass, engine, tariff, "avoided_cost"))
+        entities.append(
+            SolarSavingsTotalSensor(hass, engine, tariff, "self_consumed_energy")
         )
-    
-    async_add_entities(entities)
 
+    if tariff.get("grid_export_sensor") or tariff.get("solar_production_sensor"):
+        entities.append(SolarSavingsNetSavingsSensor(hass, engine, tariff))
+
+    return entities
 
-class SolarSavingsTextSensor(SensorEntity):
+
+class SolarSavingsTextSensor(SolarSavingsEntity, SensorEntity):
     """Representation of a text sensor."""
-    
-    _attr_has_entity_name = True
 
-    def __init__(self, name: str, value: str, entry_id: str, icon: str) -> None:
+    def __init__(self, tariff: SolarSavingsTariff, name: str, icon: str) -> None:
+        """Initialize the sensor."""
+        super().__init__(tariff)
         self._attr_name = name
-        self._attr_native_value = value
-        self._entry_id = entry_id
         self._attr_icon = icon
-        self._attr_unique_id = f"{entry_id}_{name.lower().replace(' ', '_')}"
+        self._attr_unique_id = f"{tariff.entry_id}_{name.lower().replace(' ', '_')}"
 
     @property
-    def device_info(self) -> DeviceInfo:
-        return DeviceInfo(
-            identifiers={(DOMAIN, self._entry_id)},
-            name="Solar Savings",
-            manufacturer="Solar Savings Integration",
-            model="Savings Calculator",
-        )
+    def native_value(self) -> str:
+        """Return the active schedule entity."""
+        return self.tariff.peak_schedule or "None"
 
 
-class SolarSavingsRateSensor(SensorEntity):
+class SolarSavingsRateSensor(SolarSavingsEntity, SensorEntity):
     """Representation of a Static Numeric Rate Sensor (always Cents)."""
 
-    _attr_has_entity_name = True
     _attr_state_class = SensorStateClass.MEASUREMENT
     _attr_native_unit_of_measurement = "c/kWh"
     _attr_icon = "mdi:currency-usd"
 
-    def __init__(self, name: str, value: float, entry_id: str, unique_suffix: str) -> None:
+    def __init__(
+        self, tariff: SolarSavingsTariff, name: str, unique_suffix: str
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(tariff)
         self._attr_name = name
-        self._attr_native_value = value
-        self._entry_id = entry_id
-        self._attr_unique_id = f"{entry_id}_{unique_suffix}"
+        self._config_key = unique_suffix
+        self._attr_unique_id = f"{tariff.entry_id}_{unique_suffix}"
 
     @property
-    def device_info(self) -> DeviceInfo:
-        return DeviceInfo(
-            identifiers={(DOMAIN, self._entry_id)},
-            name="Solar Savings",
-            manufacturer="Solar Savings Integration",
-            model="Savings Calculator",
-        )
+    def native_value(self) -> float:
+        """Return the rate from the shared tariff state."""
+        return self.tariff.get(self._config_key, 0.0)
 
 
-class SolarSavingsExportSensor(SensorEntity):
-    """Representation of an Export Rate Sensor (Supports Cents or Dollars)."""
+class SolarSavingsBandRateSensor(SolarSavingsEntity, SensorEntity):
+    """Representation of a named band's rate (always Cents)."""
 
-    _attr_has_entity_name = True
     _attr_state_class = SensorStateClass.MEASUREMENT
-    _attr_icon = "mdi:home-export-outline"
+    _attr_native_unit_of_measurement = "c/kWh"
+    _attr_icon = "mdi:currency-usd"
 
-    def __init__(self, hass: HomeAssistant, name: str, value: float, entry_id: str, unique_suffix: str, mode: str) -> None:
-        self._attr_name = name
-        self._entry_id = entry_id
-        self._attr_unique_id = f"{entry_id}_{unique_suffix}"
-        
-        # Determine Value and Unit based on mode
-        if mode == "dollars":
-            currency = hass.config.currency
-            self._attr_native_unit_of_measurement = f"{currency}/kWh"
-            self._attr_native_value = value / 100.0
-            self._attr_suggested_display_precision = 4
+    def __init__(self, tariff: SolarSavingsTariff, band: RateBand) -> None:
+        """Initialize the sensor."""
+        super().__init__(tariff)
+        self._band_key = band.key
+        self._attr_name = f"{band.name} Rate"
+        self._attr_unique_id = f"{tariff.entry_id}_band_{band.key}_rate"
+
+    @property
+    def native_value(self) -> float:
+        """Return the band's rate from the shared tariff state."""
+        return self.tariff.band_rate(self._band_key)
+
+
+class SolarSavingsCurrentRateSensor(SolarSavingsEntity, SensorEntity):
+    """
+    Current import or export rate in one presentation (unit and tax).
+
+    Reads the coordinator's snapshot, so any number of these cost one
+    lookup per transition between them.
+    """
+
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(
+        self,
+        coordinator: RateCoordinator,
+        tariff: SolarSavingsTariff,
+        presentation: RatePresentation,
+        source: str,  # 'import' or 'export'
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(tariff)
+        self._coordinator = coordinator
+        self._presentation = presentation
+        self._source = source
+
+        if source == "import":
+            self._attr_name = f"Current Import Rate ({presentation.name})"
+            self._attr_unique_id = (
+                f"{tariff.entry_id}_current_import_rate_{presentation.key}"
+            )
+            self._attr_icon = "mdi:cash-fast"
         else:
-            self._attr_native_unit_of_measurement = "c/kWh"
-            self._attr_native_value = value
-            self._attr_suggested_display_precision = 2
+            self._attr_name = f"Export Rate ({presentation.name})"
+            self._attr_unique_id = f"{tariff.entry_id}_export_rate_{presentation.key}"
+            self._attr_icon = "mdi:home-export-outline"
+
+        self._attr_native_unit_of_measurement = presentation.unit
+        self._attr_suggested_display_precision = presentation.precision
+
+    async def async_added_to_hass(self) -> None:
+        """Follow the coordinator."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass, self._coordinator.signal, self.async_write_ha_state
+            )
+        )
+
+    @callback
+    def _handle_tariff_update(self) -> None:
+        """Wait for the coordinator, which resolves the new rates next."""
 
     @property
-    def device_info(self) -> DeviceInfo:
-        return DeviceInfo(
-            identifiers={(DOMAIN, self._entry_id)},
-            name="Solar Savings",
-            manufacturer="Solar Savings Integration",
-            model="Savings Calculator",
+    def native_value(self) -> float | None:
+        """Return the current rate in this presentation."""
+        if (snapshot := self._coordinator.snapshot) is None:
+            return None
+        if self._source == "import":
+            return self._presentation.convert(snapshot.band.rate)
+        return self._presentation.convert(snapshot.export_rate)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return the band behind the current import rate."""
+        if self._source != "import" or (snapshot := self._coordinator.snapshot) is None:
+            return None
+        return {
+            "status": snapshot.band.name,
+            "band": snapshot.band.key,
+            "raw_cents": snapshot.band.rate,
+        }
+
+
+class SolarSavingsPriceSensor(SolarSavingsEntity, SensorEntity):
+    """
+    Rolling average, minimum or maximum of a dynamic tariff's prices.
+
+    "recent" covers the last prices received, "forecast" the prices of
+    the price sensor's forecast attribute.
+    """
+
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = "c/kWh"
+    _attr_suggested_display_precision = 2
+    _attr_icon = "mdi:chart-line"
+
+    def __init__(
+        self,
+        prices: PriceFeed,
+        tariff: SolarSavingsTariff,
+        window: str,
+        statistic: str,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(tariff)
+        self._buffer = prices.recent if window == "recent" else prices.forecast
+        self._prices = prices
+        self._statistic = statistic
+
+        prefix = "Price" if window == "recent" else "Forecast Price"
+        self._attr_name = f"{prefix} {statistic.title()}"
+        self._attr_unique_id = f"{tariff.entry_id}_price_{window}_{statistic}"
+
+    async def async_added_to_hass(self) -> None:
+        """Follow the price feed."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass, self._prices.signal, self.async_write_ha_state
+            )
         )
 
+    @property
+    def native_value(self) -> float | None:
+        """Return the statistic over the buffered prices."""
+        return getattr(self._buffer, self._statistic)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return how many prices the statistic covers."""
+        return {"samples": len(self._buffer)}
+
 
-class SolarSavingsCurrentRateSensor(SensorEntity):
-    """Sensor that displays the current rate based on schedule (Supports Cents or Dollars)."""
+class SolarSavingsDemandEntity(SolarSavingsEntity, SensorEntity):
+    """Base for a value kept by the demand tracker, written once a minute."""
 
-    _attr_has_entity_name = True
+    def __init__(self, demand: DemandTracker, tariff: SolarSavingsTariff) -> None:
+        """Initialize the sensor."""
+        super().__init__(tariff)
+        self._demand = demand
+
+    async def async_added_to_hass(self) -> None:
+        """Follow the demand tracker."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass, self._demand.signal, self.async_write_ha_state
+            )
+        )
+
+
+class SolarSavingsDemandSensor(SolarSavingsDemandEntity):
+    """Average power over the demand window just ended."""
+
+    _attr_device_class = SensorDeviceClass.POWER
     _attr_state_class = SensorStateClass.MEASUREMENT
-    _attr_icon = "mdi:cash-fast"
+    _attr_native_unit_of_measurement = UnitOfPower.KILO_WATT
+    _attr_suggested_display_precision = 2
+    _attr_icon = "mdi:chart-bell-curve"
+
+    def __init__(self, demand: DemandTracker, tariff: SolarSavingsTariff) -> None:
+        """Initialize the sensor."""
+        super().__init__(demand, tariff)
+        self._attr_name = "Demand"
+        self._attr_unique_id = f"{tariff.entry_id}_demand"
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the rolling demand."""
+        return self._demand.demand
+
+
+class SolarSavingsPeakDemandSensor(SolarSavingsDemandEntity):
+    """Highest demand of the billing period, in the demand bands."""
+
+    _attr_device_class = SensorDeviceClass.POWER
+    _attr_native_unit_of_measurement = UnitOfPower.KILO_WATT
+    _attr_suggested_display_precision = 2
+    _attr_icon = "mdi:chart-timeline-variant-shimmer"
+
+    def __init__(self, demand: DemandTracker, tariff: SolarSavingsTariff) -> None:
+        """Initialize the sensor."""
+        super().__init__(demand, tariff)
+        self._attr_name = "Peak Demand"
+        self._attr_unique_id = f"{tariff.entry_id}_peak_demand"
+
+    @property
+    def native_value(self) -> float:
+        """Return the billing period's peak demand."""
+        return self._demand.peak_demand
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return when the peak was reached and when the period started."""
+        peak_time = self._demand.peak.maximum_time
+        return {
+            "peak_time": (
+                dt_util.utc_from_timestamp(peak_time).isoformat() if peak_time else None
+            ),
+            "period_start": self._demand.period_start.isoformat(),
+        }
+
+
+class SolarSavingsDemandChargeSensor(SolarSavingsDemandEntity):
+    """Demand charge for the billing period, at the peak so far."""
+
+    _attr_device_class = SensorDeviceClass.MONETARY
+    _attr_suggested_display_precision = 2
+    _attr_icon = "mdi:cash-clock"
 
     def __init__(
-        self, 
-        hass: HomeAssistant, 
-        entry_id: str, 
-        schedule_entity_id: str, 
-        on_peak: float, 
-        off_peak: float,
-        name: str,
-        unique_suffix: str,
-        mode: str # 'cents' or 'dollars'
+        self, hass: HomeAssistant, demand: DemandTracker, tariff: SolarSavingsTariff
     ) -> None:
         """Initialize the sensor."""
-        self.hass = hass
-        self._entry_id = entry_id
-        self._schedule_entity_id = schedule_entity_id
-        self._on_peak = on_peak
-        self._off_peak = off_peak
-        self._mode = mode
-        
-        self._attr_name = name
-        self._attr_unique_id = f"{entry_id}_{unique_suffix}"
-        
-        # Configure Units based on mode
-        if self._mode == "dollars":
-            currency = hass.config.currency
-            self._attr_native_unit_of_measurement = f"{currency}/kWh"
-            self._attr_suggested_display_precision = 4 
+        super().__init__(demand, tariff)
+        self._attr_name = "Projected Demand Charge"
+        self._attr_unique_id = f"{tariff.entry_id}_projected_demand_charge"
+        self._attr_native_unit_of_measurement = hass.config.currency
+
+    @property
+    def native_value(self) -> float:
+        """Return the projected demand charge."""
+        return self._demand.projected_charge
+
+
+class SolarSavingsSelfConsumptionEntity(SolarSavingsThrottledEntity, SensorEntity):
+    """
+    Base for a self-consumption total, overall or for one band.
+
+    Totals follow the power sensors, so writes are throttled like the
+    engine's and flushed at every rate transition.
+    """
+
+    def __init__(
+        self,
+        tracker: SelfConsumptionTracker,
+        tariff: SolarSavingsTariff,
+        band: RateBand | None,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(tariff)
+        self._tracker = tracker
+        self._band_key = band.key if band else None
+
+    async def async_added_to_hass(self) -> None:
+        """Follow the tracker and the rate transitions."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass, self._tracker.signal, self.async_write_throttled
+            )
+        )
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass, self._tracker.coordinator.signal, self.async_flush
+            )
+        )
+
+
+class SolarSavingsSelfConsumptionEnergySensor(SolarSavingsSelfConsumptionEntity):
+    """Solar energy used on site, integrated from power."""
+
+    _attr_device_class = SensorDeviceClass.ENERGY
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
+    _attr_suggested_display_precision = 3
+    _attr_icon = "mdi:home-lightning-bolt"
+
+    def __init__(
+        self,
+        tracker: SelfConsumptionTracker,
+        tariff: SolarSavingsTariff,
+        band: RateBand | None,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(tracker, tariff, band)
+        if band is None:
+            self._attr_name = "Self Consumption"
+            self._attr_unique_id = f"{tariff.entry_id}_power_self_consumption"
+        else:
+            self._attr_name = f"{band.name} Self Consumption"
+            self._attr_unique_id = f"{tariff.entry_id}_band_{band.key}_self_consumption"
+
+    @property
+    def native_value(self) -> float:
+        """Return the self-consumed kWh."""
+        if self._band_key is None:
+            return self._tracker.totals["self_consumed_energy"]
+        return self._tracker.band_energy(self._band_key)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return the share of solar used on site and the samples dropped."""
+        if self._band_key is not None:
+            return None
+        solar = self._tracker.totals["solar_energy"]
+        return {
+            "solar_energy": round(solar, 3),
+            "self_consumption_ratio": (
+                round(self._tracker.totals["self_consumed_energy"] / solar, 3)
+                if solar
+                else None
+            ),
+            "late_samples": self._tracker.late_samples,
+        }
+
+
+class SolarSavingsSelfConsumptionValueSensor(SolarSavingsSelfConsumptionEntity):
+    """Import cost avoided by self-consumption, at the band rates."""
+
+    _attr_device_class = SensorDeviceClass.MONETARY
+    _attr_state_class = SensorStateClass.TOTAL
+    _attr_suggested_display_precision = 2
+    _attr_icon = "mdi:solar-power-variant"
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        tracker: SelfConsumptionTracker,
+        tariff: SolarSavingsTariff,
+        band: RateBand | None,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(tracker, tariff, band)
+        if band is None:
+            self._attr_name = "Self Consumption Value"
+            self._attr_unique_id = f"{tariff.entry_id}_power_self_consumption_value"
         else:
-            self._attr_native_unit_of_measurement = "c/kWh"
-            self._attr_suggested_display_precision = 2 
+            self._attr_name = f"{band.name} Self Consumption Value"
+            self._attr_unique_id = (
+                f"{tariff.entry_id}_band_{band.key}_self_consumption_value"
+            )
+        self._attr_native_unit_of_measurement = hass.config.currency
+
+    @property
+    def native_value(self) -> float:
+        """Return the avoided import cost in dollars."""
+        if self._band_key is None:
+            return self._tracker.totals["avoided_cost"] / 100.0
+        return self._tracker.band_value(self._band_key) / 100.0
+
+
+class SolarSavingsProjectionSensor(SolarSavingsEntity, SensorEntity):
+    """
+    Projected import cost or savings for the rest of the day.
+
+    Reads the projector's memoised projection, so a write at each hour or
+    forecast change is a lookup.
+    """
+
+    _attr_device_class = SensorDeviceClass.MONETARY
+    _attr_suggested_display_precision = 2
+    # The hourly breakdown changes with every forecast; keep it out of history
+    _unrecorded_attributes = frozenset({"hours"})
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        projector: ForecastProjector,
+        tariff: SolarSavingsTariff,
+        key: str,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(tariff)
+        self._projector = projector
+        self._key = key
+        if key == "import_cost":
+            self._attr_name = "Projected Import Cost"
+            self._attr_icon = "mdi:cash-clock"
+        else:
+            self._attr_name = "Projected Savings"
+            self._attr_icon = "mdi:piggy-bank-outline"
+        self._attr_unique_id = f"{tariff.entry_id}_projected_{key}"
+        self._attr_native_unit_of_measurement = hass.config.currency
 
     async def async_added_to_hass(self) -> None:
-        """Register callbacks when entity is added."""
+        """Follow the projector."""
+        await super().async_added_to_hass()
         self.async_on_remove(
-            async_track_state_change_event(
-                self.hass, [self._schedule_entity_id], self._handle_schedule_change
+            async_dispatcher_connect(
+                self.hass, self._projector.signal, self.async_write_ha_state
             )
         )
-        self._update_state()
 
     @callback
-    def _handle_schedule_change(self, event) -> None:
-        """Handle the schedule changing state."""
-        self._update_state()
-        self.async_write_ha_state()
-
-    def _update_state(self) -> None:
-        """Determine the current rate and apply conversion if needed."""
-        state = self.hass.states.get(self._schedule_entity_id)
-
-        # 1. Determine the source rate (in CENTS)
-        if state and state.state == STATE_ON:
-            current_rate_cents = self._on_peak
-            status = "On Peak"
-        else:
-            current_rate_cents = self._off_peak
-            status = "Off Peak"
+    def _handle_tariff_update(self) -> None:
+        """Wait for the projector, which projects the new tariff next."""
 
-        # 2. Apply Output Conversion
-        if self._mode == "dollars":
-            self._attr_native_value = current_rate_cents / 100.0
+    @property
+    def native_value(self) -> float | None:
+        """Return the projected total for the rest of the day in dollars."""
+        if self._key == "import_cost":
+            value = self._projector.remaining_cost
         else:
-            self._attr_native_value = current_rate_cents
+            value = self._projector.remaining_savings
+        return None if value is None else value / 100.0
 
-        self._attr_extra_state_attributes = {
-            "status": status,
-            "raw_cents": current_rate_cents
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return the remaining hours of the projection."""
+        if (projection := self._projector.projection) is None:
+            return None
+        return {
+            "hours": [
+                {"start": hour["start"], self._key: hour[self._key]}
+                for hour in projection.as_hours(dt_util.utcnow())
+            ]
         }
 
+
+class SolarSavingsBatteryPlanSensor(SolarSavingsEntity, SensorEntity):
+    """What the battery plan does this hour, with the plan as attributes."""
+
+    _attr_device_class = SensorDeviceClass.ENUM
+    _attr_translation_key = "battery_plan"
+    _attr_icon = "mdi:battery-clock"
+    # The hourly schedule changes with every replan; keep it out of history
+    _unrecorded_attributes = frozenset({"hours"})
+
+    def __init__(
+        self, hass: HomeAssistant, planner: BatteryPlanner, tariff: SolarSavingsTariff
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(tariff)
+        self._planner = planner
+        self._currency = hass.config.currency
+        self._attr_options = list(PLAN_ACTIONS)
+        self._attr_name = "Battery Plan"
+        self._attr_unique_id = f"{tariff.entry_id}_battery_plan"
+
+    async def async_added_to_hass(self) -> None:
+        """Follow the planner."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass, self._planner.signal, self.async_write_ha_state
+            )
+        )
+
+    @callback
+    def _handle_tariff_update(self) -> None:
+        """Wait for the planner, which plans with the new tariff next."""
+
+    @property
+    def native_value(self) -> str | None:
+        """Return the planned action for the current hour."""
+        if (plan := self._planner.plan) is None:
+            return None
+        if (index := plan.hour_at(dt_util.utcnow())) is None:
+            return None
+        return plan.action(index)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return this hour's energy and target, and the plan's cost."""
+        if (plan := self._planner.plan) is None:
+            return None
+        index = plan.hour_at(dt_util.utcnow())
+        return {
+            "energy": None if index is None else round(float(plan.energy[index]), 3),
+            "target_soc": None
+            if index is None
+            else round(float(plan.soc[index + 1]), 3),
+            "cost": round(plan.cost / 100.0, 2),
+            "savings": round((plan.baseline_cost - plan.cost) / 100.0, 2),
+            "currency": self._currency,
+            "complete": plan.complete,
+            "hours": plan.as_hours(),
+        }
+
+
+class SolarSavingsLatencySensor(SolarSavingsEntity, SensorEntity):
+    """
+    The 99th percentile latency of one instrumented operation.
+
+    Polled, so the timed callbacks never write its state themselves.
+    """
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_suggested_display_precision = 3
+    _attr_icon = "mdi:timer-outline"
+    _attr_should_poll = True
+    # The bucket counts change with every call; keep them out of history
+    _unrecorded_attributes = frozenset({"buckets_ms"})
+
+    def __init__(
+        self,
+        instrumentation: Instrumentation,
+        tariff: SolarSavingsTariff,
+        operation: str,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(tariff)
+        self._histogram = instrumentation.histograms[operation]
+        self._attr_name = f"{operation.replace('_', ' ').title()} Latency"
+        self._attr_unique_id = f"{tariff.entry_id}_{operation}_latency"
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the 99th percentile in milliseconds."""
+        return self._histogram.percentile(99)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the call count, the other summaries and the buckets."""
+        summary = self._histogram.as_dict()
+        del summary["p99_ms"]
+        return summary
+
+
+class SolarSavingsEngineSensor(SolarSavingsThrottledEntity, SensorEntity):
+    """
+    Base for a running total kept by the savings engine.
+
+    The engine counts every meter update; the sensor's writes are
+    throttled by the entry's write interval and change threshold.
+    """
+
+    def __init__(self, engine: SavingsEngine, tariff: SolarSavingsTariff) -> None:
+        """Initialize the sensor."""
+        super().__init__(tariff)
+        self._engine = engine
+        # The engine publishes hourly statistics itself; without a state
+        # class the recorder does not compile a second set from the states.
+        if engine.statistics:
+            self._attr_state_class = None
+
+    async def async_added_to_hass(self) -> None:
+        """Follow the engine."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass, self._engine.signal, self._handle_savings_update
+            )
+        )
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass, self._engine.flush_signal, self.async_flush
+            )
+        )
+
+    @callback
+    def _handle_savings_update(self, _band_key: str | None) -> None:
+        """Write the new total, subject to the throttle."""
+        self.async_write_throttled()
+
+
+class SolarSavingsTotalSensor(SolarSavingsEngineSensor):
+    """A running energy or money total (money is shown in dollars)."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        engine: SavingsEngine,
+        tariff: SolarSavingsTariff,
+        total_key: str,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(engine, tariff)
+        self._attr_name, self._attr_icon = TOTAL_SENSORS[total_key]
+        self._total_key = total_key
+        self._attr_unique_id = f"{tariff.entry_id}_{total_key}"
+
+        if total_key.endswith("_energy"):
+            self._scale = 1.0
+            self._attr_device_class = SensorDeviceClass.ENERGY
+            state_class = SensorStateClass.TOTAL_INCREASING
+            self._attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
+            self._attr_suggested_display_precision = 3
+        else:
+            # Accumulated in cents; MONETARY only allows the TOTAL state class
+            self._scale = 100.0
+            self._attr_device_class = SensorDeviceClass.MONETARY
+            state_class = SensorStateClass.TOTAL
+            self._attr_native_unit_of_measurement = hass.config.currency
+            self._attr_suggested_display_precision = 2
+        # Left unset while the engine publishes the statistics itself
+        if engine.statistics is None:
+            self._attr_state_class = state_class
+
+    @property
+    def native_value(self) -> float:
+        """Return the running total."""
+        return self._engine.totals[self._total_key] / self._scale
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return the block usage behind a total priced by block."""
+        if (
+            counter := self._engine.blocks.get(BLOCK_TOTALS.get(self._total_key))
+        ) is None:
+            return None
+        return {"period_energy": round(counter.used, 3), "block": counter.block + 1}
+
+
+class SolarSavingsNetSavingsSensor(SolarSavingsEngineSensor):
+    """Avoided import cost plus export credit."""
+
+    _attr_device_class = SensorDeviceClass.MONETARY
+    _attr_state_class = SensorStateClass.TOTAL
+    _attr_suggested_display_precision = 2
+    _attr_icon = "mdi:piggy-bank-outline"
+
+    def __init__(
+        self, hass: HomeAssistant, engine: SavingsEngine, tariff: SolarSavingsTariff
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(engine, tariff)
+        self._attr_name = "Net Savings"
+        self._attr_unique_id = f"{tariff.entry_id}_net_savings"
+        self._attr_native_unit_of_measurement = hass.config.currency
+
+    @property
+    def native_value(self) -> float:
+        """Return the net savings in dollars."""
+        return self._engine.net_savings / 100.0
+
+
+class SolarSavingsBandTotalSensor(SolarSavingsEngineSensor):
+    """Base for a band's import totals."""
+
+    def __init__(
+        self, engine: SavingsEngine, tariff: SolarSavingsTariff, band: RateBand
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(engine, tariff)
+        self._band_key = band.key
+
+    @callback
+    def _handle_savings_update(self, band_key: str | None) -> None:
+        """Write the new total if it belongs to this band."""
+        if band_key == self._band_key:
+            self.async_write_throttled()
+
+
+class SolarSavingsBandEnergySensor(SolarSavingsBandTotalSensor):
+    """Energy imported while a band was in force."""
+
+    _attr_device_class = SensorDeviceClass.ENERGY
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
+    _attr_suggested_display_precision = 3
+    _attr_icon = "mdi:transmission-tower-import"
+
+    def __init__(
+        self, engine: SavingsEngine, tariff: SolarSavingsTariff, band: RateBand
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(engine, tariff, band)
+        self._attr_name = f"{band.name} Energy"
+        self._attr_unique_id = f"{tariff.entry_id}_band_{band.key}_energy"
+
+    @property
+    def native_value(self) -> float:
+        """Return the kWh imported in this band."""
+        return self._engine.band_energy(self._band_key)
+
+
+class SolarSavingsBandCostSensor(SolarSavingsBandTotalSensor):
+    """Cost of the energy imported while a band was in force."""
+
+    _attr_device_class = SensorDeviceClass.MONETARY
+    _attr_state_class = SensorStateClass.TOTAL
+    _attr_suggested_display_precision = 2
+    _attr_icon = "mdi:cash-multiple"
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        engine: SavingsEngine,
+        tariff: SolarSavingsTariff,
+        band: RateBand,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(engine, tariff, band)
+        self._attr_name = f"{band.name} Cost"
+        self._attr_unique_id = f"{tariff.entry_id}_band_{band.key}_cost"
+        self._attr_native_unit_of_measurement = hass.config.currency
+
     @property
-    def device_info(self) -> DeviceInfo:
-        return DeviceInfo(
-            identifiers={(DOMAIN, self._entry_id)},
-            name="Solar Savings",
-            manufacturer="Solar Savings Integration",
-            model="Savings Calculator",
-        )
\ No newline at end of file
+    def native_value(self) -> float:
+        """Return the cost in dollars of the energy imported in this band."""
+        return self._engine.band_cost(self._band_key) / 100.0
@@ -0,0 +1,611 @@
+"""Services for the Solar Savings integration."""
+
+from __future__ import annotations
+
+import os
+from datetime import datetime, timedelta
+from functools import partial
+from typing import TYPE_CHECKING, Any, Final
+
+import voluptuous as vol
+from homeassistant.components.recorder import get_instance
+from homeassistant.config_entries import ConfigEntry, ConfigEntryState
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .backfill import run_backfill
+from .compare import annual_scale, candidate_values, evaluate_plans, load_usage
+from .const import DOMAIN
+from .interval_data import IntervalDataError, run_import
+from .statistics import (
+    INTERVAL_STATISTICS,
+    SAVINGS_STATISTICS,
+    async_publish,
+    last_sums,
+)
+from .tariff import (
+    TARIFF_KEYS,
+    SolarSavingsTariff,
+    TariffTimeline,
+    apply_due_changes,
+    async_compile_tariff,
+    record_changes,
+    site_today,
+    validate_bands,
+)
+from .timetable import validate_windows
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+ATTR_CONFIG_ENTRY: Final = "config_entry"
+ATTR_SCHEDULED_DATE: Final = "scheduled_date"
+ATTR_PEAK_SCHEDULE: Final = "peak_schedule"
+ATTR_START_TIME: Final = "start_time"
+ATTR_END_TIME: Final = "end_time"
+ATTR_TARIFFS: Final = "tariffs"
+ATTR_INCLUDE_CURRENT: Final = "include_current"
+ATTR_FILE_PATH: Final = "file_path"
+
+SERVICE_STAGE_TARIFF: Final = "stage_tariff"
+SERVICE_APPLY_NOW: Final = "apply_now"
+SERVICE_BACKFILL: Final = "backfill"
+SERVICE_COMPARE_TARIFFS: Final = "compare_tariffs"
+SERVICE_IMPORT_INTERVAL_DATA: Final = "import_interval_data"
+SERVICE_PROJECT_SAVINGS: Final = "project_savings"
+SERVICE_PLAN_BATTERY: Final = "plan_battery"
+
+# How far back a backfill reaches when no start time is given
+DEFAULT_BACKFILL_PERIOD = timedelta(days=365)
+
+# Most candidate tariffs in one comparison
+MAX_COMPARED_TARIFFS = 100
+
+CURRENT_PLAN_NAME = "Current"
+
+# Meter option -> the key of its hourly series in a backfill
+BACKFILL_METERS: Final = {
+    "grid_import_sensor": "import",
+    "grid_export_sensor": "export",
+    "solar_production_sensor": "solar",
+}
+
+
+def _windows(value: Any) -> dict[str, list[Any]]:
+    """Validate an inline weekly peak definition."""
+    try:
+        return validate_windows(value)
+    except (KeyError, TypeError, ValueError) as err:
+        msg = f"Invalid peak windows: {err}"
+        raise vol.Invalid(msg) from err
+
+
+def _bands(value: Any) -> list[dict[str, Any]]:
+    """Validate a list of named rate bands."""
+    try:
+        return validate_bands(value)
+    except (KeyError, TypeError, ValueError) as err:
+        msg = f"Invalid bands: {err}"
+        raise vol.Invalid(msg) from err
+
+
+# Same bounds as the future rate number entities
+RATE = vol.All(vol.Coerce(float), vol.Range(min=0.0, max=1000.0))
+
+TARIFF_FIELDS: Final = {
+    vol.Optional("on_peak_rate"): RATE,
+    vol.Optional("off_peak_rate"): RATE,
+    vol.Optional("export_rate"): RATE,
+    vol.Optional(ATTR_PEAK_SCHEDULE): cv.entity_domain("schedule"),
+    vol.Optional("peak_windows"): vol.All(dict, _windows),
+    vol.Optional("bands"): vol.All(list, _bands),
+}
+
+STAGE_TARIFF_SCHEMA: Final = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY): cv.string,
+        vol.Required(ATTR_SCHEDULED_DATE): cv.date,
+        **TARIFF_FIELDS,
+    }
+)
+
+APPLY_NOW_SCHEMA: Final = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY): cv.string,
+        **TARIFF_FIELDS,
+    }
+)
+
+
+BACKFILL_SCHEMA: Final = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY): cv.string,
+        vol.Optional(ATTR_START_TIME): cv.datetime,
+        vol.Optional(ATTR_END_TIME): cv.datetime,
+    }
+)
+
+
+COMPARE_TARIFFS_SCHEMA: Final = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY): cv.string,
+        vol.Required(ATTR_TARIFFS): vol.All(
+            cv.ensure_list,
+            [vol.Schema({vol.Optional("name"): cv.string, **TARIFF_FIELDS})],
+            vol.Length(min=1, max=MAX_COMPARED_TARIFFS),
+        ),
+        vol.Optional(ATTR_INCLUDE_CURRENT, default=True): cv.boolean,
+        vol.Optional(ATTR_START_TIME): cv.datetime,
+        vol.Optional(ATTR_END_TIME): cv.datetime,
+    }
+)
+
+
+IMPORT_INTERVAL_DATA_SCHEMA: Final = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY): cv.string,
+        vol.Required(ATTR_FILE_PATH): cv.string,
+    }
+)
+
+
+PROJECT_SAVINGS_SCHEMA: Final = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY): cv.string,
+    }
+)
+
+
+PLAN_BATTERY_SCHEMA: Final = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY): cv.string,
+    }
+)
+
+
+def _get_entry(hass: HomeAssistant, call: ServiceCall) -> ConfigEntry:
+    """Return the loaded config entry targeted by the call."""
+    entry_id: str = call.data[ATTR_CONFIG_ENTRY]
+    entry = hass.config_entries.async_get_entry(entry_id)
+
+    if not entry or entry.domain != DOMAIN:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="invalid_config_entry",
+            translation_placeholders={"config_entry": entry_id},
+        )
+    if entry.state != ConfigEntryState.LOADED:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="unloaded_config_entry",
+            translation_placeholders={"config_entry": entry.title},
+        )
+    return entry
+
+
+def _require_fields(call: ServiceCall) -> None:
+    """Reject calls that would not change any part of the tariff."""
+    if not any(key in call.data for key in TARIFF_KEYS):
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="no_tariff_fields",
+        )
+
+
+def _serialize_tariff(entry: ConfigEntry, *, changed: bool) -> ServiceResponse:
+    """Return the tariff in force and the versions still to come."""
+    values: Mapping[str, Any] = {**entry.data, **entry.options}
+    timeline = TariffTimeline.from_options(values)
+    today = site_today(values)
+    current = timeline.at(today)
+
+    return {
+        "config_entry": entry.entry_id,
+        "changed": changed,
+        "tariff": current.as_dict() if current else None,
+        "upcoming": [version.as_dict() for version in timeline.upcoming(today)],
+    }
+
+
+def _commit(
+    hass: HomeAssistant, entry: ConfigEntry, new_options: dict[str, Any]
+) -> ServiceResponse:
+    """
+    Write the options in a single update and describe the result.
+
+    async_update_entry is a no-op when nothing changed, which makes
+    repeating the same call free.
+    """
+    # A version dated today (or earlier) takes effect in the same write
+    due = apply_due_changes(new_options, site_today(new_options))
+    if due is not None:
+        new_options = due
+
+    changed = hass.config_entries.async_update_entry(entry, options=new_options)
+    return _serialize_tariff(entry, changed=changed)
+
+
+def _meters(tariff: SolarSavingsTariff) -> dict[str, str]:
+    """Return the configured meters by series key, rejecting entries without any."""
+    meters = {
+        series: entity_id
+        for key, series in BACKFILL_METERS.items()
+        if (entity_id := tariff.get(key))
+    }
+    if not meters:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="no_energy_meters",
+        )
+    return meters
+
+
+def _require_time_of_use(tariff: SolarSavingsTariff) -> None:
+    """Reject entries whose past prices came from a price sensor."""
+    if tariff.is_dynamic:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="dynamic_tariff",
+        )
+
+
+def _period(call: ServiceCall) -> tuple[datetime, datetime]:
+    """Return the whole hours of history a call asks for, in UTC."""
+    # Only whole hours that the recorder has finished compiling
+    end = dt_util.as_utc(call.data.get(ATTR_END_TIME) or dt_util.utcnow()).replace(
+        minute=0, second=0, microsecond=0
+    )
+    start = dt_util.as_utc(
+        call.data.get(ATTR_START_TIME) or end - DEFAULT_BACKFILL_PERIOD
+    )
+    if start >= end:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="invalid_backfill_period",
+        )
+    return start, end
+
+
+def _totals(changes: Mapping[str, list[float]]) -> dict[str, float]:
+    """Return the total of each computed series, money in the currency."""
+    return {
+        statistic.key: round(
+            sum(changes[statistic.key]) / (100.0 if statistic.monetary else 1.0), 4
+        )
+        for statistic in SAVINGS_STATISTICS
+    }
+
+
+def _changes(call: ServiceCall) -> dict[str, Any]:
+    """Return the tariff fields given in the call."""
+    return {key: call.data[key] for key in TARIFF_KEYS if key in call.data}
+
+
+async def _async_stage_tariff(
+    hass: HomeAssistant, call: ServiceCall
+) -> ServiceResponse:
+    """Add a dated tariff version to the timeline in one write."""
+    entry = _get_entry(hass, call)
+    _require_fields(call)
+
+    # Fields left out carry over from the version in force on that date
+    new_options = record_changes(
+        {**entry.data, **entry.options},
+        call.data[ATTR_SCHEDULED_DATE],
+        _changes(call),
+    )
+    return _commit(hass, entry, new_options)
+
+
+async def _async_apply_now(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """Start a new tariff version today in one write."""
+    entry = _get_entry(hass, call)
+    _require_fields(call)
+
+    new_options = record_changes(
+        {**entry.data, **entry.options},
+        site_today({**entry.data, **entry.options}),
+        _changes(call),
+    )
+    return _commit(hass, entry, new_options)
+
+
+async def _async_backfill(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """Compute savings over recorded history and publish them as statistics."""
+    entry = _get_entry(hass, call)
+    tariff = entry.runtime_data.tariff
+    _require_time_of_use(tariff)
+
+    meters = _meters(tariff)
+    start, end = _period(call)
+
+    result = await get_instance(hass).async_add_executor_job(
+        run_backfill,
+        hass,
+        entry.entry_id,
+        start,
+        end,
+        meters,
+        tariff.compiled_versions(),
+        tariff.holidays,
+        tariff.time_zone,
+    )
+
+    # Live hourly statistics published after the period are carried
+    # onto the new sums; read them before any row is replaced
+    engine = entry.runtime_data.engine
+    live = engine.statistics if engine else None
+    later = await live.async_published_since(end) if live else {}
+
+    sums = {
+        statistic.key: async_publish(
+            hass,
+            entry.entry_id,
+            statistic,
+            result.starts,
+            result.changes[statistic.key],
+            result.base_sums.get(statistic.key, 0.0),
+        )
+        for statistic in SAVINGS_STATISTICS
+    }
+
+    if live:
+        live.async_continue_after(sums, later)
+
+    return {
+        "config_entry": entry.entry_id,
+        "hours": len(result.starts),
+        "totals": _totals(result.changes),
+    }
+
+
+async def _async_compare_tariffs(
+    hass: HomeAssistant, call: ServiceCall
+) -> ServiceResponse:
+    """Rank what candidate tariffs would have cost over recorded history."""
+    entry = _get_entry(hass, call)
+    tariff: SolarSavingsTariff = entry.runtime_data.tariff
+
+    if call.data[ATTR_INCLUDE_CURRENT]:
+        _require_time_of_use(tariff)
+
+    meters = _meters(tariff)
+    start, end = _period(call)
+
+    # The usage is fetched and prepared once for all plans
+    usage = await get_instance(hass).async_add_executor_job(
+        load_usage, hass, start, end, meters, tariff.time_zone
+    )
+
+    plans = []
+    if call.data[ATTR_INCLUDE_CURRENT]:
+        plans.append((CURRENT_PLAN_NAME, tariff.compiled_today()))
+
+    # Fields left out carry over from the tariff in force today
+    current = tariff.timeline.at(tariff.today())
+    base = {
+        key: current.get(key) if current else tariff.get(key) for key in TARIFF_KEYS
+    }
+    for index, candidate in enumerate(call.data[ATTR_TARIFFS], start=1):
+        values = candidate_values(base, candidate)
+        plans.append(
+            (
+                candidate.get("name") or f"Plan {index}",
+                await async_compile_tariff(hass, values),
+            )
+        )
+
+    # One job: the plans share the usage arrays, and numpy does the work
+    costs = await hass.async_add_executor_job(
+        evaluate_plans, usage, plans, tariff.holidays
+    )
+
+    # Per year, in the currency rather than cents
+    scale = annual_scale(usage) / 100.0
+    reference = costs[0].net_cost if call.data[ATTR_INCLUDE_CURRENT] else None
+
+    ranked = []
+    for rank, cost in enumerate(sorted(costs, key=lambda cost: cost.net_cost), start=1):
+        plan = {
+            "rank": rank,
+            "name": cost.name,
+            "annual_cost": round(cost.net_cost * scale, 2),
+            "annual_import_cost": round(cost.import_cost * scale, 2),
+            "annual_export_credit": round(cost.export_credit * scale, 2),
+            "annual_avoided_cost": round(cost.avoided_cost * scale, 2),
+        }
+        if reference is not None:
+            plan["annual_difference"] = round((cost.net_cost - reference) * scale, 2)
+        ranked.append(plan)
+
+    return {
+        "config_entry": entry.entry_id,
+        "hours": usage.hours,
+        "plans": ranked,
+    }
+
+
+async def _async_import_interval_data(
+    hass: HomeAssistant, call: ServiceCall
+) -> ServiceResponse:
+    """Compute savings from a utility interval file and publish statistics."""
+    entry = _get_entry(hass, call)
+    tariff: SolarSavingsTariff = entry.runtime_data.tariff
+    _require_time_of_use(tariff)
+
+    path: str = call.data[ATTR_FILE_PATH]
+    if not hass.config.is_allowed_path(path):
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="path_not_allowed",
+            translation_placeholders={"file_path": path},
+        )
+    if not await hass.async_add_executor_job(os.path.isfile, path):
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="file_not_found",
+            translation_placeholders={"file_path": path},
+        )
+
+    # The file is streamed in the executor; only hourly sums are kept
+    try:
+        result = await hass.async_add_executor_job(
+            run_import,
+            path,
+            tariff.compiled_versions(),
+            tariff.holidays,
+            tariff.time_zone,
+        )
+    except IntervalDataError as err:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="invalid_interval_data",
+            translation_placeholders={"line": str(err.line), "reason": err.reason},
+        ) from err
+    except (OSError, UnicodeDecodeError) as err:
+        raise HomeAssistantError(
+            translation_domain=DOMAIN,
+            translation_key="unreadable_file",
+            translation_placeholders={"file_path": path, "error": str(err)},
+        ) from err
+
+    # Published under their own ids, apart from the live series
+    if result.starts:
+        base_sums = await get_instance(hass).async_add_executor_job(
+            last_sums, hass, entry.entry_id, result.starts[0], INTERVAL_STATISTICS
+        )
+        for statistic, interval_statistic in zip(
+            SAVINGS_STATISTICS, INTERVAL_STATISTICS, strict=True
+        ):
+            async_publish(
+                hass,
+                entry.entry_id,
+                interval_statistic,
+                result.starts,
+                result.changes[statistic.key],
+                base_sums.get(interval_statistic.key, 0.0),
+            )
+
+    return {
+        "config_entry": entry.entry_id,
+        "intervals": result.intervals,
+        "hours": len(result.starts),
+        "totals": _totals(result.changes),
+    }
+
+
+async def _async_project_savings(
+    hass: HomeAssistant, call: ServiceCall
+) -> ServiceResponse:
+    """Return today's projection from the current hour on."""
+    entry = _get_entry(hass, call)
+    if (projector := entry.runtime_data.projector) is None:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="no_solar_forecast",
+        )
+
+    # Memoised: the projection only changes with its inputs. None until
+    # the load profile is learned and while the forecast has no items.
+    if (projection := projector.projection) is None:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="projection_not_ready",
+        )
+    now = dt_util.utcnow()
+    return {
+        "config_entry": entry.entry_id,
+        "day": projection.day.isoformat(),
+        "import_cost": round(projector.remaining_cost / 100.0, 4),
+        "savings": round(projector.remaining_savings / 100.0, 4),
+        "hours": projection.as_hours(now),
+    }
+
+
+async def _async_plan_battery(
+    hass: HomeAssistant, call: ServiceCall
+) -> ServiceResponse:
+    """Plan the battery again and return the plan."""
+    entry = _get_entry(hass, call)
+    if (planner := entry.runtime_data.planner) is None:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="no_battery",
+        )
+    if not planner.ready:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="no_price",
+        )
+
+    # Warm started from the previous plan
+    plan = await planner.async_plan()
+    return {
+        "config_entry": entry.entry_id,
+        "cost": round(plan.cost / 100.0, 4),
+        "baseline_cost": round(plan.baseline_cost / 100.0, 4),
+        "complete": plan.complete,
+        "hours": plan.as_hours(),
+    }
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the Solar Savings services."""
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_STAGE_TARIFF,
+        partial(_async_stage_tariff, hass),
+        schema=STAGE_TARIFF_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_APPLY_NOW,
+        partial(_async_apply_now, hass),
+        schema=APPLY_NOW_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_BACKFILL,
+        partial(_async_backfill, hass),
+        schema=BACKFILL_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_COMPARE_TARIFFS,
+        partial(_async_compare_tariffs, hass),
+        schema=COMPARE_TARIFFS_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_IMPORT_INTERVAL_DATA,
+        partial(_async_import_interval_data, hass),
+        schema=IMPORT_INTERVAL_DATA_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROJECT_SAVINGS,
+        partial(_async_project_savings, hass),
+        schema=PROJECT_SAVINGS_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PLAN_BATTERY,
+        partial(_async_plan_battery, hass),
+        schema=PLAN_BATTERY_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
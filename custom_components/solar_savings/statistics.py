@@ -0,0 +1,291 @@
+"""Long-term statistics written by Solar Savings."""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics,
+    get_last_statistics,
+    statistics_during_period,
+)
+from homeassistant.const import UnitOfEnergy
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Mapping, Sequence
+
+_LOGGER = logging.getLogger(__name__)
+
+# Rows handed to the recorder per queued task
+CHUNK_SIZE = 1000
+
+HOUR = timedelta(hours=1)
+
+
+@dataclass(frozen=True, slots=True)
+class SavingsStatistic:
+    """A savings series published as an external statistic."""
+
+    key: str
+    name: str
+    # Money series are accumulated in cents and published in dollars
+    monetary: bool
+
+
+SAVINGS_STATISTICS: tuple[SavingsStatistic, ...] = (
+    SavingsStatistic("import_cost", "Import Cost", monetary=True),
+    SavingsStatistic("export_credit", "Export Credit", monetary=True),
+    SavingsStatistic("avoided_cost", "Avoided Import Cost", monetary=True),
+    SavingsStatistic("net_savings", "Net Savings", monetary=True),
+    SavingsStatistic("self_consumed_energy", "Self Consumed Energy", monetary=False),
+)
+
+# The same series computed from imported interval files, kept apart so
+# they never overlap the sums of the live and backfilled series
+INTERVAL_STATISTICS: tuple[SavingsStatistic, ...] = tuple(
+    replace(
+        statistic, key=f"interval_{statistic.key}", name=f"Interval {statistic.name}"
+    )
+    for statistic in SAVINGS_STATISTICS
+)
+
+
+def statistic_id(entry_id: str, key: str) -> str:
+    """Return the external statistic id of an entry's series."""
+    return f"{DOMAIN}:{entry_id.lower()}_{key}"
+
+
+def statistic_metadata(
+    hass: HomeAssistant, entry_id: str, statistic: SavingsStatistic
+) -> StatisticMetaData:
+    """Return the metadata of an entry's series."""
+    return StatisticMetaData(
+        has_mean=False,
+        has_sum=True,
+        name=f"Solar Savings {statistic.name}",
+        source=DOMAIN,
+        statistic_id=statistic_id(entry_id, statistic.key),
+        unit_of_measurement=(
+            hass.config.currency if statistic.monetary else UnitOfEnergy.KILO_WATT_HOUR
+        ),
+    )
+
+
+def last_sums(
+    hass: HomeAssistant,
+    entry_id: str,
+    before: datetime,
+    statistics: Iterable[SavingsStatistic] = SAVINGS_STATISTICS,
+) -> dict[str, float]:
+    """
+    Return the sum of each series in the hour before a time.
+
+    Runs in the recorder executor.
+    """
+    ids = {
+        statistic_id(entry_id, statistic.key): statistic.key for statistic in statistics
+    }
+    rows = statistics_during_period(
+        hass, before - HOUR, before, set(ids), "hour", None, {"sum"}
+    )
+    return {
+        ids[stat_id]: series[-1]["sum"] or 0.0
+        for stat_id, series in rows.items()
+        if series
+    }
+
+
+def published_changes(
+    hass: HomeAssistant, entry_id: str, start: datetime, end: datetime
+) -> dict[str, tuple[list[datetime], list[float]]]:
+    """
+    Return the hourly changes of each series published in a period.
+
+    Changes are in the units async_publish takes, money in cents. Runs in
+    the recorder executor.
+    """
+    ids = {
+        statistic_id(entry_id, statistic.key): statistic
+        for statistic in SAVINGS_STATISTICS
+    }
+    rows = statistics_during_period(
+        hass, start - HOUR, end, set(ids), "hour", None, {"sum"}
+    )
+    start_timestamp = start.timestamp()
+    changes = {}
+    for stat_id, series in rows.items():
+        statistic = ids[stat_id]
+        scale = 100.0 if statistic.monetary else 1.0
+        starts: list[datetime] = []
+        values: list[float] = []
+        previous = 0.0
+        for row in series:
+            total = row["sum"] or 0.0
+            if row["start"] >= start_timestamp:
+                starts.append(dt_util.utc_from_timestamp(row["start"]))
+                values.append((total - previous) * scale)
+            previous = total
+        changes[statistic.key] = (starts, values)
+    return changes
+
+
+@callback
+def async_publish(  # noqa: PLR0913 - one series of one entry
+    hass: HomeAssistant,
+    entry_id: str,
+    statistic: SavingsStatistic,
+    starts: Sequence[datetime],
+    changes: Iterable[float],
+    base_sum: float = 0.0,
+) -> float:
+    """
+    Queue hourly changes of a series as external statistics.
+
+    Money changes are given in cents. The rows are queued in chunks so a
+    long backfill does not hand the recorder one huge task. Returns the
+    sum after the last row.
+    """
+    scale = 100.0 if statistic.monetary else 1.0
+    metadata = statistic_metadata(hass, entry_id, statistic)
+
+    rows: list[StatisticData] = []
+    total = base_sum
+    for start, change in zip(starts, changes, strict=True):
+        total += change / scale
+        rows.append(StatisticData(start=start, state=total, sum=total))
+        if len(rows) == CHUNK_SIZE:
+            async_add_external_statistics(hass, metadata, rows)
+            rows = []
+
+    if rows:
+        async_add_external_statistics(hass, metadata, rows)
+    return total
+
+
+def series_values(totals: Mapping[str, float]) -> dict[str, float]:
+    """Return the value of each published series from the engine totals."""
+    return {
+        "import_cost": totals["import_cost"],
+        "export_credit": totals["export_credit"],
+        "avoided_cost": totals["avoided_cost"],
+        "net_savings": totals["avoided_cost"] + totals["export_credit"],
+        "self_consumed_energy": totals["self_consumed_energy"],
+    }
+
+
+def latest_sums(hass: HomeAssistant, entry_id: str) -> dict[str, float]:
+    """
+    Return the last published sum of each series.
+
+    Runs in the recorder executor.
+    """
+    sums = {}
+    for statistic in SAVINGS_STATISTICS:
+        stat_id = statistic_id(entry_id, statistic.key)
+        rows = get_last_statistics(hass, 1, stat_id, convert_units=False, types={"sum"})
+        if series := rows.get(stat_id):
+            sums[statistic.key] = series[0]["sum"] or 0.0
+    return sums
+
+
+class HourlyStatistics:
+    """
+    Publish the engine totals as one statistics row per hour.
+
+    Nothing is done per meter update: the totals are remembered when an
+    hour opens and the difference is published when it closes. The open
+    hour is part of the engine snapshot, so the hour Home Assistant was
+    stopped in is still published after a restart.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the publisher."""
+        self.hass = hass
+        self.entry_id = entry_id
+        self._sums: dict[str, float] = {}
+        # Start of the open hour (UTC) and the series values at that time
+        self._hour: datetime | None = None
+        self._opening: dict[str, float] = {}
+
+    async def async_load(self, stored: Mapping[str, Any] | None) -> None:
+        """Continue from the last published sums and the stored open hour."""
+        self._sums = await get_instance(self.hass).async_add_executor_job(
+            latest_sums, self.hass, self.entry_id
+        )
+        if stored:
+            self._hour = dt_util.parse_datetime(stored["hour"])
+            self._opening = dict(stored["opening"])
+
+    def as_dict(self) -> dict[str, Any] | None:
+        """Return the open hour for the engine snapshot."""
+        if self._hour is None:
+            return None
+        return {"hour": self._hour.isoformat(), "opening": self._opening}
+
+    async def async_published_since(
+        self, start: datetime
+    ) -> dict[str, tuple[list[datetime], list[float]]]:
+        """Return the hourly changes published from a time on."""
+        until = self._hour or dt_util.utcnow().replace(
+            minute=0, second=0, microsecond=0
+        )
+        if start >= until:
+            return {}
+        return await get_instance(self.hass).async_add_executor_job(
+            published_changes, self.hass, self.entry_id, start, until
+        )
+
+    @callback
+    def async_continue_after(
+        self,
+        sums: Mapping[str, float],
+        later: Mapping[str, tuple[list[datetime], list[float]]],
+    ) -> None:
+        """
+        Continue from the sums a backfill ended with.
+
+        The rows already published after the backfill, read beforehand
+        with async_published_since, are published again on top of its sums
+        with their own hourly changes, so the series does not step where
+        the backfill ends.
+        """
+        for statistic in SAVINGS_STATISTICS:
+            total = sums.get(statistic.key, 0.0)
+            if statistic.key in later:
+                starts, changes = later[statistic.key]
+                total = async_publish(
+                    self.hass, self.entry_id, statistic, starts, changes, total
+                )
+            self._sums[statistic.key] = total
+
+    @callback
+    def async_roll(self, now: datetime, totals: Mapping[str, float]) -> None:
+        """Close the open hour, if it has ended, and open the current one."""
+        hour = dt_util.as_utc(now).replace(minute=0, second=0, microsecond=0)
+        values = series_values(totals)
+
+        if self._hour is not None and self._hour < hour:
+            for statistic in SAVINGS_STATISTICS:
+                change = values[statistic.key] - self._opening.get(statistic.key, 0.0)
+                self._sums[statistic.key] = async_publish(
+                    self.hass,
+                    self.entry_id,
+                    statistic,
+                    [self._hour],
+                    [change],
+                    self._sums.get(statistic.key, 0.0),
+                )
+            _LOGGER.debug("Published savings statistics for %s", self._hour)
+
+        if self._hour is None or self._hour < hour:
+            self._hour = hour
+            self._opening = values
@@ -0,0 +1,745 @@
+"""Shared tariff state for Solar Savings."""
+
+from __future__ import annotations
+
+import json
+import logging
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, tzinfo
+from typing import TYPE_CHECKING, Any
+
+import voluptuous as vol
+from homeassistant.const import STATE_OFF, STATE_ON
+from homeassistant.core import (
+    CALLBACK_TYPE,
+    Event,
+    EventStateChangedData,
+    HomeAssistant,
+    callback,
+)
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.util import dt as dt_util
+from homeassistant.util import slugify
+
+from .const import (
+    DEFAULT_DEMAND_WINDOW,
+    DEFAULT_MIN_CHANGE_THRESHOLD,
+    DEFAULT_MIN_WRITE_INTERVAL,
+    DEFAULT_PRICE_WINDOW,
+    SIGNAL_TARIFF_UPDATED,
+)
+from .holidays import HolidayCalendar, async_load_holidays
+from .timetable import (
+    WeekTable,
+    compile_week_table,
+    validate_rules,
+    windows_to_rules,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Mapping
+
+    from homeassistant.config_entries import ConfigEntry
+
+_LOGGER = logging.getLogger(__name__)
+
+
+# Current rate option -> the option holding its staged replacement
+FUTURE_RATE_KEYS = {
+    "on_peak_rate": "future_on_peak_rate",
+    "off_peak_rate": "future_off_peak_rate",
+    "export_rate": "future_export_rate",
+}
+
+# Options that make up one version of the tariff
+TARIFF_KEYS = (*FUTURE_RATE_KEYS, "peak_schedule", "peak_windows", "bands")
+
+# Bands used when the entry only has on and off peak rates
+OFF_PEAK_KEY = "off_peak"
+ON_PEAK_KEY = "on_peak"
+
+# Tariff types: fixed rates by time of use, or a live price feed
+TARIFF_TIME_OF_USE = "time_of_use"
+TARIFF_DYNAMIC = "dynamic"
+
+# The single band of a dynamic tariff
+SPOT_KEY = "spot"
+
+# Energy meters followed by the savings engine
+METER_KEYS = ("grid_import_sensor", "grid_export_sensor", "solar_production_sensor")
+
+# Power sensors that self-consumption is integrated from
+POWER_KEYS = ("solar_power_sensor", "load_power_sensor", "grid_power_sensor")
+
+# Band indexes are stored in a bytearray
+MAX_BANDS = 255
+
+# Option holding the serialized timeline
+CONF_TIMELINE = "tariff_timeline"
+
+
+@dataclass(frozen=True, slots=True)
+class RateBand:
+    """A named time-of-use band and its import rate in cents."""
+
+    key: str
+    name: str
+    rate: float
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledTariff:
+    """A tariff's bands and week table, ready for constant time lookups."""
+
+    bands: tuple[RateBand, ...]
+    table: WeekTable | None
+    export_rate: float = 0.0
+
+    def band_at(self, local: datetime, *, holiday: bool = False) -> RateBand:
+        """Return the band in force at a local time."""
+        if self.table is None:
+            return self.bands[0]
+        return self.bands[self.table.band_at(local, holiday=holiday)]
+
+
+@dataclass(frozen=True, slots=True)
+class TariffVersion:
+    """The tariff in force from a given date until the next version."""
+
+    effective: date
+    values: dict[str, Any] = field(default_factory=dict)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return a tariff value."""
+        return self.values.get(key, default)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the version as stored in the entry options."""
+        return {"effective": self.effective.isoformat(), **self.values}
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> TariffVersion:
+        """Create a version from its stored form."""
+        return cls(
+            effective=date.fromisoformat(data["effective"]),
+            values={key: data.get(key) for key in TARIFF_KEYS},
+        )
+
+
+class TariffTimeline:
+    """
+    Dated tariff versions, kept sorted by effective date.
+
+    Versions are never removed when they take effect, so the timeline can
+    answer which tariff was in force on any past or future day with a
+    binary search.
+    """
+
+    def __init__(self, versions: Iterable[TariffVersion]) -> None:
+        """Initialize the timeline."""
+        self._versions = sorted(versions, key=lambda version: version.effective)
+        self._dates = [version.effective for version in self._versions]
+
+    @classmethod
+    def from_options(cls, values: Mapping[str, Any]) -> TariffTimeline:
+        """Load the timeline, seeding it from the flat rates if missing."""
+        if stored := values.get(CONF_TIMELINE):
+            return cls(TariffVersion.from_dict(version) for version in stored)
+
+        # Entries created before the timeline existed: the current rates
+        # are treated as having always been in force.
+        return cls(
+            [TariffVersion(date.min, {key: values.get(key) for key in TARIFF_KEYS})]
+        )
+
+    def __len__(self) -> int:
+        """Return the number of versions."""
+        return len(self._versions)
+
+    def __iter__(self) -> Iterator[TariffVersion]:
+        """Iterate over the versions in date order."""
+        return iter(self._versions)
+
+    def at(self, day: date) -> TariffVersion | None:
+        """Return the version in force on a day."""
+        index = bisect_right(self._dates, day) - 1
+        if index < 0:
+            return None
+        return self._versions[index]
+
+    def upcoming(self, day: date) -> list[TariffVersion]:
+        """Return the versions that take effect after a day."""
+        return self._versions[bisect_right(self._dates, day) :]
+
+    def with_changes(
+        self, effective: date, changes: Mapping[str, Any]
+    ) -> TariffTimeline:
+        """
+        Return a new timeline with changes taking effect on a date.
+
+        Values not in changes carry over from the version in force on that
+        date. A version already starting on that date is replaced.
+        """
+        base = self.at(effective)
+        values = {key: base.get(key) if base else None for key in TARIFF_KEYS}
+        values.update((key, changes[key]) for key in TARIFF_KEYS if key in changes)
+
+        versions = [
+            version for version in self._versions if version.effective != effective
+        ]
+        versions.append(TariffVersion(effective, values))
+        return TariffTimeline(versions)
+
+    def as_options(self) -> list[dict[str, Any]]:
+        """Return the timeline as stored in the entry options."""
+        return [version.as_dict() for version in self._versions]
+
+
+class SolarSavingsTariff:
+    """
+    Live view of a config entry's tariff, shared by every platform.
+
+    Entities read their values from here instead of copying them at setup,
+    so an options change can be applied in place and announced with a
+    dispatcher signal rather than reloading the entry.
+
+    The peak schedule of every tariff version is compiled into a week
+    table, so the rate at any time is a lookup rather than a read of the
+    schedule entity's state.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
+        """Initialize the tariff state."""
+        self.hass = hass
+        self.entry_id = entry.entry_id
+        self.signal = SIGNAL_TARIFF_UPDATED.format(entry.entry_id)
+        self._values: dict[str, Any] = _merge(entry)
+        self.timeline = TariffTimeline.from_options(self._values)
+        self._compiled: dict[date | None, CompiledTariff] = {}
+        self.holidays = HolidayCalendar((), ())
+        self._drift_entity_id: str | None = None
+        self._unsub_drift: CALLBACK_TYPE | None = None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return an option, falling back to the original config data."""
+        return self._values.get(key, default)
+
+    @property
+    def on_peak_rate(self) -> float:
+        """Return the on peak rate in cents."""
+        return self._values.get("on_peak_rate", 0.0)
+
+    @property
+    def off_peak_rate(self) -> float:
+        """Return the off peak rate in cents."""
+        return self._values.get("off_peak_rate", 0.0)
+
+    @property
+    def export_rate(self) -> float:
+        """Return the export rate in cents."""
+        return self._values.get("export_rate", 0.0)
+
+    @property
+    def peak_schedule(self) -> str | None:
+        """Return the schedule entity driving on/off peak, if any."""
+        return _schedule(self._values)
+
+    @property
+    def peak_windows(self) -> Mapping[str, Any] | None:
+        """Return the inline weekly on peak windows, if any."""
+        return self._values.get("peak_windows") or None
+
+    @property
+    def is_dynamic(self) -> bool:
+        """Return True if import prices follow a price sensor."""
+        return _is_dynamic(self._values)
+
+    @property
+    def price_sensor(self) -> str | None:
+        """Return the sensor holding the current price of a dynamic tariff."""
+        return self._values.get("price_sensor") or None
+
+    @property
+    def price_forecast_attribute(self) -> str | None:
+        """Return the price sensor's forecast attribute, if any."""
+        return self._values.get("price_forecast_attribute") or None
+
+    @property
+    def price_window(self) -> int:
+        """Return how many prices the rolling price sensors cover."""
+        return int(self._values.get("price_window") or DEFAULT_PRICE_WINDOW)
+
+    @property
+    def import_blocks(self) -> list[dict[str, Any]]:
+        """Return the import blocks, if imports are priced by block."""
+        return self._values.get("import_blocks") or []
+
+    @property
+    def export_blocks(self) -> list[dict[str, Any]]:
+        """Return the export blocks, if exports are credited by block."""
+        return self._values.get("export_blocks") or []
+
+    @property
+    def block_period(self) -> str:
+        """Return the period block usage is counted over: day or billing."""
+        return self._values.get("block_period") or "day"
+
+    @property
+    def demand_window(self) -> int:
+        """Return the minutes averaged for demand."""
+        return int(self._values.get("demand_window") or DEFAULT_DEMAND_WINDOW)
+
+    @property
+    def demand_charge(self) -> float:
+        """Return the demand charge per kW of peak demand per billing period."""
+        return self._values.get("demand_charge") or 0.0
+
+    @property
+    def demand_bands(self) -> list[str]:
+        """Return the band keys in which demand counts; empty for all times."""
+        return [slugify(band) for band in self._values.get("demand_bands") or []]
+
+    @property
+    def demand_billing_day(self) -> int:
+        """Return the day of the month on which billing periods start."""
+        return int(self._values.get("demand_billing_day") or 1)
+
+    @property
+    def has_power_sensors(self) -> bool:
+        """Return True if solar power and either load or grid power are followed."""
+        return bool(
+            self._values.get("solar_power_sensor")
+            and (
+                self._values.get("load_power_sensor")
+                or self._values.get("grid_power_sensor")
+            )
+        )
+
+    @property
+    def has_time_of_use(self) -> bool:
+        """Return True if bands or on and off peak times are defined."""
+        return _table_key(self._values) is not None
+
+    @property
+    def min_write_interval(self) -> float:
+        """Return the shortest time in seconds between throttled writes."""
+        if (interval := self._values.get("min_write_interval")) is None:
+            return DEFAULT_MIN_WRITE_INTERVAL
+        return interval
+
+    @property
+    def min_change_threshold(self) -> float:
+        """Return the smallest change worth a throttled write."""
+        if (threshold := self._values.get("min_change_threshold")) is None:
+            return DEFAULT_MIN_CHANGE_THRESHOLD
+        return threshold
+
+    @property
+    def tax_rate(self) -> float:
+        """Return the tax rate in percent used for the tax presentations."""
+        return self._values.get("tax_rate") or 0.0
+
+    @property
+    def rates_include_tax(self) -> bool:
+        """Return True if the configured rates already include tax."""
+        return self._values.get("rates_include_tax", True)
+
+    @property
+    def bands(self) -> tuple[RateBand, ...]:
+        """Return the bands of the current options."""
+        return _rate_bands(self._values)
+
+    def band_rate(self, key: str) -> float:
+        """Return the current rate in cents of a band."""
+        for band in self.bands:
+            if band.key == key:
+                return band.rate
+        return 0.0
+
+    def needs_reload(self, entry: ConfigEntry) -> bool:
+        """Return True if the new options change which entities exist."""
+        return _structure(self._values) != _structure(_merge(entry))
+
+    async def async_start(self) -> CALLBACK_TYPE:
+        """Compile the week tables; returns a callback to stop tracking."""
+        await self._async_compile()
+        return self._async_stop
+
+    async def async_update(self, entry: ConfigEntry) -> None:
+        """Apply the entry's current options and notify the entities."""
+        self._values = _merge(entry)
+        self.timeline = TariffTimeline.from_options(self._values)
+        await self._async_compile()
+        async_dispatcher_send(self.hass, self.signal)
+
+    @property
+    def time_zone(self) -> tzinfo:
+        """Return the site's time zone, which the tariff's times are in."""
+        return site_time_zone(self._values)
+
+    def today(self) -> date:
+        """Return the current date at the site."""
+        return dt_util.now(self.time_zone).date()
+
+    def resolve(self, when: datetime) -> RateBand:
+        """Return the band, and so the rate, in force at a time."""
+        local = when.astimezone(self.time_zone)
+        day = local.date()
+        return self._compiled_on(day).band_at(
+            local, holiday=self.holidays.is_holiday(day)
+        )
+
+    def export_rate_at(self, when: datetime) -> float:
+        """Return the export rate in cents in force at a time."""
+        return self._compiled_on(when.astimezone(self.time_zone).date()).export_rate
+
+    def next_transition(self, when: datetime) -> datetime | None:
+        """Return when the rate may next change after a time."""
+        local = when.astimezone(self.time_zone)
+
+        candidates = []
+        if (table := self._compiled_on(local.date()).table) is not None:
+            # Without holidays the table's own weekly cache answers
+            is_holiday = self.holidays.is_holiday if self.holidays else None
+            if (transition := table.next_transition(local, is_holiday)) is not None:
+                candidates.append(transition)
+
+        # A new tariff version starts at local midnight
+        if upcoming := self.timeline.upcoming(local.date()):
+            candidates.append(start_of_site_day(upcoming[0].effective, local.tzinfo))
+
+        return min(candidates, default=None)
+
+    def compiled_versions(self) -> list[tuple[date, CompiledTariff]]:
+        """Return every compiled tariff version with its effective date."""
+        return [
+            (version.effective, self._compiled[version.effective])
+            for version in self.timeline
+        ]
+
+    def compiled_today(self) -> CompiledTariff:
+        """Return the compiled tariff version in force today."""
+        return self._compiled_on(self.today())
+
+    def _compiled_on(self, day: date) -> CompiledTariff:
+        """Return the compiled tariff version in force on a day."""
+        if self.is_dynamic:
+            # Prices come from the feed, not the dated versions
+            return self._compiled[None]
+        version = self.timeline.at(day)
+        return self._compiled[version.effective if version else None]
+
+    async def _async_compile(self) -> None:
+        """Compile every tariff version, sharing identical week tables."""
+        tables: dict[str, WeekTable | None] = {}
+        compiled: dict[date | None, CompiledTariff] = {}
+
+        versions = [(None, self._values)]
+        versions.extend(
+            (version.effective, version.values) for version in self.timeline
+        )
+
+        for effective, values in versions:
+            key = _table_key(values)
+            if key not in tables:
+                tables[key] = await async_compile_table(self.hass, values)
+            compiled[effective] = CompiledTariff(
+                _rate_bands(values), tables[key], values.get("export_rate") or 0.0
+            )
+
+        self._compiled = compiled
+        self.holidays = await async_load_holidays(self.hass, self._values)
+        self._track_drift(
+            None if self.peak_windows or self.get("bands") else self.peak_schedule
+        )
+
+    def _track_drift(self, entity_id: str | None) -> None:
+        """Watch the schedule entity, only to notice when it is edited."""
+        if entity_id == self._drift_entity_id:
+            return
+
+        self._async_stop()
+        self._drift_entity_id = entity_id
+        if entity_id:
+            self._unsub_drift = async_track_state_change_event(
+                self.hass, [entity_id], self._handle_schedule_state
+            )
+
+    @callback
+    def _async_stop(self) -> None:
+        """Stop watching the schedule entity."""
+        if self._unsub_drift:
+            self._unsub_drift()
+            self._unsub_drift = None
+        self._drift_entity_id = None
+
+    @callback
+    def _handle_schedule_state(self, event: Event[EventStateChangedData]) -> None:
+        """Recompile if the schedule switched when the table did not expect it."""
+        new_state = event.data["new_state"]
+        if new_state is None or new_state.state not in (STATE_ON, STATE_OFF):
+            return
+
+        band = self.resolve(dt_util.utcnow())
+        if (new_state.state == STATE_ON) == (band.key == ON_PEAK_KEY):
+            return
+
+        _LOGGER.debug(
+            "Schedule %s changed, recompiling week table", new_state.entity_id
+        )
+        self.hass.async_create_task(self._async_recompile())
+
+    async def _async_recompile(self) -> None:
+        """Recompile the week tables and notify the entities."""
+        await self._async_compile()
+        async_dispatcher_send(self.hass, self.signal)
+
+
+async def async_compile_table(
+    hass: HomeAssistant, values: Mapping[str, Any]
+) -> WeekTable | None:
+    """Compile the week table for one set of tariff values."""
+    if _is_dynamic(values):
+        return None
+    if bands := values.get("bands"):
+        default_band = next(
+            (index for index, band in enumerate(bands) if not band.get("windows")), 0
+        )
+        return compile_week_table([band.get("windows") for band in bands], default_band)
+
+    # Two bands: off peak by default, on peak inside the windows
+    if windows := values.get("peak_windows"):
+        return compile_week_table([None, windows_to_rules(windows)])
+    if schedule := _schedule(values):
+        blocks = await _async_fetch_schedule(hass, schedule)
+        return compile_week_table([None, windows_to_rules(blocks)])
+    return None
+
+
+async def async_compile_tariff(
+    hass: HomeAssistant, values: Mapping[str, Any]
+) -> CompiledTariff:
+    """Compile one set of tariff values outside of any entry."""
+    return CompiledTariff(
+        _rate_bands(values),
+        await async_compile_table(hass, values),
+        values.get("export_rate") or 0.0,
+    )
+
+
+async def _async_fetch_schedule(
+    hass: HomeAssistant, entity_id: str
+) -> Mapping[str, Any] | None:
+    """Return the weekly blocks of a schedule helper."""
+    try:
+        response = await hass.services.async_call(
+            "schedule",
+            "get_schedule",
+            {"entity_id": entity_id},
+            blocking=True,
+            return_response=True,
+        )
+    except (HomeAssistantError, vol.Invalid) as err:
+        _LOGGER.warning("Unable to read schedule %s: %s", entity_id, err)
+        return None
+    return (response or {}).get(entity_id)
+
+
+def site_time_zone(values: Mapping[str, Any]) -> tzinfo:
+    """Return the site time zone option, or Home Assistant's."""
+    if (name := values.get("time_zone")) and (time_zone := dt_util.get_time_zone(name)):
+        return time_zone
+    return dt_util.get_default_time_zone()
+
+
+def site_today(values: Mapping[str, Any]) -> date:
+    """Return the current date in the site time zone."""
+    return dt_util.now(site_time_zone(values)).date()
+
+
+def start_of_site_day(day: date, time_zone: tzinfo) -> datetime:
+    """Return midnight at the start of a day at the site."""
+    return datetime.combine(day, time(), tzinfo=time_zone)
+
+
+def billing_period_start(local: datetime, billing_day: int) -> datetime:
+    """Return when the billing period containing a local time started."""
+    day = date(local.year, local.month, billing_day)
+    if local.date() < day:
+        month = local.month - 1 or 12
+        day = date(local.year - (local.month == 1), month, billing_day)
+    return start_of_site_day(day, local.tzinfo)
+
+
+def _merge(entry: ConfigEntry) -> dict[str, Any]:
+    """Return the entry data overlaid with its options."""
+    return {**entry.data, **entry.options}
+
+
+def _schedule(values: Mapping[str, Any]) -> str | None:
+    """Return the configured schedule entity, treating "None" as unset."""
+    schedule = values.get("peak_schedule")
+    if not schedule or schedule == "None":
+        return None
+    return schedule
+
+
+def _is_dynamic(values: Mapping[str, Any]) -> bool:
+    """Return True for a dynamic tariff with a price sensor."""
+    return values.get("tariff_type") == TARIFF_DYNAMIC and bool(
+        values.get("price_sensor")
+    )
+
+
+def _table_key(values: Mapping[str, Any]) -> str | None:
+    """Return a key identifying the time-of-use windows of a set of values."""
+    if _is_dynamic(values):
+        return None
+    if bands := values.get("bands"):
+        windows = [band.get("windows") for band in bands]
+        return json.dumps(windows, sort_keys=True, default=str)
+    if windows := values.get("peak_windows"):
+        return json.dumps(windows, sort_keys=True, default=str)
+    return _schedule(values)
+
+
+def _rate_bands(values: Mapping[str, Any]) -> tuple[RateBand, ...]:
+    """Return the bands for a set of values, in week table order."""
+    if _is_dynamic(values):
+        # Priced by the feed; the rate here is only the fallback
+        return (RateBand(SPOT_KEY, "Spot Price", values.get("off_peak_rate") or 0.0),)
+    if bands := values.get("bands"):
+        return tuple(
+            RateBand(slugify(band["name"]), band["name"], band.get("rate") or 0.0)
+            for band in bands
+        )
+    return (
+        RateBand(OFF_PEAK_KEY, "Off Peak", values.get("off_peak_rate") or 0.0),
+        RateBand(ON_PEAK_KEY, "On Peak", values.get("on_peak_rate") or 0.0),
+    )
+
+
+def _structure(values: Mapping[str, Any]) -> tuple:
+    """Return the parts of the options that decide the entity set."""
+    return (
+        # The current rate sensors only exist while peak times are defined
+        _table_key(values) is not None,
+        # Dynamic tariffs add the price feed and its sensors
+        _is_dynamic(values),
+        values.get("price_sensor"),
+        values.get("price_forecast_attribute"),
+        values.get("price_window"),
+        # The engine builds its block counters at setup
+        json.dumps(values.get("import_blocks")),
+        json.dumps(values.get("export_blocks")),
+        values.get("block_period"),
+        # Demand tracking and its sensors follow this sensor and window
+        values.get("demand_sensor"),
+        values.get("demand_window"),
+        # Self-consumption from power follows these sensors
+        tuple(values.get(key) for key in POWER_KEYS),
+        # The projection and its sensors follow the solar forecast
+        values.get("solar_forecast_sensor"),
+        # The battery plan sensor exists while a battery is configured
+        bool(values.get("battery_capacity")),
+        # Instrumentation wraps the callbacks at setup and adds its sensors
+        bool(values.get("instrumentation")),
+        # One rate sensor, and one pair of accumulators, per band
+        tuple(band.key for band in _rate_bands(values)),
+        # The savings engine and its sensors follow these meters
+        tuple(values.get(key) for key in METER_KEYS),
+        # Published statistics replace the sensors' state class
+        bool(values.get("publish_statistics")),
+        # Tax presentations of the rates
+        values.get("tax_rate") or 0.0,
+        values.get("rates_include_tax", True),
+    )
+
+
+def validate_bands(bands: Any) -> list[dict[str, Any]]:
+    """
+    Check a list of band definitions and return it normalised.
+
+    Each band is {"name": ..., "rate": ..., "windows": [rule, ...]}. The
+    first band without windows covers every minute no other band claims.
+    """
+    if not isinstance(bands, list) or not bands:
+        msg = "Bands must be a non-empty list"
+        raise TypeError(msg)
+    if len(bands) > MAX_BANDS:
+        msg = f"At most {MAX_BANDS} bands are supported"
+        raise ValueError(msg)
+
+    normalised = []
+    for band in bands:
+        name = str(band["name"]).strip()
+        rate = float(band.get("rate") or 0.0)
+        if not name or rate < 0:
+            msg = f"Invalid band: {band}"
+            raise ValueError(msg)
+        normalised.append(
+            {
+                "name": name,
+                "rate": rate,
+                "windows": validate_rules(band.get("windows") or []),
+            }
+        )
+
+    if len({slugify(band["name"]) for band in normalised}) != len(normalised):
+        msg = "Band names must be unique"
+        raise ValueError(msg)
+    return normalised
+
+
+def record_changes(
+    values: Mapping[str, Any], effective: date, changes: Mapping[str, Any]
+) -> dict[str, Any]:
+    """Return options with changes added to the timeline on a date."""
+    timeline = TariffTimeline.from_options(values).with_changes(effective, changes)
+    return {**values, CONF_TIMELINE: timeline.as_options()}
+
+
+def apply_due_changes(values: Mapping[str, Any], today: date) -> dict[str, Any] | None:
+    """
+    Return the options brought in line with the timeline for today.
+
+    A staged change from the future_* entities is moved into the timeline
+    once its date arrives, then the current rates are set from the version
+    in force. Returns None when nothing needs to be written.
+    """
+    new_options = dict(values)
+    timeline = TariffTimeline.from_options(values)
+
+    scheduled_date_str = values.get("scheduled_date")
+    if scheduled_date_str and today.isoformat() >= scheduled_date_str:
+        changes: dict[str, Any] = {}
+
+        # Staged rates (0 means "no change")
+        for key, future_key in FUTURE_RATE_KEYS.items():
+            future_rate = values.get(future_key)
+            if future_rate is not None and future_rate > 0:
+                changes[key] = future_rate
+                new_options[future_key] = 0.0
+
+        # Staged schedule
+        if future_schedule := values.get("future_peak_schedule"):
+            changes["peak_schedule"] = future_schedule
+            new_options["future_peak_schedule"] = None
+
+        if changes:
+            timeline = timeline.with_changes(
+                date.fromisoformat(scheduled_date_str), changes
+            )
+            # Clear the date
+            new_options["scheduled_date"] = None
+
+    if (current := timeline.at(today)) is not None:
+        new_options.update(current.values)
+    new_options[CONF_TIMELINE] = timeline.as_options()
+
+    if new_options == values:
+        return None
+    return new_options
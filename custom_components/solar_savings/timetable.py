@@ -0,0 +1,250 @@
+"""Compiled time-of-use tables for Solar Savings."""
+
+from __future__ import annotations
+
+from bisect import bisect_right
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from datetime import date, datetime, time, timedelta
+from typing import Any
+
+MINUTES_PER_DAY = 1440
+
+# Same day keys as the schedule helper
+WEEKDAYS = (
+    "monday",
+    "tuesday",
+    "wednesday",
+    "thursday",
+    "friday",
+    "saturday",
+    "sunday",
+)
+
+# One day profile per weekday, plus one used on holidays
+HOLIDAY = len(WEEKDAYS)
+PROFILES = HOLIDAY + 1
+
+# Day groups accepted in a band rule's "days"
+DAY_GROUPS: dict[str, tuple[int, ...]] = {
+    "all": tuple(range(PROFILES)),
+    "weekdays": tuple(range(5)),
+    "weekends": (5, 6),
+    "holidays": (HOLIDAY,),
+    **{day: (index,) for index, day in enumerate(WEEKDAYS)},
+}
+
+OFF_PEAK = 0
+ON_PEAK = 1
+
+# How far ahead to look for a change before settling for a re-check
+_LOOKAHEAD_DAYS = PROFILES
+
+
+class WeekTable:
+    """
+    The rate band for every minute of every day profile.
+
+    Lookups are a single index into a flat array. The minutes where the
+    band changes are kept sorted per profile so the next transition is a
+    bisect away, which lets callers arm one timer instead of watching an
+    entity.
+    """
+
+    __slots__ = ("_flat", "_slots", "_transitions")
+
+    def __init__(self, slots: bytearray) -> None:
+        """Initialize the table from one band index per profile minute."""
+        self._slots = slots
+        self._flat = slots.count(slots[0]) == len(slots)
+        self._transitions = [
+            [
+                minute
+                for minute in range(1, MINUTES_PER_DAY)
+                if slots[offset + minute] != slots[offset + minute - 1]
+            ]
+            for offset in range(0, PROFILES * MINUTES_PER_DAY, MINUTES_PER_DAY)
+        ]
+
+    @property
+    def is_flat(self) -> bool:
+        """Return True if the same band applies all the time."""
+        return self._flat
+
+    def band_at(self, local: datetime, *, holiday: bool = False) -> int:
+        """Return the band index in force at a local time."""
+        profile = HOLIDAY if holiday else local.weekday()
+        return self._slots[profile * MINUTES_PER_DAY + local.hour * 60 + local.minute]
+
+    def day_bands(self, profile: int) -> bytes:
+        """Return the band index for every minute of a day profile."""
+        offset = profile * MINUTES_PER_DAY
+        return bytes(self._slots[offset : offset + MINUTES_PER_DAY])
+
+    def next_transition(
+        self,
+        local: datetime,
+        is_holiday: Callable[[date], bool] | None = None,
+    ) -> datetime | None:
+        """
+        Return the local time of the next band change.
+
+        Without a holiday check the table repeats weekly, so no change
+        within a week means none ever. With one, the search stops after a
+        week and returns that midnight as a point to look again.
+        """
+        if is_holiday is None and self.is_flat:
+            return None
+
+        day = local.date()
+        profile = _profile(day, is_holiday)
+        transitions = self._transitions[profile]
+
+        index = bisect_right(transitions, local.hour * 60 + local.minute)
+        if index < len(transitions):
+            return _at_minute(local, day, transitions[index])
+
+        last_band = self._slots[profile * MINUTES_PER_DAY + MINUTES_PER_DAY - 1]
+        for offset in range(1, _LOOKAHEAD_DAYS + 1):
+            next_day = day + timedelta(days=offset)
+            profile = _profile(next_day, is_holiday)
+            if self._slots[profile * MINUTES_PER_DAY] != last_band:
+                return _at_minute(local, next_day, 0)
+            if transitions := self._transitions[profile]:
+                return _at_minute(local, next_day, transitions[0])
+
+        if is_holiday is None:
+            return None
+        return _at_minute(local, day + timedelta(days=_LOOKAHEAD_DAYS + 1), 0)
+
+
+def compile_week_table(
+    band_rules: Sequence[Iterable[Mapping[str, Any]] | None], default_band: int = 0
+) -> WeekTable:
+    """
+    Compile rules for each band into a week table.
+
+    Every minute starts in the default band. Each band's rules are then
+    painted in order, so a later band wins where rules overlap. A rule is
+    {"days": ..., "from": ..., "to": ...}; times are resolved to the minute.
+    A rule ending before it starts runs overnight: its evening is painted
+    on its own days and its morning on the day after each. The holiday
+    profile has no fixed next day, so it takes its own overnight mornings.
+    """
+    slots = bytearray([default_band]) * (PROFILES * MINUTES_PER_DAY)
+
+    def paint(profile: int, start: int, end: int, band: int) -> None:
+        offset = profile * MINUTES_PER_DAY
+        slots[offset + start : offset + end] = bytes([band]) * (end - start)
+
+    for band, rules in enumerate(band_rules):
+        for rule in rules or ():
+            start, end = parse_window(rule)
+            for profile in parse_days(rule.get("days", "all")):
+                if start < end:
+                    paint(profile, start, end, band)
+                    continue
+                paint(profile, start, MINUTES_PER_DAY, band)
+                paint(_next_profile(profile), 0, end, band)
+
+    return WeekTable(slots)
+
+
+def windows_to_rules(
+    windows: Mapping[str, Iterable[Any]] | None,
+) -> list[dict[str, Any]]:
+    """
+    Convert weekly windows into band rules.
+
+    Windows are keyed by weekday and are either schedule helper blocks
+    ({"from": ..., "to": ...}) or "HH:MM-HH:MM" strings.
+    """
+    rules = []
+    for day in WEEKDAYS:
+        for window in (windows or {}).get(day) or ():
+            if isinstance(window, str):
+                start, _, end = window.partition("-")
+            else:
+                start, end = window["from"], window["to"]
+            rules.append({"days": day, "from": start, "to": end})
+    return rules
+
+
+def validate_windows(windows: Any) -> dict[str, list[Any]]:
+    """Check that a weekly windows definition can be compiled."""
+    if not isinstance(windows, Mapping) or not set(windows) <= set(WEEKDAYS):
+        msg = f"Windows must be keyed by weekday: {', '.join(WEEKDAYS)}"
+        raise ValueError(msg)
+    for rule in windows_to_rules(windows):
+        parse_window(rule)
+    return {day: list(day_windows or ()) for day, day_windows in windows.items()}
+
+
+def validate_rules(rules: Any) -> list[dict[str, Any]]:
+    """Check that a list of band rules can be compiled."""
+    if not isinstance(rules, list):
+        msg = "Rules must be a list"
+        raise TypeError(msg)
+    for rule in rules:
+        parse_window(rule)
+        parse_days(rule.get("days", "all"))
+    return [dict(rule) for rule in rules]
+
+
+def parse_days(days: str | Iterable[str]) -> set[int]:
+    """Return the day profiles selected by a day name, group, or list."""
+    if isinstance(days, str):
+        days = [days]
+
+    profiles: set[int] = set()
+    for day in days:
+        if day not in DAY_GROUPS:
+            msg = f"Unknown day: {day}"
+            raise ValueError(msg)
+        profiles.update(DAY_GROUPS[day])
+    return profiles
+
+
+def parse_window(window: Mapping[str, Any]) -> tuple[int, int]:
+    """
+    Return the start and end minute of the day for a rule.
+
+    An end before the start is on the next day. An end of 00:00 is the
+    end of the day.
+    """
+    start_minute = _minute_of_day(window["from"])
+    end_minute = _minute_of_day(window["to"]) or MINUTES_PER_DAY
+
+    if end_minute == start_minute:
+        msg = f"Window {window['from']}-{window['to']} is empty"
+        raise ValueError(msg)
+    return start_minute, end_minute
+
+
+def _minute_of_day(value: time | str) -> int:
+    """Convert a time, or an "HH:MM[:SS]" string, to minutes since midnight."""
+    if isinstance(value, time):
+        return value.hour * 60 + value.minute
+
+    hours, minutes, *_ = (int(part) for part in value.strip().split(":"))
+    # The schedule helper writes the end of the day as 24:00:00
+    return min(hours * 60 + minutes, MINUTES_PER_DAY)
+
+
+def _next_profile(profile: int) -> int:
+    """Return the day profile that follows another overnight."""
+    if profile == HOLIDAY:
+        return HOLIDAY
+    return (profile + 1) % len(WEEKDAYS)
+
+
+def _profile(day: date, is_holiday: Callable[[date], bool] | None) -> int:
+    """Return the day profile used on a date."""
+    if is_holiday is not None and is_holiday(day):
+        return HOLIDAY
+    return day.weekday()
+
+
+def _at_minute(local: datetime, day: date, minute: int) -> datetime:
+    """Return a local time on a day, as wall clock minutes after midnight."""
+    midnight = datetime.combine(day, time(), tzinfo=local.tzinfo)
+    return midnight + timedelta(minutes=minute)
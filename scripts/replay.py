@@ -0,0 +1,508 @@
+# A standalone script run from scripts/benchmark, not part of a package
+# ruff: noqa: INP001
+"""
+Replay recorded state changes through Solar Savings and measure it.
+
+The integration runs in a Home Assistant set up with the helpers of
+pytest-homeassistant-custom-component, with the recorder writing to a
+SQLite file. Time is frozen with freezegun and moved to each record in
+turn, firing the timers that fall due on the way, so a day of meter,
+power and schedule updates replays in seconds and every run sees the same
+timeline. Each scenario sets up a number of config entries following the
+same sensors, replays the log, and reports events per second, the latency
+of the state change callbacks, the states the integration wrote, and peak
+memory.
+
+A log is JSON lines, in time order:
+
+    {"config": {...}}                   optional first line, see DEFAULT_CONFIG
+    {"at": "2026-01-05T06:00:10+11:00", "entity_id": "sensor.x", "state": "812",
+     "attributes": {"unit_of_measurement": "W"}}
+    {"at": "2026-01-05T12:00:00+11:00", "options": {"on_peak_rate": 46.0}}
+
+Option records are applied to every entry through the options update path.
+Without --log a synthetic log is generated; --record writes it out.
+
+Run with scripts/benchmark.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import multiprocessing
+import random
+import resource
+import sys
+import tempfile
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import UTC, datetime, tzinfo
+from pathlib import Path
+from typing import Any
+from zoneinfo import ZoneInfo
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Makes Home Assistant's clocks follow freezegun; imported before the rest
+# of Home Assistant, as the test plugin does
+from pytest_homeassistant_custom_component import patch_time  # noqa: E402, F401, I001
+
+import freezegun  # noqa: E402
+from homeassistant import loader  # noqa: E402
+from homeassistant.const import EVENT_STATE_CHANGED  # noqa: E402
+from homeassistant.core import (  # noqa: E402
+    Event,
+    EventStateChangedData,
+    HomeAssistant,
+    callback,
+)
+from homeassistant.helpers import entity_registry as er  # noqa: E402
+from homeassistant.setup import async_setup_component  # noqa: E402
+from pytest_homeassistant_custom_component.common import (  # noqa: E402
+    MockConfigEntry,
+    async_fire_time_changed,
+    async_test_home_assistant,
+)
+
+from custom_components.solar_savings.const import DOMAIN  # noqa: E402
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_ENTRIES = (1, 10, 100, 1000)
+
+GRID_IMPORT = "sensor.replay_grid_import"
+GRID_EXPORT = "sensor.replay_grid_export"
+SOLAR_ENERGY = "sensor.replay_solar_energy"
+SOLAR_POWER = "sensor.replay_solar_power"
+GRID_POWER = "sensor.replay_grid_power"
+
+ENERGY_ATTRIBUTES = {
+    "unit_of_measurement": "kWh",
+    "device_class": "energy",
+    "state_class": "total_increasing",
+}
+POWER_ATTRIBUTES = {
+    "unit_of_measurement": "W",
+    "device_class": "power",
+    "state_class": "measurement",
+}
+
+PEAK_BLOCKS = [{"from": "16:00:00", "to": "21:00:00"}]
+
+DEFAULT_CONFIG: dict[str, Any] = {
+    "time_zone": "Australia/Melbourne",
+    "currency": "AUD",
+    # Local midnight the synthetic log starts at; a Monday
+    "start": "2026-01-05T00:00:00",
+    # Schedule helpers set up from YAML, as in configuration.yaml
+    "schedule": {
+        "replay_peak": {
+            "name": "Replay peak",
+            **dict.fromkeys(
+                ("monday", "tuesday", "wednesday", "thursday", "friday"), PEAK_BLOCKS
+            ),
+        }
+    },
+    "data": {
+        "peak_schedule": "schedule.replay_peak",
+        "on_peak_rate": 45.0,
+        "off_peak_rate": 22.0,
+        "export_rate": 5.0,
+        "grid_import_sensor": GRID_IMPORT,
+        "grid_export_sensor": GRID_EXPORT,
+        "solar_production_sensor": SOLAR_ENERGY,
+    },
+    "options": {
+        "solar_power_sensor": SOLAR_POWER,
+        "grid_power_sensor": GRID_POWER,
+        "demand_sensor": GRID_POWER,
+    },
+}
+
+# Synthetic log: seconds between power samples and between meter readings
+POWER_INTERVAL = 10
+ENERGY_INTERVAL = 60
+# Hours of the day with the household's morning and evening load
+MORNING_LOAD = (6.5, 8.5)
+EVENING_LOAD = (17.0, 21.5)
+
+# (timestamp, entity id or None, state or option changes, attributes)
+Record = tuple[float, str | None, Any, dict[str, Any] | None]
+
+
+async def async_setup_hass(hass: HomeAssistant, config: dict[str, Any]) -> None:
+    """Set up what the replay needs in a test Home Assistant."""
+    hass.config.currency = config["currency"]
+    await hass.config.async_set_time_zone(config["time_zone"])
+
+    # Load custom_components from the repository
+    hass.data.pop(loader.DATA_CUSTOM_COMPONENTS)
+
+    # A real recorder, so its writes are part of the measurements
+    db_url = f"sqlite:///{hass.config.path('home-assistant_v2.db')}"
+    await async_setup_component(hass, "recorder", {"recorder": {"db_url": db_url}})
+
+    if config.get("schedule"):
+        await async_setup_component(hass, "schedule", {"schedule": config["schedule"]})
+    await hass.async_block_till_done()
+
+
+async def async_add_entries(
+    hass: HomeAssistant, config: dict[str, Any], count: int
+) -> list[MockConfigEntry]:
+    """Add and set up config entries that all follow the same sensors."""
+    entries = []
+    for index in range(count):
+        entry = MockConfigEntry(
+            domain=DOMAIN,
+            data=config["data"],
+            options=config["options"],
+            title=f"Replay {index}",
+        )
+        entry.add_to_hass(hass)
+        await hass.config_entries.async_setup(entry.entry_id)
+        entries.append(entry)
+    await hass.async_block_till_done()
+    return entries
+
+
+def run_scenario(
+    records: list[Record],
+    config: dict[str, Any],
+    count: int,
+    *,
+    trace_memory: bool,
+) -> dict[str, Any]:
+    """
+    Run one scenario and return its measurements.
+
+    Meant to run in a fresh process, so peak memory is the scenario's own.
+    """
+    logging.basicConfig(level=logging.WARNING)
+    if trace_memory:
+        tracemalloc.start()
+    result = asyncio.run(_async_run_scenario(records, config, count))
+    result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    if trace_memory:
+        result["peak_traced_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return result
+
+
+async def _async_run_scenario(
+    records: list[Record], config: dict[str, Any], count: int
+) -> dict[str, Any]:
+    """Set up the entries, replay the records and measure."""
+    start = records[0][0] if records else _start_timestamp(config)
+
+    with (
+        freezegun.freeze_time(datetime.fromtimestamp(start, UTC)) as frozen,
+        tempfile.TemporaryDirectory() as config_dir,
+    ):
+        # freezegun stops perf_counter along with the clock; the replay is
+        # timed with the real one
+        perf_counter = freezegun.api.real_perf_counter
+
+        async with async_test_home_assistant(config_dir=config_dir) as hass:
+            await async_setup_hass(hass, config)
+
+            started = perf_counter()
+            entries = await async_add_entries(hass, config, count)
+            setup_seconds = perf_counter() - started
+
+            registry = er.async_get(hass)
+            ours = {
+                registry_entry.entity_id
+                for entry in entries
+                for registry_entry in er.async_entries_for_config_entry(
+                    registry, entry.entry_id
+                )
+            }
+            writes = 0
+
+            @callback
+            def _count_write(event: Event[EventStateChangedData]) -> None:
+                nonlocal writes
+                if event.data["entity_id"] in ours:
+                    writes += 1
+
+            hass.bus.async_listen(EVENT_STATE_CHANGED, _count_write)
+
+            state_latencies: list[float] = []
+            option_latencies: list[float] = []
+            background = 0.0
+            now = start
+
+            started = perf_counter()
+            for at, entity_id, value, attributes in records:
+                if at > now:
+                    now = at
+                    waited = perf_counter()
+                    moved = datetime.fromtimestamp(at, UTC)
+                    frozen.move_to(moved)
+                    async_fire_time_changed(hass, moved)
+                    await hass.async_block_till_done()
+                    background += perf_counter() - waited
+
+                if entity_id is not None:
+                    dispatched = perf_counter()
+                    hass.states.async_set(entity_id, value, attributes, timestamp=at)
+                    state_latencies.append(perf_counter() - dispatched)
+                    continue
+
+                for entry in entries:
+                    dispatched = perf_counter()
+                    hass.config_entries.async_update_entry(
+                        entry, options={**entry.options, **value}
+                    )
+                    await hass.async_block_till_done()
+                    option_latencies.append(perf_counter() - dispatched)
+
+            await hass.async_block_till_done()
+            replay_seconds = perf_counter() - started
+            simulated_seconds = now - start
+
+            await hass.async_stop(force=True)
+
+    return {
+        "entries": count,
+        "entities": len(ours),
+        "events": len(records),
+        "setup_seconds": setup_seconds,
+        "replay_seconds": replay_seconds,
+        "timer_seconds": background,
+        "simulated_seconds": simulated_seconds,
+        "events_per_second": len(records) / replay_seconds if replay_seconds else 0.0,
+        "state_p50_ms": _percentile(state_latencies, 50) * 1000,
+        "state_p99_ms": _percentile(state_latencies, 99) * 1000,
+        "option_p50_ms": _percentile(option_latencies, 50) * 1000,
+        "option_p99_ms": _percentile(option_latencies, 99) * 1000,
+        "state_writes": writes,
+    }
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    """Return the nearest-rank percentile, or 0 without values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+
+def _start_timestamp(config: dict[str, Any]) -> float:
+    """Return the configured start, read as local time at the site."""
+    start = datetime.fromisoformat(config["start"])
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=ZoneInfo(config["time_zone"]))
+    return start.timestamp()
+
+
+def synthetic_log(config: dict[str, Any], days: int, seed: int) -> list[Record]:
+    """
+    Return a reproducible log of a house with solar, one record at a time.
+
+    Solar and grid power every POWER_INTERVAL seconds, the three energy
+    meters every ENERGY_INTERVAL seconds and a rate change at noon each
+    day. The schedule helper flips on its own as the clock passes it.
+    """
+    # Reproducible synthetic data, not for security
+    rng = random.Random(seed)  # noqa: S311
+    start = _start_timestamp(config)
+    meters = {GRID_IMPORT: 1200.0, GRID_EXPORT: 800.0, SOLAR_ENERGY: 2500.0}
+    on_peak_rate = config["data"]["on_peak_rate"]
+
+    records: list[Record] = []
+    cloud = 1.0
+    for step in range(0, days * 86400, POWER_INTERVAL):
+        at = start + step
+        hour = step % 86400 / 3600
+
+        cloud = min(max(cloud + rng.gauss(0, 0.05), 0.2), 1.0)
+        solar = max(5.0 * math.sin(math.pi * (hour - 6) / 13), 0.0) * cloud
+        load = 0.3 + rng.uniform(0.0, 0.4)
+        if (
+            MORNING_LOAD[0] <= hour < MORNING_LOAD[1]
+            or EVENING_LOAD[0] <= hour < EVENING_LOAD[1]
+        ):
+            load += 1.5 + rng.uniform(0.0, 1.0)
+        grid = load - solar
+
+        hours = POWER_INTERVAL / 3600
+        meters[GRID_IMPORT] += max(grid, 0.0) * hours
+        meters[GRID_EXPORT] += max(-grid, 0.0) * hours
+        meters[SOLAR_ENERGY] += solar * hours
+
+        records.append((at, SOLAR_POWER, f"{solar * 1000:.0f}", POWER_ATTRIBUTES))
+        records.append((at, GRID_POWER, f"{grid * 1000:.0f}", POWER_ATTRIBUTES))
+        if step % ENERGY_INTERVAL == 0:
+            records.extend(
+                (at, entity_id, f"{value:.3f}", ENERGY_ATTRIBUTES)
+                for entity_id, value in meters.items()
+            )
+        if step % 86400 == 12 * 3600:
+            # Alternate the rate, so every change is applied in place
+            on_peak_rate += 1.0 if step // 86400 % 2 == 0 else -1.0
+            records.append((at, None, {"on_peak_rate": on_peak_rate}, None))
+
+    return records
+
+
+def read_log(path: Path) -> tuple[dict[str, Any], list[Record]]:
+    """Return the config and the records of a log file."""
+    config = dict(DEFAULT_CONFIG)
+    records: list[Record] = []
+    with path.open(encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if "config" in item:
+                config.update(item["config"])
+                continue
+            at = _read_time(item["at"], ZoneInfo(config["time_zone"]))
+            if "options" in item:
+                records.append((at, None, item["options"], None))
+            else:
+                records.append(
+                    (at, item["entity_id"], str(item["state"]), item.get("attributes"))
+                )
+    # Stable, so records at the same time keep their order
+    records.sort(key=lambda record: record[0])
+    return config, records
+
+
+def write_log(path: Path, config: dict[str, Any], records: list[Record]) -> None:
+    """Write a config and records as a log file."""
+    time_zone = ZoneInfo(config["time_zone"])
+    with path.open("w", encoding="utf-8") as file:
+        file.write(json.dumps({"config": config}) + "\n")
+        for at, entity_id, value, attributes in records:
+            when = datetime.fromtimestamp(at, time_zone)
+            item: dict[str, Any] = {"at": when.isoformat()}
+            if entity_id is None:
+                item["options"] = value
+            else:
+                item.update(entity_id=entity_id, state=value, attributes=attributes)
+            file.write(json.dumps(item) + "\n")
+
+
+def _read_time(value: str | float, time_zone: tzinfo) -> float:
+    """Return the timestamp of an ISO time, local to the site if naive."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    when = datetime.fromisoformat(value)
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=time_zone)
+    return when.timestamp()
+
+
+def compare(
+    results: list[dict[str, Any]], baseline: list[dict[str, Any]], tolerance: float
+) -> list[str]:
+    """Return the regressions against a baseline report."""
+    previous = {result["entries"]: result for result in baseline}
+    regressions = []
+    for result in results:
+        if (base := previous.get(result["entries"])) is None:
+            continue
+        if result["events_per_second"] < base["events_per_second"] * (1 - tolerance):
+            regressions.append(
+                f"{result['entries']} entries:"
+                f" {result['events_per_second']:.0f} events/s,"
+                f" baseline {base['events_per_second']:.0f}"
+            )
+        if result["state_p99_ms"] > base["state_p99_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{result['entries']} entries: p99 {result['state_p99_ms']:.3f} ms,"
+                f" baseline {base['state_p99_ms']:.3f} ms"
+            )
+    return regressions
+
+
+def print_report(results: list[dict[str, Any]]) -> None:
+    """Print one line per scenario."""
+    print(  # noqa: T201
+        f"{'entries':>7} {'entities':>8} {'events':>8} {'events/s':>9}"
+        f" {'p50 ms':>8} {'p99 ms':>8} {'opt p99':>8} {'writes':>8}"
+        f" {'setup s':>8} {'speedup':>8} {'RSS MB':>7}"
+    )
+    for result in results:
+        speedup = result["simulated_seconds"] / result["replay_seconds"]
+        print(  # noqa: T201
+            f"{result['entries']:>7} {result['entities']:>8} {result['events']:>8}"
+            f" {result['events_per_second']:>9.0f} {result['state_p50_ms']:>8.3f}"
+            f" {result['state_p99_ms']:>8.3f} {result['option_p99_ms']:>8.1f}"
+            f" {result['state_writes']:>8} {result['setup_seconds']:>8.2f}"
+            f" {speedup:>7.0f}x {result['peak_rss_mb']:>7.0f}"
+        )
+
+
+def main() -> int:
+    """Run the scenarios given on the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--log", type=Path, help="replay this log, not a synthetic one")
+    parser.add_argument("--days", type=int, default=1, help="days of synthetic log")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the synthetic log")
+    parser.add_argument(
+        "--entries",
+        type=int,
+        nargs="+",
+        default=DEFAULT_ENTRIES,
+        help="config entries in each scenario",
+    )
+    parser.add_argument("--record", type=Path, help="write the log here and exit")
+    parser.add_argument("--output", type=Path, help="write the results here as JSON")
+    parser.add_argument(
+        "--baseline", type=Path, help="fail on a regression against this JSON report"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="fraction a result may be worse than the baseline",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="also report the peak of Python allocations (slower)",
+    )
+    args = parser.parse_args()
+
+    if args.log:
+        config, records = read_log(args.log)
+    else:
+        config = DEFAULT_CONFIG
+        records = synthetic_log(config, args.days, args.seed)
+
+    if args.record:
+        write_log(args.record, config, records)
+        return 0
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for count in args.entries:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            future = executor.submit(
+                run_scenario, records, config, count, trace_memory=args.trace_memory
+            )
+            results.append(future.result())
+
+    print_report(results)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if regressions := compare(results, baseline, args.tolerance):
+            print("\n".join(["Regressions:", *regressions]))  # noqa: T201
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())